@@ -0,0 +1,3 @@
+"""
+Offline benchmarks of the indexing, search and chat pipelines. Run with `python -m benchmarks.run`.
+"""
@@ -0,0 +1,116 @@
+"""
+Synthetic corpus of tool functions modelled on `infinite_fn.python_fns`, with a labelled query for each function
+"""
+import importlib
+import itertools
+import os
+import random
+import sys
+from collections import namedtuple
+
+SyntheticFunction = namedtuple('SyntheticFunction', ['name', 'source', 'query'])
+
+# (identifier, docstring noun, query noun)
+_ENTITIES = [
+    ("hotels", "hotels and other lodgings", "places to stay"),
+    ("hostels", "hostels", "cheap hostels"),
+    ("apartments", "holiday apartments", "apartments to rent"),
+    ("restaurants", "restaurants", "places to eat"),
+    ("cafes", "cafes and coffee shops", "coffee places"),
+    ("museums", "museums and galleries", "museums"),
+    ("tours", "guided tours", "guided tours"),
+    ("events", "concerts and events", "concerts"),
+    ("flights", "flights", "plane tickets"),
+    ("trains", "train connections", "train tickets"),
+    ("buses", "bus connections", "bus tickets"),
+    ("car_rentals", "rental cars", "cars to rent"),
+    ("taxis", "taxi services", "taxis"),
+    ("parking_spots", "parking spots", "places to park"),
+    ("beaches", "beaches", "beaches"),
+    ("parks", "parks and gardens", "parks"),
+    ("pharmacies", "pharmacies", "drug stores"),
+    ("hospitals", "hospitals and clinics", "doctors"),
+    ("atms", "cash machines", "ATMs"),
+    ("shops", "shops and markets", "shopping"),
+]
+# (identifier, docstring verb, query verb)
+_ACTIONS = [
+    ("list", "Lists", "Show me"),
+    ("search", "Searches", "Find"),
+    ("count", "Counts", "How many"),
+    ("book", "Books one of the", "Book"),
+    ("cancel", "Cancels a booking of", "Cancel my booking of"),
+    ("compare", "Compares the prices of", "Compare prices of"),
+]
+# (identifier, docstring qualifier, query qualifier)
+_QUALIFIERS = [
+    ("", "", ""),
+    ("by_price", "sorted by price", "cheapest"),
+    ("by_rating", "sorted by rating", "best rated"),
+    ("near_station", "near the central station", "close to the station"),
+    ("for_families", "suitable for families with children", "good for kids"),
+    ("accessible", "accessible by wheelchair", "wheelchair friendly"),
+    ("open_now", "that are open now", "open right now"),
+    ("with_parking", "that offer parking", "with a parking lot"),
+    ("pet_friendly", "that allow pets", "where dogs are allowed"),
+    ("late_night", "that are open late at night", "open after midnight"),
+]
+_CITIES = ["London", "Paris", "Rome", "Sofia", "Berlin", "Madrid", "Vienna", "Oslo", "Lisbon", "Prague"]
+
+_TEMPLATE = '''
+
+@tool(pure=True)
+def {name}(location: str, date: str = None) -> dict:
+    """
+    {verb} {noun} in a location{qualifier}.
+
+    :param location: The location, e.g. "London"
+    :param date: The date in YYYY-MM-DD format. Defaults to today.
+    :return: A dictionary with the results
+    """
+    return {{"function": "{name}", "location": location, "date": date}}
+'''
+
+
+def generate_corpus(size: int, seed: int = 0) -> list[SyntheticFunction]:
+    """
+    Generates synthetic tool functions with a query for each
+
+    :param size: The number of functions, at most the number of (entity, action, qualifier) combinations (1200)
+    :param seed: The seed of the selection and of the queries
+    :return: List of functions
+    """
+    _random = random.Random(seed)
+    _combinations = list(itertools.product(_ENTITIES, _ACTIONS, _QUALIFIERS))
+    if size > len(_combinations):
+        raise ValueError(f"At most {len(_combinations)} functions can be generated")
+    _random.shuffle(_combinations)
+    corpus = []
+    for (entity, doc_noun, query_noun), (action, doc_verb, query_verb), (qualifier, doc_q, query_q) in \
+            _combinations[:size]:
+        _name = "_".join(p for p in (action, entity, qualifier) if p)
+        _source = _TEMPLATE.format(name=_name, verb=doc_verb, noun=doc_noun, qualifier=f" {doc_q}" if doc_q else "")
+        _query = " ".join(p for p in (query_verb, query_q, query_noun, "in", _random.choice(_CITIES)) if p)
+        corpus.append(SyntheticFunction(name=_name, source=_source, query=_query))
+    return corpus
+
+
+def load_corpus_module(corpus: list[SyntheticFunction], directory: str,
+                       module_name: str = "bench_corpus") -> object:
+    """
+    Writes the corpus as a python module and imports it, so that it can be indexed like `python_fns`
+
+    :param corpus: The functions
+    :param directory: The directory of the module, added to sys.path
+    :param module_name: The name of the module
+    :return: The module
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{module_name}.py"), "w") as f:
+        f.write(f'"""\nSynthetic benchmark tools\n"""\nfrom infinite_fn.tool_registry import tool\n'
+                f'{"".join(fn.source for fn in corpus)}')
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    sys.modules.pop(module_name, None)
+    importlib.invalidate_caches()
+    return importlib.import_module(module_name)
@@ -0,0 +1,40 @@
+"""
+Deterministic local embedding function
+"""
+import hashlib
+
+import numpy as np
+
+from infinite_fn.lexical import tokenize
+
+
+class HashingEmbeddingFunction(object):
+    """
+    Embeds texts as signed, hashed bags of terms and term bigrams. Texts that share terms are similar, so it stands in
+    for a real embedding model in benchmarks without network access.
+    """
+
+    def __init__(self, dim: int = 512) -> None:
+        """
+        :param dim: The number of dimensions
+        """
+        self.dim = dim
+        self._buckets: dict[str, tuple[int, float]] = {}
+
+    def _bucket(self, term: str) -> tuple[int, float]:
+        _bucket = self._buckets.get(term)
+        if _bucket is None:
+            _digest = int.from_bytes(hashlib.md5(term.encode()).digest()[:8], "little")
+            _bucket = self._buckets[term] = (_digest % self.dim, 1.0 if (_digest >> 63) else -1.0)
+        return _bucket
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        _embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            _terms = tokenize(text)
+            for term in _terms + [f"{a} {b}" for a, b in zip(_terms, _terms[1:])]:
+                _idx, _sign = self._bucket(term)
+                _embeddings[i, _idx] += _sign
+        _norms = np.linalg.norm(_embeddings, axis=1, keepdims=True)
+        _norms[_norms == 0] = 1.0
+        return (_embeddings / _norms).tolist()
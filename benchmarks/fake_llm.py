@@ -0,0 +1,90 @@
+"""
+Deterministic local stand-in for the OpenAI chat completion API
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+
+from pydantic import Field
+
+from infinite_fn.llm import AsyncOpenAIInterface
+
+_ARGUMENT_VALUES = {"location": "London", "date": "2023-07-01", "location1": "London", "location2": "Paris"}
+_TYPE_VALUES = {"string": "test", "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+
+
+def fake_arguments(parameters: dict[str, any]) -> dict[str, any]:
+    """
+    Returns values for the required parameters of a function schema
+
+    :param parameters: The JSON schema of the function parameters
+    :return: Dictionary of parameter name to value
+    """
+    _properties = parameters.get("properties", {})
+    return {name: _ARGUMENT_VALUES.get(name, _TYPE_VALUES.get(_properties.get(name, {}).get("type"), "test"))
+            for name in parameters.get("required", [])}
+
+
+def _tokens(text: str | None) -> int:
+    return len(text.split()) if text else 0
+
+
+class FakeLLMInterface(AsyncOpenAIInterface):
+    """
+    Answers without network access after a simulated latency:
+    - with functions or tools, calls the first one with placeholder arguments,
+    - after a function or tool response, summarizes it,
+    - otherwise reflects on the last user message by restating it.
+    Token usage is counted in words.
+    """
+    latency: float = Field(default=0.0, description="Simulated seconds per completion")
+
+    def __init__(self, latency: float = 0.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def _reply(self, params: dict[str, any]) -> dict[str, any]:
+        _last = params["messages"][-1]
+        if _last["role"] in ("function", "tool"):
+            return {"role": "assistant", "content": f"Here is what I found: {str(_last['content'])[:200]}"}
+        if params.get("functions"):
+            _function = params["functions"][0]
+            return {"role": "assistant", "content": None,
+                    "function_call": {"name": _function["name"],
+                                      "arguments": json.dumps(fake_arguments(_function.get("parameters", {})))}}
+        if params.get("tools"):
+            _function = params["tools"][0]["function"]
+            return {"role": "assistant", "content": None,
+                    "tool_calls": [{"id": "call_0", "type": "function",
+                                    "function": {"name": _function["name"],
+                                                 "arguments": json.dumps(
+                                                     fake_arguments(_function.get("parameters", {})))}}]}
+        _user = next((m["content"] for m in reversed(params["messages"]) if m["role"] == "user"), "")
+        return {"role": "assistant", "content": f"The user wants to know: {_user}"}
+
+    def _complete(self, params: dict[str, any]) -> dict[str, any]:
+        _message = self._reply(params)
+        _prompt = sum(_tokens(m.get("content")) for m in params["messages"])
+        _completion = _tokens(_message.get("content")) + _tokens(json.dumps(_message.get("function_call", "")))
+        self.update_cost(params["model"], {"usage": {"prompt_tokens": _prompt, "completion_tokens": _completion,
+                                                     "total_tokens": _prompt + _completion}})
+        return _message
+
+    def update_llm_conversation(self, **kwargs) -> "FakeLLMInterface":
+        time.sleep(self.latency)
+        self.conversation_store.add_message(self._complete(self._request_params(**kwargs)))
+        return self
+
+    async def aupdate_llm_conversation(self, **kwargs) -> "FakeLLMInterface":
+        await asyncio.sleep(self.latency)
+        self.conversation_store.add_message(self._complete(self._request_params(**kwargs)))
+        return self
+
+    async def astream(self, **kwargs) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        _content = self._reply(self._request_params(**kwargs))["content"] or ""
+        for i, word in enumerate(_content.split(" ")):
+            await asyncio.sleep(0)
+            yield word if i == 0 else f" {word}"
+        self.conversation_store.add_message({"role": "assistant", "content": _content})
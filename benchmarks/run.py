@@ -0,0 +1,253 @@
+"""
+Runs the offline benchmarks and writes the results to bench_output.txt.
+
+The LLM and the embedding model are replaced with `FakeLLMInterface` and `HashingEmbeddingFunction`, so no network
+access or API key is needed. The first indexing run does not generate function summaries (`enhanced_summary=False`)
+and covers discovery, embedding and writing the index; the second one summarizes every function with the simulated
+LLM latency, which shows how the bounded summary pool overlaps the completions. The simulated LLM latency models the API round trips of a chat
+turn so that the turn benchmark shows how the pipeline overlaps them under concurrent load. The worker benchmark runs
+the hybrid search in several processes sharing the read-only, memory-mapped index, as in multi-worker serving.
+
+Usage: python -m benchmarks.run [--sizes 200,1000] [--concurrency 1,8,32] [--turns 4] [--latency 0.05] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import SyntheticFunction, generate_corpus, load_corpus_module
+from benchmarks.embeddings import HashingEmbeddingFunction
+
+
+def _percentile(values: list[float], q: float) -> float:
+    _sorted = sorted(values)
+    return _sorted[min(len(_sorted) - 1, int(q * len(_sorted)))] if _sorted else float("nan")
+
+
+def bench_indexing(corpus: list[SyntheticFunction], workdir: str) -> tuple[any, dict[str, float]]:
+    """
+    Indexes the corpus into a new function index, then indexes it again without changes
+
+    :param corpus: The functions
+    :param workdir: The directory of the generated module, the index and the manifest
+    :return: The function indexer and the results
+    """
+    from func_ai.function_indexer import FunctionIndexer
+
+    from benchmarks.fake_llm import FakeLLMInterface
+    from infinite_fn.index_manifest import IndexManifest
+    from infinite_fn.indexing import index_modules
+    from infinite_fn.vector_index import NumpyClient
+
+    _module = load_corpus_module(corpus, os.path.join(workdir, "modules"), f"bench_corpus_{len(corpus)}")
+    _fi = FunctionIndexer(llm_interface=FakeLLMInterface(),
+                          chroma_client=NumpyClient(os.path.join(workdir, f"index_{len(corpus)}")),
+                          embedding_function=HashingEmbeddingFunction())
+    _manifest_path = os.path.join(workdir, f"manifest_{len(corpus)}.json")
+    _started = time.perf_counter()
+    _timings = index_modules([_module.__name__], _fi, manifest=IndexManifest(_manifest_path), enhanced_summary=False)
+    _elapsed = time.perf_counter() - _started
+    _started = time.perf_counter()
+    index_modules([_module.__name__], _fi, manifest=IndexManifest(_manifest_path), enhanced_summary=False)
+    _reindex = time.perf_counter() - _started
+    return _fi, {"seconds": _elapsed, "functions_per_second": len(corpus) / _elapsed,
+                 "embed_seconds": _timings.get("embed", 0.0), "write_seconds": _timings.get("write", 0.0),
+                 "unchanged_reindex_seconds": _reindex}
+
+
+def bench_summarized_indexing(corpus: list[SyntheticFunction], workdir: str, latency: float) -> dict[str, float]:
+    """
+    Indexes the corpus into a new function index with a summary of every function written by the fake LLM
+
+    :param corpus: The functions
+    :param workdir: The directory of the generated module, the index and the manifest
+    :param latency: The simulated seconds per summary completion
+    :return: The results
+    """
+    import functools
+
+    from func_ai.function_indexer import FunctionIndexer
+
+    from benchmarks.fake_llm import FakeLLMInterface
+    from infinite_fn.index_manifest import IndexManifest
+    from infinite_fn.indexing import INDEX_WORKERS, index_modules, summarize_function
+    from infinite_fn.vector_index import NumpyClient
+
+    _module = load_corpus_module(corpus, os.path.join(workdir, "modules"), f"bench_corpus_{len(corpus)}")
+    _fi = FunctionIndexer(llm_interface=FakeLLMInterface(),
+                          chroma_client=NumpyClient(os.path.join(workdir, f"index_{len(corpus)}_summarized")),
+                          embedding_function=HashingEmbeddingFunction())
+    _summarizer = functools.partial(summarize_function, llm_factory=lambda: FakeLLMInterface(latency=latency))
+    _started = time.perf_counter()
+    _timings = index_modules([_module.__name__], _fi,
+                             manifest=IndexManifest(os.path.join(workdir, f"manifest_{len(corpus)}_summarized.json")),
+                             summarizer=_summarizer)
+    _elapsed = time.perf_counter() - _started
+    return {"seconds": _elapsed, "functions_per_second": len(corpus) / _elapsed,
+            "summarize_seconds": _timings.get("summarize", 0.0),
+            "sequential_summarize_seconds": len(corpus) * latency, "summary_workers": INDEX_WORKERS}
+
+
+def bench_search(searcher: any, corpus: list[SyntheticFunction]) -> dict[str, float]:
+    """
+    Runs the query of every function through `find_functions`
+
+    :param searcher: The `FunctionIndexer` or `HybridFunctionSearch`
+    :param corpus: The functions and their queries
+    :return: The latency percentiles, top-1 accuracy and top-3 recall
+    """
+    _latencies, _top1, _top3 = [], 0, 0
+    for fn in corpus:
+        _started = time.perf_counter()
+        _results = searcher.find_functions(fn.query, max_results=3)
+        _latencies.append(time.perf_counter() - _started)
+        _names = [r.name for r in _results]
+        _top1 += int(_names[:1] == [fn.name])
+        _top3 += int(fn.name in _names)
+    return {"p50_ms": _percentile(_latencies, 0.5) * 1000, "p99_ms": _percentile(_latencies, 0.99) * 1000,
+            "top1_accuracy": _top1 / len(corpus), "top3_recall": _top3 / len(corpus)}
+
+
+async def bench_turns(function_indexer: any, corpus: list[SyntheticFunction], concurrency: int, turns: int,
+                      latency: float) -> dict[str, float]:
+    """
+    Runs `update_convo` turns for several concurrent users
+
+    :param function_indexer: The function index of the corpus
+    :param corpus: The functions whose queries are sent as user messages
+    :param concurrency: The number of concurrent users
+    :param turns: The number of turns per user
+    :param latency: The simulated seconds per LLM completion
+    :return: The turn latency percentiles and throughput
+    """
+    from benchmarks.fake_llm import FakeLLMInterface
+    from infinite_fn import main
+    from infinite_fn.search import HybridFunctionSearch
+    from infinite_fn.context import ContextManager
+    from infinite_fn.sessions import Session
+
+    main._fi = function_indexer
+    main._search = HybridFunctionSearch(function_indexer)
+    main._context = ContextManager(summarizer_factory=lambda: FakeLLMInterface(latency=latency))
+    main.SEMANTIC_CACHE_ENABLED = False
+    _system_message = main.get_llm().conversation_store.get_conversation()[0]
+    _latencies = []
+
+    async def _user(idx: int) -> None:
+        _llm = FakeLLMInterface(latency=latency)
+        _llm.add_conversation_message(dict(_system_message))
+        _session = Session(f"bench-{idx}", _llm)
+        for turn in range(turns):
+            _started = time.perf_counter()
+            async with _session.lock:
+                async for _ in main.update_convo(corpus[(idx * turns + turn) % len(corpus)].query, _session):
+                    pass
+            _latencies.append(time.perf_counter() - _started)
+
+    _started = time.perf_counter()
+    await asyncio.gather(*[_user(i) for i in range(concurrency)])
+    _elapsed = time.perf_counter() - _started
+    return {"p50_ms": _percentile(_latencies, 0.5) * 1000, "p99_ms": _percentile(_latencies, 0.99) * 1000,
+            "turns_per_second": len(_latencies) / _elapsed}
+
+
+def _search_worker(barrier: any, results: any, module_dir: str, index_path: str, corpus: list[SyntheticFunction],
+                   repeat: int) -> None:
+    sys.path.insert(0, module_dir)
+    from func_ai.function_indexer import FunctionIndexer
+
+    from benchmarks.fake_llm import FakeLLMInterface
+    from infinite_fn.search import HybridFunctionSearch
+    from infinite_fn.vector_index import NumpyClient
+
+    _search = HybridFunctionSearch(FunctionIndexer(llm_interface=FakeLLMInterface(),
+                                                   chroma_client=NumpyClient(index_path, read_only=True),
+                                                   embedding_function=HashingEmbeddingFunction()))
+    barrier.wait()
+    for _ in range(repeat):
+        for fn in corpus:
+            _search.find_functions(fn.query, max_results=3)
+    results.put(repeat * len(corpus))
+
+
+def bench_workers(corpus: list[SyntheticFunction], workdir: str, workers: int, repeat: int = 3) -> dict[str, float]:
+    """
+    Runs the queries of the corpus through the hybrid search in several processes that load the index written by
+    `bench_indexing` read-only
+
+    :param corpus: The functions and their queries
+    :param workdir: The directory of the generated module and the index
+    :param workers: The number of processes
+    :param repeat: The number of times each process runs all queries
+    :return: The aggregate search throughput
+    """
+    _context = multiprocessing.get_context("spawn")
+    _barrier, _results = _context.Barrier(workers + 1), _context.Queue()
+    _processes = [_context.Process(target=_search_worker,
+                                   args=(_barrier, _results, os.path.join(workdir, "modules"),
+                                         os.path.join(workdir, f"index_{len(corpus)}"), corpus, repeat))
+                  for _ in range(workers)]
+    for process in _processes:
+        process.start()
+    _barrier.wait()
+    _started = time.perf_counter()
+    _queries = sum(_results.get() for _ in _processes)
+    _elapsed = time.perf_counter() - _started
+    for process in _processes:
+        process.join()
+    return {"queries_per_second": _queries / _elapsed}
+
+
+def _format(results: dict[str, float]) -> str:
+    return "  ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in results.items())
+
+
+def main(argv: list[str] = None) -> None:
+    _parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _parser.add_argument("--sizes", default="200,1000", help="Comma separated corpus sizes")
+    _parser.add_argument("--concurrency", default="1,8,32", help="Comma separated numbers of concurrent users")
+    _parser.add_argument("--turns", type=int, default=4, help="Turns per user")
+    _parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per LLM completion")
+    _parser.add_argument("--workers", default="1,2,4", help="Comma separated numbers of search processes")
+    _parser.add_argument("--output", default="bench_output.txt", help="The results file")
+    _args = _parser.parse_args(argv)
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+
+    from infinite_fn.search import HybridFunctionSearch
+    from infinite_fn.telemetry import telemetry
+
+    _lines = [f"# infinite-fn offline benchmarks ({time.strftime('%Y-%m-%d %H:%M:%S')}, python {sys.version.split()[0]})",
+              f"# simulated LLM latency {_args.latency}s, {_args.turns} turns per user", ""]
+    with tempfile.TemporaryDirectory(prefix="infinite_fn_bench_") as _workdir:
+        for size in (int(s) for s in _args.sizes.split(",")):
+            _corpus = generate_corpus(size)
+            _fi, _indexing = bench_indexing(_corpus, _workdir)
+            _lines.append(f"[corpus={size}] indexing        {_format(_indexing)}")
+            _lines.append(f"[corpus={size}] indexing summarized "
+                          f"{_format(bench_summarized_indexing(_corpus, _workdir, _args.latency))}")
+            _lines.append(f"[corpus={size}] search vector   {_format(bench_search(_fi, _corpus))}")
+            _hybrid = bench_search(HybridFunctionSearch(_fi), _corpus)
+            _lines.append(f"[corpus={size}] search hybrid   {_format(_hybrid)}")
+            _single = None
+            for workers in (int(w) for w in _args.workers.split(",")):
+                _throughput = bench_workers(_corpus, _workdir, workers)
+                _single = _single or _throughput["queries_per_second"] / workers
+                _throughput["speedup"] = _throughput["queries_per_second"] / _single
+                _lines.append(f"[corpus={size}] search workers={workers:<3} {_format(_throughput)}")
+            for concurrency in (int(c) for c in _args.concurrency.split(",")):
+                _turns = asyncio.run(bench_turns(_fi, _corpus, concurrency, _args.turns, _args.latency))
+                _lines.append(f"[corpus={size}] turns users={concurrency:<3} {_format(_turns)}")
+            _lines.append("")
+    _lines.append("# per-stage latency over all turns (seconds)")
+    for stage, stats in telemetry.summary().items():
+        _lines.append(f"{stage:<20} {_format(stats)}")
+    with open(_args.output, "w") as f:
+        f.write("\n".join(_lines) + "\n")
+    print("\n".join(_lines))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Builds the function index ahead of time, e.g. while building the Docker image, so that the app only has to load it:
+
+    python -m infinite_fn.build_index
+
+The index is written to INFINITE_FN_VECTOR_INDEX_PATH and the manifest to INFINITE_FN_MANIFEST_PATH.
+"""
+import logging
+
+from dotenv import load_dotenv
+
+from infinite_fn.indexing import index_modules
+from infinite_fn.startup import INDEXED_MODULES, create_function_indexer
+
+logger = logging.getLogger(__name__)
+
+
+def build_index() -> None:
+    """
+    Creates or updates the function index of the indexed modules
+
+    :return:
+    """
+    _fi = create_function_indexer()
+    _timings = index_modules(INDEXED_MODULES, _fi)
+    logger.info(f"Indexed {len(_fi._functions)} functions: "
+                f"{', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in _timings.items())}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    build_index()
@@ -0,0 +1,285 @@
+"""
+Token-budgeted conversation context.
+
+Every completion of a turn sends the whole conversation of the session, which grows by the user message, the
+reflection, the function calls and their results with each turn. `ContextManager` keeps it bounded:
+
+- tool results are compacted (records as a table, long tables cut with a summary of their numeric columns) to
+  INFINITE_FN_TOOL_RESULT_TOKENS before they are added to the conversation, see `compact_result`; results of tools that
+  declare `json_result` stay JSON, cut to INFINITE_FN_JSON_RESULT_TOKENS, because the LLM passes them on to other tools,
+- after a turn, the turns before the most recent ones are summarized in the background into a single summary message,
+- before a turn, the conversation is cut to INFINITE_FN_CONTEXT_TOKENS by dropping the oldest turns that were not
+  summarized in time, so the prompt stays bounded regardless of the length of the conversation.
+"""
+import asyncio
+import json
+import logging
+import os
+
+from infinite_fn.schema_compiler import count_tokens
+from infinite_fn.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKENS = int(os.getenv("INFINITE_FN_CONTEXT_TOKENS", "3000"))
+TOOL_RESULT_TOKENS = int(os.getenv("INFINITE_FN_TOOL_RESULT_TOKENS", "400"))
+JSON_RESULT_TOKENS = int(os.getenv("INFINITE_FN_JSON_RESULT_TOKENS", "1000"))
+SUMMARY_TOKENS = int(os.getenv("INFINITE_FN_SUMMARY_TOKENS", "200"))
+KEEP_TURNS = int(os.getenv("INFINITE_FN_CONTEXT_KEEP_TURNS", "2"))
+# older turns are summarized once the conversation uses this share of the budget
+SUMMARIZE_AT = 0.5
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+# approximate per-message overhead of the chat format
+_MESSAGE_TOKENS = 4
+
+_SUMMARIZER_PROMPT = "You summarize conversations between a user and a travel assistant. Keep only what is needed to " \
+                     "continue the conversation: the user's goals and preferences, places, dates, prices, booking " \
+                     "ids and decisions. Answer with the summary only."
+
+
+def count_message_tokens(messages: list[dict[str, any]]) -> int:
+    """
+    Approximates the prompt tokens of chat messages
+
+    :param messages: The messages
+    :return: The number of tokens
+    """
+    return sum(_MESSAGE_TOKENS + count_tokens(str(m.get("content") or "")) +
+               (count_tokens(json.dumps(m["function_call"])) if m.get("function_call") else 0) +
+               (count_tokens(json.dumps(m["tool_calls"])) if m.get("tool_calls") else 0) for m in messages)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """
+    Cuts a text to a token budget
+
+    :param text: The text
+    :param max_tokens: The token budget
+    :return: The text, followed by "... (truncated)" if it was cut
+    """
+    _tokens = count_tokens(text)
+    if _tokens <= max_tokens:
+        return text
+    _length = len(text) * max_tokens // _tokens
+    while _length > 0 and count_tokens(text[:_length]) > max_tokens:
+        _length = _length * 9 // 10
+    return f"{text[:_length]} ... (truncated)"
+
+
+def _cell(value: any) -> str:
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, (list, dict, tuple)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    return "" if value is None else str(value).replace("|", "/").replace("\n", " ")
+
+
+def _is_records(value: any) -> bool:
+    return isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(v, dict) for v in value)
+
+
+def _table(records: list[dict[str, any]], max_tokens: int) -> str:
+    _columns = list(dict.fromkeys(k for r in records for k in r))
+    # columns with the same value in every record (e.g. the location of a forecast) are stated once
+    _constant = [c for c in _columns if len(records) > 1 and len({_cell(r.get(c)) for r in records}) == 1]
+    _columns = [c for c in _columns if c not in _constant]
+    _lines = [f"{c}: {_cell(records[0].get(c))}" for c in _constant] + ["|".join(_columns)]
+    _rows = ["|".join(_cell(r.get(c)) for c in _columns) for r in records]
+    if count_tokens("\n".join(_lines + _rows)) <= max_tokens:
+        return "\n".join(_lines + _rows)
+    _numeric = {c: [r[c] for r in records if isinstance(r.get(c), (int, float)) and not isinstance(r.get(c), bool)]
+                for c in _columns}
+    _stats = [f"{c} min {min(v):.6g} mean {sum(v) / len(v):.6g} max {max(v):.6g}"
+              for c, v in _numeric.items() if len(v) == len(records)]
+    _stats = f"; over all {len(records)} rows: {', '.join(_stats)}" if _stats else ""
+    _used = count_tokens("\n".join(_lines)) + count_tokens(f"... {len(records)} more rows{_stats}")
+    _kept = 0
+    for row in _rows:
+        _used += count_tokens(row)
+        if _used > max_tokens:
+            break
+        _kept += 1
+    return "\n".join(_lines + _rows[:_kept] + [f"... {len(records) - _kept} more rows{_stats}"])
+
+
+def _json_records(records: list[dict[str, any]], max_tokens: int) -> str:
+    _text = json.dumps(records, separators=(",", ":"), default=str)
+    if count_tokens(_text) <= max_tokens:
+        return _text
+    # keep whole records so that the result stays valid JSON the LLM can pass on to other tools
+    _note = f"\n({len(records)} items, only the first {{}} are shown)"
+    _budget = max_tokens - count_tokens(_note.format(len(records)))
+    _kept, _used = [], 1
+    for record in records:
+        _item = json.dumps(record, separators=(",", ":"), default=str)
+        _used += count_tokens(_item) + 1
+        if _used > _budget:
+            break
+        _kept.append(_item)
+    return f"[{','.join(_kept)}]{_note.format(len(_kept))}"
+
+
+def compact_result(result: any, max_tokens: int = TOOL_RESULT_TOKENS, as_json: bool = False) -> str:
+    """
+    Formats a tool result compactly for the conversation: lists of records become a table with one header row, tables
+    that do not fit the budget are cut and summarized, other values are compact JSON or text cut to the budget
+
+    :param result: The result of the tool
+    :param max_tokens: The token budget
+    :param as_json: Whether lists of records are kept as JSON, cut to the whole records that fit the budget
+    :return: The formatted result
+    """
+    if isinstance(result, str):
+        return truncate(result, max_tokens)
+    if as_json and _is_records(result):
+        return _json_records(list(result), max_tokens)
+    if _is_records(result):
+        return truncate(_table(list(result), max_tokens), max_tokens)
+    if isinstance(result, dict) and any(_is_records(v) for v in result.values()):
+        # e.g. the attractions of several locations: one table per key
+        _share = max(max_tokens // len(result), 1)
+        return truncate("\n".join(f"{k}:\n{_table(list(v), _share)}" if _is_records(v) else f"{k}: {_cell(v)}"
+                                  for k, v in result.items()), max_tokens)
+    try:
+        return truncate(json.dumps(result, separators=(",", ":")), max_tokens)
+    except TypeError:
+        return truncate(str(result), max_tokens)
+
+
+def _is_summary(message: dict[str, any]) -> bool:
+    return message["role"] == "system" and str(message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+def split_conversation(conversation: list[dict[str, any]]) -> tuple[list[dict[str, any]], dict[str, any] | None,
+                                                                    list[list[dict[str, any]]]]:
+    """
+    Splits a conversation into its system messages, its summary message and its turns. A turn starts with a user
+    message, so function calls and their results always stay in the turn that made them.
+
+    :param conversation: The messages
+    :return: The system messages, the summary message (None if there is none) and the list of turns
+    """
+    _system = [m for m in conversation if m["role"] == "system" and not _is_summary(m)]
+    _summary = next((m for m in conversation if _is_summary(m)), None)
+    _turns = []
+    for message in conversation:
+        if message["role"] == "system":
+            continue
+        if message["role"] == "user" or len(_turns) == 0:
+            _turns.append([])
+        _turns[-1].append(message)
+    return _system, _summary, _turns
+
+
+class ContextManager(object):
+    """
+    Keeps the conversations of the sessions within a token budget, summarizing old turns in the background
+    """
+
+    def __init__(self, summarizer_factory: callable = None, budget: int = CONTEXT_TOKENS,
+                 keep_turns: int = KEEP_TURNS, summary_tokens: int = SUMMARY_TOKENS,
+                 on_update: callable = None) -> None:
+        """
+        :param summarizer_factory: Returns a new async LLM interface to write the summaries. Without one, old turns are
+                                   only dropped when the conversation exceeds the budget.
+        :param budget: The maximum number of prompt tokens of the conversation at the start of a turn
+        :param keep_turns: The number of most recent turns that are never summarized
+        :param summary_tokens: The maximum number of tokens of a summary
+        :param on_update: Called with the session after its conversation was summarized (e.g. to save it)
+        """
+        self._summarizer_factory = summarizer_factory
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self._on_update = on_update
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def fit(self, session: any) -> int:
+        """
+        Drops the oldest turns of a session until its conversation fits the budget (and the message limit of the
+        session). The most recent turn is always kept. Called before a turn, on the request path.
+
+        :param session: The session
+        :return: The number of dropped turns
+        """
+        session.trim()
+        _store = session.llm_interface.conversation_store
+        _system, _summary, _turns = split_conversation(_store.conversation)
+        _head = _system + ([_summary] if _summary is not None else [])
+        _tokens = count_message_tokens(_head) + sum(count_message_tokens(t) for t in _turns)
+        _dropped = 0
+        while len(_turns) > 1 and _tokens > self.budget:
+            _tokens -= count_message_tokens(_turns.pop(0))
+            _dropped += 1
+        if _dropped > 0:
+            logger.debug(f"Dropped {_dropped} turns of session {session.session_id} to fit {self.budget} tokens")
+            _store.conversation = _head + [m for t in _turns for m in t]
+        return _dropped
+
+    def schedule(self, session: any) -> asyncio.Task | None:
+        """
+        Starts summarizing the older turns of a session in the background once the conversation uses a large share
+        of the budget or of the message limit. Called after a turn.
+
+        :param session: The session
+        :return: The summarization task, None if there is nothing to summarize yet
+        """
+        if self._summarizer_factory is None:
+            return None
+        _task = self._tasks.get(session.session_id)
+        if _task is not None and not _task.done():
+            return _task
+        _conversation = session.llm_interface.conversation_store.conversation
+        _, _, _turns = split_conversation(_conversation)
+        if len(_turns) <= self.keep_turns:
+            return None
+        if count_message_tokens(_conversation) <= self.budget * SUMMARIZE_AT and \
+                sum(len(t) for t in _turns) <= session.max_messages * SUMMARIZE_AT:
+            return None
+        _task = asyncio.get_running_loop().create_task(self.summarize(session))
+        self._tasks[session.session_id] = _task
+        _task.add_done_callback(lambda t: self._tasks.pop(session.session_id, None) if
+                                self._tasks.get(session.session_id) is t else None)
+        return _task
+
+    async def summarize(self, session: any) -> None:
+        """
+        Replaces all but the most recent turns of a session, and the previous summary, with a new summary.
+        The summary is written without holding the session lock; it is swapped in between turns.
+
+        :param session: The session
+        :return:
+        """
+        _system, _summary, _turns = split_conversation(session.llm_interface.conversation_store.conversation)
+        _old = [m for t in _turns[:-self.keep_turns] for m in t]
+        if len(_old) == 0:
+            return
+        _transcript = "\n".join(
+            f"{m['role']}{' ' + m['name'] if m.get('name') else ''}: "
+            f"{compact_result(m.get('content') or m.get('function_call') or m.get('tool_calls') or '')}"
+            for m in _old)
+        _previous = f"{_summary['content'][len(SUMMARY_PREFIX):]}\n" if _summary is not None else ""
+        _llm = self._summarizer_factory()
+        _llm.add_conversation_message({"role": "system", "content": _SUMMARIZER_PROMPT})
+        try:
+            with telemetry.span("summarize", llm_interface=_llm, messages=len(_old)):
+                _text = (await _llm.asend(f"{_previous}{_transcript}\n\nSummarize the conversation above in at most "
+                                          f"{self.summary_tokens} tokens."))["content"]
+        except Exception:
+            logger.exception(f"Failed to summarize session {session.session_id}")
+            return
+        async with session.lock:
+            _store = session.llm_interface.conversation_store
+            _last = next((idx for idx, m in enumerate(_store.conversation) if m is _old[-1]), None)
+            if _last is None:
+                # the conversation was trimmed or reloaded meanwhile
+                return
+            _new_summary = {"role": "system", "content": f"{SUMMARY_PREFIX}{truncate(_text, self.summary_tokens)}"}
+            _store.conversation = [m for m in _store.conversation if m["role"] == "system" and not _is_summary(m)] + \
+                                  [_new_summary] + [m for m in _store.conversation[_last + 1:] if m["role"] != "system"]
+            if self._on_update is not None:
+                try:
+                    self._on_update(session)
+                except Exception as e:
+                    # e.g. the session was saved by another worker meanwhile, its conversation is kept
+                    logger.warning(f"Failed to save the summary of session {session.session_id}: {repr(e)}")
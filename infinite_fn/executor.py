@@ -0,0 +1,138 @@
+"""
+Concurrent execution of the tool calls requested by the LLM.
+
+Results of cacheable tools (see `infinite_fn.tool_registry`) are memoized by normalized arguments, so repeated lookups
+skip execution. Side-effecting tools always run. A call that times out keeps running on its thread; for a
+side-effecting tool the LLM is told that it is still running, not that it failed, so it does not repeat the call (e.g.
+make a second booking). Results are compacted to a token budget before they are added to the
+conversation (see `infinite_fn.context.compact_result`).
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from infinite_fn.context import JSON_RESULT_TOKENS, compact_result
+from infinite_fn.schema_compiler import compact_schema
+from infinite_fn.telemetry import telemetry
+from infinite_fn.tool_registry import ToolResultCache, ToolSpec, tool_spec
+
+if TYPE_CHECKING:
+    from func_ai.utils.llm_tools import OpenAIFunctionWrapper
+
+logger = logging.getLogger(__name__)
+
+TOOL_WORKERS = int(os.getenv("INFINITE_FN_TOOL_WORKERS", "16"))
+TOOL_TIMEOUT = float(os.getenv("INFINITE_FN_TOOL_TIMEOUT", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+tool_results = ToolResultCache()
+
+
+def tool_schemas(wrappers: list["OpenAIFunctionWrapper"]) -> list[dict[str, any]]:
+    """
+    Returns the `tools` parameter of the chat completion API for a list of functions, with their compact schemas
+
+    :param wrappers: The function wrappers
+    :return: List of tool definitions
+    """
+    return [{"type": "function", "function": compact_schema(w)} for w in wrappers]
+
+
+async def aexecute(wrapper: "OpenAIFunctionWrapper", arguments: str, timeout: float = TOOL_TIMEOUT) -> str:
+    """
+    Executes a function call on the tool thread pool, or returns its memoized result if the tool is cacheable
+
+    :param wrapper: The function wrapper
+    :param arguments: The JSON arguments of the call
+    :param timeout: The maximum number of seconds to wait, unless the tool declares its own timeout
+    :return: The compacted result, or an error message if the call failed or timed out
+    """
+    _name = wrapper.name
+    _spec = tool_spec(wrapper.func)
+    _timeout = _spec.timeout if _spec is not None and _spec.timeout is not None else timeout
+    with telemetry.span("function_execution", function=_name) as _span:
+        try:
+            _arguments = json.loads(arguments or "{}")
+            _key = tool_results.key(wrapper.func, _arguments)
+            if _key is not None:
+                _found, _result = tool_results.get(_key)
+                if _found:
+                    _span.set(cached=True)
+                    return _compact(_spec, _result)
+            _future = asyncio.get_running_loop().run_in_executor(_executor,
+                                                                 functools.partial(wrapper.func, **_arguments))
+            _result = await asyncio.wait_for(asyncio.shield(_future), timeout=_timeout)
+            if _key is not None:
+                tool_results.put(_key, wrapper.func, _result)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool call {_name} timed out after {_timeout}s")
+            _future.add_done_callback(functools.partial(_log_late_result, _name, arguments))
+            if _spec is not None and _spec.side_effect:
+                _result = f"{_name} did not complete within {_timeout} seconds and is still running, it may still " \
+                          f"succeed. Do not call {_name} again; tell the user to check the result later."
+                _span.set(error="timeout", still_running=True)
+            else:
+                _result = f"Error: {_name} did not complete within {_timeout} seconds"
+                _span.set(error="timeout")
+        except Exception as e:
+            logger.warning(f"Failed to process call of {_name}: {arguments}")
+            _result = f"Error: {repr(e)}"
+            _span.set(error=repr(e))
+    return _compact(_spec, _result)
+
+
+def _compact(spec: ToolSpec, result: any) -> str:
+    if spec is not None and spec.json_result:
+        return compact_result(result, JSON_RESULT_TOKENS, as_json=True)
+    return compact_result(result)
+
+
+def _log_late_result(name: str, arguments: str, future: asyncio.Future) -> None:
+    if future.exception() is not None:
+        logger.warning(f"Timed out call of {name} with {arguments} failed: {repr(future.exception())}")
+    else:
+        logger.info(f"Timed out call of {name} with {arguments} completed")
+
+
+async def aexecute_tool_calls(wrappers: dict[str, "OpenAIFunctionWrapper"], tool_calls: list[dict[str, any]],
+                              timeout: float = TOOL_TIMEOUT) -> list[dict[str, any]]:
+    """
+    Executes the tool calls of a LLM message concurrently on the tool thread pool
+
+    :param wrappers: Dictionary of function name to the function wrapper that may be called
+    :param tool_calls: The `tool_calls` of the LLM message
+    :param timeout: The maximum number of seconds to wait for each call, unless the tool declares its own timeout
+    :return: The tool response messages in the order of the tool calls
+    """
+
+    async def _execute(tool_call: dict[str, any]) -> dict[str, any]:
+        _name = tool_call["function"]["name"]
+        if _name not in wrappers:
+            _content = f"Error: {repr(ValueError(f'Unknown function: {_name}'))}"
+        else:
+            _content = await aexecute(wrappers[_name], tool_call["function"]["arguments"], timeout)
+        return {"role": "tool", "tool_call_id": tool_call["id"], "name": _name, "content": _content}
+
+    return list(await asyncio.gather(*[_execute(tc) for tc in tool_calls]))
+
+
+async def aexecute_function_call(wrapper: "OpenAIFunctionWrapper", llm_message: dict[str, any],
+                                 timeout: float = TOOL_TIMEOUT) -> dict[str, any]:
+    """
+    Executes the `function_call` of a LLM message. See `aexecute`.
+
+    :param wrapper: The function wrapper
+    :param llm_message: The LLM message containing the function call
+    :param timeout: The maximum number of seconds to wait, unless the tool declares its own timeout
+    :return: The function response message
+    """
+    _function_call = llm_message["function_call"]
+    if _function_call["name"] != wrapper.name:
+        _content = f"Error: {repr(ValueError(f'Function name does not match: {llm_message}'))}"
+    else:
+        _content = await aexecute(wrapper, _function_call["arguments"], timeout)
+    return {"role": "function", "name": wrapper.name, "content": _content}
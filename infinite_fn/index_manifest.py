@@ -0,0 +1,122 @@
+"""
+Persistent manifest of indexed functions.
+
+The manifest records a content hash (source, signature and docstring) for every function that has been indexed so that
+subsequent start-ups only need to summarize and embed functions that are new or have changed.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+DEFAULT_MANIFEST_PATH = os.getenv("INFINITE_FN_MANIFEST_PATH", "./index_manifest.json")
+
+
+def function_identifier(func: callable) -> str:
+    """
+    Returns the fully qualified identifier of a function (e.g. "infinite_fn.python_fns.trip.book_trip")
+
+    :param func: The function
+    :return: The identifier of the function
+    """
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def function_content_hash(func: callable) -> str:
+    """
+    Returns a hash of the function's identifier, signature, docstring and source code.
+
+    :param func: The function to hash
+    :return: A hex digest which changes whenever the function's code or documentation changes
+    """
+    try:
+        _source = inspect.getsource(func)
+    except (OSError, TypeError):
+        _source = ""
+    _hash = hashlib.sha1()
+    for part in (function_identifier(func), str(inspect.signature(func)), inspect.getdoc(func) or "", _source):
+        _hash.update(part.encode())
+        _hash.update(b"\0")
+    return _hash.hexdigest()
+
+
+class IndexManifest(object):
+    """
+    A JSON backed manifest of indexed functions keyed by function identifier
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH) -> None:
+        """
+        Loads the manifest from disk if it exists
+
+        :param path: The path of the manifest file
+        """
+        self.path = path
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f).get("functions", {})
+
+    def get(self, identifier: str) -> dict[str, str] | None:
+        """
+        Returns the manifest entry for a function
+
+        :param identifier: The function identifier
+        :return: The entry (module, content_hash, index_id) or None if the function is not in the manifest
+        """
+        return self._entries.get(identifier)
+
+    def is_current(self, func: callable) -> bool:
+        """
+        Checks whether a function is in the manifest with the same content hash
+
+        :param func: The function to check
+        :return: True if the function has not changed since it was last indexed
+        """
+        _entry = self.get(function_identifier(func))
+        return _entry is not None and _entry["content_hash"] == function_content_hash(func)
+
+    def identifiers(self, module_name: str = None) -> list[str]:
+        """
+        Returns the identifiers of all functions in the manifest
+
+        :param module_name: If specified only returns functions of this module
+        :return: List of function identifiers
+        """
+        return [k for k, v in self._entries.items() if module_name is None or v["module"] == module_name]
+
+    def update(self, func: callable, index_id: str) -> None:
+        """
+        Records a function as indexed
+
+        :param func: The function that was indexed
+        :param index_id: The id under which the function is stored in the vector index
+        :return:
+        """
+        self._entries[function_identifier(func)] = {
+            "module": func.__module__,
+            "content_hash": function_content_hash(func),
+            "index_id": index_id,
+        }
+
+    def remove(self, identifier: str) -> dict[str, str] | None:
+        """
+        Removes a function from the manifest
+
+        :param identifier: The function identifier
+        :return: The removed entry or None if the function was not in the manifest
+        """
+        return self._entries.pop(identifier, None)
+
+    def save(self) -> None:
+        """
+        Atomically writes the manifest to disk
+
+        :return:
+        """
+        _dir = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(_dir, exist_ok=True)
+        _tmp_path = f"{self.path}.tmp"
+        with open(_tmp_path, "w") as f:
+            json.dump({"functions": self._entries}, f, indent=2, sort_keys=True)
+        os.replace(_tmp_path, self.path)
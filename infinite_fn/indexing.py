@@ -0,0 +1,163 @@
+"""
+Incremental, parallel indexing of python function modules into the function index
+"""
+import importlib
+import inspect
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from func_ai.function_indexer import FunctionIndexer
+from func_ai.utils.llm_tools import OpenAIFunctionWrapper, OpenAIInterface
+
+from infinite_fn.index_manifest import IndexManifest, function_identifier
+from infinite_fn.schema_compiler import schema_compiler
+from infinite_fn.telemetry import telemetry
+from infinite_fn.tool_registry import module_tools
+
+logger = logging.getLogger(__name__)
+
+INDEX_WORKERS = int(os.getenv("INFINITE_FN_INDEX_WORKERS", "8"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("INFINITE_FN_EMBEDDING_BATCH_SIZE", "64"))
+
+_SUMMARIZER_PROMPT = "You are an expert summarizer. Your purpose is to provide a good summary of the function so that " \
+                     "the user can add the summary in an embedding database which will them be searched."
+
+
+def module_functions(module_name: str) -> list[callable]:
+    """
+    Returns the tools of a module, i.e. the functions registered with the `tool` decorator. Helper functions and
+    functions imported from other modules are skipped.
+
+    :param module_name: The name of the module (e.g. "infinite_fn.python_fns.trip")
+    :return: List of functions
+    """
+    importlib.import_module(module_name)
+    return module_tools(module_name)
+
+
+def summarize_function(func: callable, llm_factory: callable = None) -> str:
+    """
+    Uses the LLM to write a summary of the function that is suitable for semantic search
+
+    :param func: The function to summarize
+    :param llm_factory: Returns a new LLM interface to write the summary. Defaults to an `OpenAIInterface`.
+    :return: The summary
+    """
+    _summarizer = llm_factory() if llm_factory is not None else OpenAIInterface(max_tokens=200)
+    _summarizer.add_conversation_message({"role": "system", "content": _SUMMARIZER_PROMPT})
+    return _summarizer.send(f"Summarize the function below.\n\n{inspect.getsource(func)}")['content']
+
+
+def _log_stage(stage: str, done: int, total: int, started: float) -> None:
+    logger.info(f"Indexing [{stage}] {done}/{total} ({time.perf_counter() - started:.2f}s)")
+
+
+def index_modules(module_names: list[str], function_indexer: FunctionIndexer, manifest: IndexManifest = None,
+                  enhanced_summary: bool = True, max_workers: int = INDEX_WORKERS,
+                  batch_size: int = EMBEDDING_BATCH_SIZE,
+                  summarizer: callable = summarize_function) -> dict[str, float]:
+    """
+    Indexes all functions in a list of modules. Only functions that are new or have changed since the last run are
+    summarized and embedded. Functions that were removed from the modules are removed from the index.
+
+    Summaries are generated concurrently on a bounded thread pool, embeddings are computed in batches and the
+    documents are upserted into the collection in a single bulk request. A function whose summary fails is indexed
+    with its description instead, so one failed request does not lose the other functions.
+
+    :param module_names: The names of the modules to index (e.g. ["infinite_fn.python_fns.trip"])
+    :param function_indexer: The function indexer to use
+    :param manifest: The manifest of already indexed functions
+    :param enhanced_summary: Whether to use LLM generated summaries for the function documents
+    :param max_workers: The maximum number of concurrent summary and embedding requests
+    :param batch_size: The maximum number of documents per embedding request
+    :param summarizer: Returns the summary of a function, see `summarize_function`
+    :return: The time in seconds spent in each indexing stage
+    """
+    manifest = manifest if manifest is not None else IndexManifest()
+    timings = {}
+    with telemetry.span("index_discover", modules=len(module_names)):
+        _started = time.perf_counter()
+        functions = [f for m in module_names for f in module_functions(m)]
+        schema_compiler.compile_functions(functions)
+        _current = {function_identifier(f) for f in functions}
+        _changed = [f for f in functions if
+                    not manifest.is_current(f) or manifest.get(function_identifier(f))["index_id"]
+                    not in function_indexer._functions]
+        _removed = [i for m in module_names for i in manifest.identifiers(m) if i not in _current]
+        _stale_ids = [manifest.get(function_identifier(f))["index_id"] for f in _changed if
+                      manifest.get(function_identifier(f)) is not None]
+        for identifier in _removed:
+            _stale_ids.append(manifest.remove(identifier)["index_id"])
+        if len(_stale_ids) > 0:
+            function_indexer._collection.delete(ids=_stale_ids)
+            for _id in _stale_ids:
+                function_indexer._functions.pop(_id, None)
+        timings["discover"] = time.perf_counter() - _started
+    logger.info(f"Indexing [discover] {len(functions) - len(_changed)} unchanged, {len(_changed)} new or changed, "
+                f"{len(_removed)} removed ({timings['discover']:.2f}s)")
+    if len(_changed) == 0:
+        manifest.save()
+        return timings
+
+    _wrappers = [OpenAIFunctionWrapper.from_python_function(func=f, llm_interface=function_indexer._llm_interface)
+                 for f in _changed]
+    with telemetry.span("index_summarize", functions=len(_changed)):
+        _started = time.perf_counter()
+        if enhanced_summary:
+            _docs = [w.description for w in _wrappers]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                _futures = {executor.submit(summarizer, f): idx for idx, f in enumerate(_changed)}
+                for done, future in enumerate(as_completed(_futures), start=1):
+                    try:
+                        _docs[_futures[future]] = future.result()
+                    except Exception:
+                        logger.exception(f"Failed to summarize {function_identifier(_changed[_futures[future]])}, "
+                                         f"indexing its description instead")
+                    _log_stage("summarize", done, len(_changed), _started)
+        else:
+            _docs = [w.description for w in _wrappers]
+        timings["summarize"] = time.perf_counter() - _started
+
+    with telemetry.span("index_embed", functions=len(_changed)):
+        _started = time.perf_counter()
+        _batches = [_docs[i:i + batch_size] for i in range(0, len(_docs), batch_size)]
+        _embeddings = [None] * len(_batches)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            _futures = {executor.submit(function_indexer._embedding_function, b): idx
+                        for idx, b in enumerate(_batches)}
+            for done, future in enumerate(as_completed(_futures), start=1):
+                _embeddings[_futures[future]] = future.result()
+                _log_stage("embed", done, len(_batches), _started)
+        timings["embed"] = time.perf_counter() - _started
+
+    with telemetry.span("index_write", functions=len(_changed)):
+        _started = time.perf_counter()
+        function_indexer._collection.upsert(ids=[w.hash for w in _wrappers],
+                                            embeddings=[e for b in _embeddings for e in b],
+                                            documents=_docs,
+                                            metadatas=[{"name": w.name, "identifier": w.identifier, "hash": w.hash,
+                                                        "is_partial": str(w.is_partial), **w.metadata_dict}
+                                                       for w in _wrappers])
+        function_indexer._functions.update({w.hash: w for w in _wrappers})
+        for f, w in zip(_changed, _wrappers):
+            manifest.update(f, index_id=w.hash)
+        manifest.save()
+        timings["write"] = time.perf_counter() - _started
+    _log_stage("write", len(_wrappers), len(_wrappers), _started)
+    return timings
+
+
+def index_module(module_name: str, function_indexer: FunctionIndexer, manifest: IndexManifest = None,
+                 enhanced_summary: bool = True) -> dict[str, float]:
+    """
+    Indexes all functions in a module. See `index_modules`.
+
+    :param module_name: The name of the module to index (e.g. "func_ai.utils")
+    :param function_indexer: The function indexer to use
+    :param manifest: The manifest of already indexed functions
+    :param enhanced_summary: Whether to use LLM generated summaries for the function documents
+    :return: The time in seconds spent in each indexing stage
+    """
+    return index_modules([module_name], function_indexer, manifest=manifest, enhanced_summary=enhanced_summary)
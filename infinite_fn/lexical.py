@@ -0,0 +1,91 @@
+"""
+Okapi BM25 inverted index over function names, docstrings and parameter names
+"""
+import inspect
+import math
+import re
+from collections import Counter, defaultdict
+
+_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "e", "for", "g", "given", "if", "in", "is", "it", "of",
+              "on", "or", "the", "this", "to", "which", "will", "with", "param", "return", "returns"}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits a text into lower case terms. snake_case identifiers produce both the identifier and its parts.
+
+    :param text: The text to tokenize
+    :return: List of terms
+    """
+    _terms = []
+    for word in re.findall(r"[A-Za-z0-9_]+", text.lower()):
+        _parts = [p for p in word.split("_") if p]
+        if len(_parts) > 1:
+            _terms.append(word)
+        _terms.extend(p for p in _parts if p not in _STOPWORDS)
+    return _terms
+
+
+def function_document(func: callable, name: str = None, parameters: list[str] = None) -> str:
+    """
+    Returns the text that is lexically indexed for a function
+
+    :param func: The function
+    :param name: The function name. Defaults to the name of func.
+    :param parameters: The parameter names. Defaults to the parameters of func.
+    :return: The function name, parameter names and docstring
+    """
+    _target = getattr(func, "func", func)
+    name = name if name is not None else _target.__name__
+    parameters = parameters if parameters is not None else list(inspect.signature(_target).parameters)
+    return " ".join([name, " ".join(parameters), inspect.getdoc(_target) or ""])
+
+
+class BM25Index(object):
+    """
+    An inverted index whose postings hold the precomputed BM25 weight of each (term, document) pair so that scoring a
+    query is a sum over the postings of the query terms
+    """
+
+    def __init__(self, documents: dict[str, str], k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Builds the index
+
+        :param documents: Dictionary of document id to document text
+        :param k1: Term frequency saturation
+        :param b: Document length normalization
+        """
+        self.ids = list(documents.keys())
+        _tokenized = [tokenize(documents[_id]) for _id in self.ids]
+        _avg_len = sum(len(t) for t in _tokenized) / len(_tokenized) if len(_tokenized) > 0 else 0.0
+        _df = Counter(term for terms in _tokenized for term in set(terms))
+        _n = len(_tokenized)
+        self._postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for doc_idx, terms in enumerate(_tokenized):
+            _norm = k1 * (1 - b + b * len(terms) / _avg_len) if _avg_len > 0 else k1
+            for term, tf in Counter(terms).items():
+                _idf = math.log(1 + (_n - _df[term] + 0.5) / (_df[term] + 0.5))
+                self._postings[term].append((doc_idx, _idf * tf * (k1 + 1) / (tf + _norm)))
+
+    def scores(self, query: str) -> dict[str, float]:
+        """
+        Scores all documents that contain at least one query term
+
+        :param query: The query
+        :return: Dictionary of document id to BM25 score
+        """
+        _scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for doc_idx, weight in self._postings.get(term, ()):
+                _scores[doc_idx] += weight
+        return {self.ids[idx]: score for idx, score in _scores.items()}
+
+    def search(self, query: str, max_results: int = 10) -> list[tuple[str, float]]:
+        """
+        Returns the best matching documents
+
+        :param query: The query
+        :param max_results: Maximum number of results
+        :return: List of (document id, score) ordered by descending score
+        """
+        return sorted(self.scores(query).items(), key=lambda x: x[1], reverse=True)[:max_results]
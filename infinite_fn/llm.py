@@ -0,0 +1,134 @@
+"""
+Asyncio native LLM and function index helpers used by the chat request path
+"""
+import asyncio
+import logging
+import os
+from typing import AsyncIterator
+
+import aiohttp
+import openai
+from func_ai.function_indexer import FunctionIndexer
+from func_ai.utils.llm_tools import OpenAIInterface
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("INFINITE_FN_HTTP_POOL_SIZE", "100"))
+HTTP_TIMEOUT = float(os.getenv("INFINITE_FN_HTTP_TIMEOUT", "60"))
+INTERRUPTED_NOTE = "(The answer was interrupted by an error.)"
+
+_http_sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Returns the connection pooled HTTP session of the running event loop. The session is created on first use.
+
+    :return: The HTTP session
+    """
+    _loop = asyncio.get_running_loop()
+    _session = _http_sessions.get(_loop)
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE),
+                                         timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+        _http_sessions[_loop] = _session
+    return _session
+
+
+async def close_http_sessions() -> None:
+    """
+    Closes all pooled HTTP sessions
+
+    :return:
+    """
+    for _loop, _session in list(_http_sessions.items()):
+        if _loop is asyncio.get_running_loop():
+            await _session.close()
+            del _http_sessions[_loop]
+
+
+class AsyncOpenAIInterface(OpenAIInterface):
+    """
+    OpenAI interface with non-blocking counterparts of `send` and `update_llm_conversation`.
+    All requests share the connection pool of the running event loop.
+    """
+
+    def _request_params(self, **kwargs) -> dict[str, any]:
+        _functions = kwargs.get("functions", None)
+        _tools = kwargs.get("tools", None)
+        _params = dict(model=kwargs.get("model", self.model),
+                       messages=self.conversation_store.get_conversation(),
+                       temperature=kwargs.get("temperature", self.temperature),
+                       top_p=1.0,
+                       frequency_penalty=0.0,
+                       presence_penalty=0.0,
+                       max_tokens=kwargs.get("max_tokens", self.max_tokens))
+        if _functions:
+            _params.update(functions=_functions, function_call="auto")
+        if _tools:
+            _params.update(tools=_tools, tool_choice="auto")
+        return _params
+
+    async def aupdate_llm_conversation(self, **kwargs) -> "AsyncOpenAIInterface":
+        """
+        Sends the updated conversation to the LLM without blocking the event loop
+
+        :param kwargs: Parameters to pass to the API
+        :return:
+        """
+        _params = self._request_params(**kwargs)
+        openai.aiosession.set(get_http_session())
+        response = await openai.ChatCompletion.acreate(**_params)
+        self.update_cost(_params["model"], response)
+        self.conversation_store.add_message(response["choices"][0]["message"])
+        return self
+
+    async def astream(self, **kwargs) -> AsyncIterator[str]:
+        """
+        Sends the updated conversation to the LLM and yields the response content as it is generated.
+        The complete response is added to the conversation once the stream ends. If the request fails, the partial
+        response is added with a note that it was interrupted and the error is raised.
+        Note: streamed responses do not report token usage so they are not included in the usage.
+
+        :param kwargs: Parameters to pass to the API
+        :return: Async iterator of content deltas
+        """
+        _params = self._request_params(**kwargs)
+        openai.aiosession.set(get_http_session())
+        _content = []
+        try:
+            async for chunk in await openai.ChatCompletion.acreate(**_params, stream=True):
+                _delta = chunk["choices"][0]["delta"].get("content")
+                if _delta:
+                    _content.append(_delta)
+                    yield _delta
+        except Exception as e:
+            _content.append(f"{' ' if _content else ''}{INTERRUPTED_NOTE}")
+            self.conversation_store.add_message({"role": "assistant", "content": "".join(_content)})
+            logger.warning(f"Streaming the response failed after {len(_content) - 1} deltas: {repr(e)}")
+            raise
+        self.conversation_store.add_message({"role": "assistant", "content": "".join(_content)})
+
+    async def asend(self, prompt: str, **kwargs) -> dict[str, any]:
+        """
+        Sends a user prompt to the LLM without blocking the event loop
+
+        :param prompt: The user prompt
+        :param kwargs: Parameters to pass to the API
+        :return: The response message
+        """
+        self.conversation_store.add_message({"role": "user", "content": prompt})
+        logger.debug(f"Prompt: {prompt}")
+        await self.aupdate_llm_conversation(**kwargs)
+        return self.conversation_store.get_last_message()
+
+
+async def aembed(function_indexer: FunctionIndexer, text: str) -> list[float]:
+    """
+    Embeds a text with the embedding function of the function index without blocking the event loop
+
+    :param function_indexer: The function indexer whose embedding function to use
+    :param text: The text to embed
+    :return: The embedding
+    """
+    return (await asyncio.to_thread(function_indexer._embedding_function, [text]))[0]
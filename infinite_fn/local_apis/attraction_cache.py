@@ -0,0 +1,270 @@
+"""
+Persistent per-location cache of structured attraction lists
+"""
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+ATTRACTION_CACHE_PATH = os.getenv("INFINITE_FN_ATTRACTION_CACHE_PATH", "./attraction_cache.json")
+ATTRACTION_CACHE_TTL = float(os.getenv("INFINITE_FN_ATTRACTION_CACHE_TTL", str(7 * 24 * 3600)))
+ATTRACTION_BATCH_SIZE = int(os.getenv("INFINITE_FN_ATTRACTION_BATCH_SIZE", "5"))
+ATTRACTION_PREWARM = [_l.strip() for _l in
+                      os.getenv("INFINITE_FN_ATTRACTION_PREWARM", "London,Paris,Rome,New York,Tokyo").split(",")
+                      if _l.strip()]
+MAX_ATTRACTIONS = 10
+
+
+def attraction_prompt(locations: list[str]) -> str:
+    """
+    Returns the prompt that asks for the attractions of several locations at once
+
+    :param locations: The locations (e.g. ["London", "Paris"])
+    :return: The prompt
+    """
+    return (f"What are the best attractions in each of these locations: {json.dumps(locations)}? "
+            f"Give at most {MAX_ATTRACTIONS} attractions per location with a short description for each. "
+            "Respond only with a JSON object that maps each location, exactly as written above, to a list of "
+            "objects with \"name\" and \"description\" keys.")
+
+
+def parse_attractions(text: str, locations: list[str]) -> dict[str, list[dict[str, str]]]:
+    """
+    Parses the LLM response to `attraction_prompt`
+
+    :param text: The response
+    :param locations: The requested locations
+    :return: The attractions of each location found in the response
+    """
+    _start, _end = text.find("{"), text.rfind("}")
+    if _start < 0 or _end < _start:
+        logger.warning(f"Attraction response is not a JSON object: {text[:200]}")
+        return {}
+    try:
+        _parsed = json.loads(text[_start:_end + 1])
+    except json.JSONDecodeError:
+        logger.warning(f"Attraction response is not valid JSON: {text[:200]}")
+        return {}
+    _by_key = {str(k).strip().casefold(): v for k, v in _parsed.items()}
+    _attractions = {}
+    for location in locations:
+        _items = _by_key.get(location.strip().casefold())
+        if not isinstance(_items, list):
+            continue
+        _attractions[location] = [{"name": str(a.get("name", "")), "description": str(a.get("description", ""))}
+                                  for a in _items[:MAX_ATTRACTIONS] if isinstance(a, dict) and a.get("name")]
+    return _attractions
+
+
+class LLMAttractionLoader(object):
+    """
+    Loads the attractions of several locations with one completion per batch of locations
+    """
+
+    def __init__(self, llm_factory: callable, batch_size: int = ATTRACTION_BATCH_SIZE,
+                 tokens_per_location: int = 600) -> None:
+        """
+        :param llm_factory: A callable that takes max_tokens and returns an LLM interface with a `send(prompt)` method
+        :param batch_size: The maximum number of locations per prompt
+        :param tokens_per_location: The completion tokens reserved for each location
+        """
+        self._llm_factory = llm_factory
+        self.batch_size = batch_size
+        self.tokens_per_location = tokens_per_location
+
+    def __call__(self, locations: list[str]) -> dict[str, list[dict[str, str]]]:
+        _attractions = {}
+        for i in range(0, len(locations), self.batch_size):
+            _batch = locations[i:i + self.batch_size]
+            _llm = self._llm_factory(max_tokens=self.tokens_per_location * len(_batch))
+            _attractions.update(parse_attractions(_llm.send(attraction_prompt(_batch))['content'], _batch))
+        return _attractions
+
+
+class AttractionCache(object):
+    """
+    Caches the attractions of each location with a TTL and persists them to a JSON file, so that repeated
+    locations do not cost an LLM call, even after a restart. Concurrent requests for a location that is being loaded
+    wait for that load instead of starting their own; loads of different locations run concurrently.
+
+    Several processes (e.g. the workers of `serve`) can share the file: writes merge the entries on disk under a
+    file lock, and the file is read again when it changed before locations are loaded.
+    """
+
+    def __init__(self, loader: callable, path: str = ATTRACTION_CACHE_PATH, ttl: float = ATTRACTION_CACHE_TTL,
+                 clock: callable = time.time) -> None:
+        """
+        Initializes the cache and loads the persisted attractions
+
+        :param loader: A callable that takes a list of locations and returns a dictionary of location to attractions
+        :param path: The JSON file of the cache, None to keep the cache in memory only
+        :param ttl: The number of seconds the attractions of a location are kept
+        :param clock: The wall clock used for expiry
+        """
+        self._loader = loader
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: dict[str, dict[str, any]] = {}
+        self._lock = threading.Lock()
+        # location key -> the load of its attractions that is in progress
+        self._inflight: dict[str, Future] = {}
+        self._write_lock = threading.Lock()
+        # the modification time of the file when it was last read or written
+        self._mtime = None
+        self._refresh()
+
+    def _read(self) -> dict[str, dict[str, any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError):
+            logger.warning(f"Ignoring unreadable attraction cache {self.path}")
+            return {}
+
+    def _merge(self, entries: dict[str, dict[str, any]]) -> None:
+        # called with the lock held, the entry that expires last wins
+        for key, entry in entries.items():
+            _current = self._entries.get(key)
+            if _current is None or entry["expires"] > _current["expires"]:
+                self._entries[key] = entry
+
+    def _refresh(self) -> None:
+        # merges the entries that other processes wrote to the file since it was last read
+        if self.path is None:
+            return
+        try:
+            _mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if _mtime == self._mtime:
+            return
+        _entries = self._read()
+        with self._lock:
+            self._merge(_entries)
+            self._mtime = _mtime
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _key(location: str) -> str:
+        return location.strip().casefold()
+
+    def _cached(self, location: str, now: float) -> list[dict[str, str]] | None:
+        _entry = self._entries.get(self._key(location))
+        return _entry["attractions"] if _entry is not None and _entry["expires"] > now else None
+
+    def get_many(self, locations: list[str]) -> dict[str, list[dict[str, str]]]:
+        """
+        Returns the attractions of several locations. Locations that are not cached are loaded in one batch, locations
+        that another request is loading already are waited for.
+
+        :param locations: The locations (e.g. ["London", "Paris"])
+        :return: Dictionary of location to its list of attractions (empty if the attractions could not be loaded)
+        """
+        _found, _owned, _waiting = {}, [], {}
+        if not all(location in self for location in locations):
+            self._refresh()
+        with self._lock:
+            _now = self._clock()
+            for location in locations:
+                _found[location] = self._cached(location, _now)
+                _key = self._key(location)
+                if _found[location] is not None or _key in _waiting:
+                    continue
+                _future = self._inflight.get(_key)
+                if _future is None:
+                    _future = self._inflight[_key] = Future()
+                    _owned.append(location)
+                _waiting[_key] = _future
+        if len(_owned) > 0:
+            try:
+                _loaded = {self._key(location): a for location, a in self._loader(_owned).items()}
+            except BaseException as e:
+                self._finish(_owned, {}, error=e)
+                raise
+            self._store(_loaded)
+            self._finish(_owned, _loaded)
+        for location in locations:
+            if _found[location] is None:
+                _found[location] = _waiting[self._key(location)].result()
+        return {location: _found[location] or [] for location in locations}
+
+    def _finish(self, locations: list[str], loaded: dict[str, list[dict[str, str]]],
+                error: BaseException = None) -> None:
+        with self._lock:
+            _futures = [self._inflight.pop(self._key(location)) for location in locations]
+        for location, future in zip(locations, _futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(loaded.get(self._key(location)))
+
+    def _store(self, loaded: dict[str, list[dict[str, str]]]) -> None:
+        with self._lock:
+            _now = self._clock()
+            for key, attractions in loaded.items():
+                self._entries[key] = {"expires": _now + self.ttl, "attractions": attractions}
+            # expired entries are dropped so that the file does not grow with every location ever requested
+            self._entries = {k: e for k, e in self._entries.items() if e["expires"] > _now}
+        if self.path is not None and len(loaded) > 0:
+            with self._write_lock, self._file_lock():
+                # the entries other processes wrote since the file was read are merged, so that they are not lost
+                _on_disk = self._read()
+                with self._lock:
+                    self._merge(_on_disk)
+                    _now = self._clock()
+                    self._entries = {k: e for k, e in self._entries.items() if e["expires"] > _now}
+                    _entries = dict(self._entries)
+                # a unique temporary file, so that processes sharing the cache file do not write into each other's
+                _fd, _tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                             prefix=f".{os.path.basename(self.path)}.")
+                try:
+                    with os.fdopen(_fd, "w") as f:
+                        json.dump(_entries, f)
+                    os.replace(_tmp, self.path)
+                except BaseException:
+                    os.unlink(_tmp)
+                    raise
+                with self._lock:
+                    self._mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, location: str) -> list[dict[str, str]]:
+        """
+        Returns the attractions of a location
+
+        :param location: The location (e.g. "London")
+        :return: List of attractions, each with a name and a description
+        """
+        return self.get_many([location])[location]
+
+    def prewarm(self, locations: list[str] = None) -> None:
+        """
+        Loads the attractions of popular locations that are not cached yet
+
+        :param locations: The locations. Defaults to INFINITE_FN_ATTRACTION_PREWARM.
+        :return:
+        """
+        _locations = locations if locations is not None else ATTRACTION_PREWARM
+        self.get_many(_locations)
+        logger.info(f"Prewarmed attractions of {len(_locations)} locations")
+
+    def __contains__(self, location: str) -> bool:
+        with self._lock:
+            return self._cached(location, self._clock()) is not None
@@ -0,0 +1,168 @@
+"""
+Durable, append-only write-ahead log of booking events with periodic snapshots.
+
+Events are appended to numbered log segments (`<name>.<segment>.log`, one JSON document per line). Writes go to the OS
+buffer and a background thread fsyncs them in batches, so appending an event does not wait for the disk. A snapshot
+(`<name>.snapshot.json`) records the full state together with the first log segment that is not contained in it;
+older segments are deleted once the snapshot is safely on disk. Recovery loads the latest snapshot and replays the
+segments written after it.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BOOKING_DATA_PATH = os.getenv("INFINITE_FN_BOOKING_DATA_PATH", "./booking_data")
+FSYNC_INTERVAL = float(os.getenv("INFINITE_FN_BOOKING_FSYNC_INTERVAL", "0.01"))
+SNAPSHOT_EVERY = int(os.getenv("INFINITE_FN_BOOKING_SNAPSHOT_EVERY", "10000"))
+
+
+class BookingLog(object):
+    """
+    An append-only, fsync-batched event log with snapshots
+    """
+
+    def __init__(self, path: str, name: str, fsync_interval: float = FSYNC_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY) -> None:
+        """
+        Opens the log
+
+        :param path: The directory of the log files
+        :param name: The name of the log (e.g. "lodging")
+        :param fsync_interval: The maximum number of seconds between an append and its fsync
+        :param snapshot_every: The number of events after which the owner of the log should take a snapshot
+        """
+        self.path = path
+        self.name = name
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_segment = -1
+        self._snapshot_writers = []
+        self._dirty = threading.Event()
+        self._closed = False
+        _segments = self._segments()
+        self._segment = _segments[-1] + 1 if len(_segments) > 0 else 0
+        self._file = open(self._segment_file(self._segment), "a")
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"{name}-log-flusher", daemon=True)
+        self._flusher.start()
+
+    def _segment_file(self, segment: int) -> str:
+        return os.path.join(self.path, f"{self.name}.{segment:010d}.log")
+
+    def _snapshot_file(self) -> str:
+        return os.path.join(self.path, f"{self.name}.snapshot.json")
+
+    def _segments(self) -> list[int]:
+        return sorted(int(os.path.basename(f).split(".")[-2])
+                      for f in glob.glob(os.path.join(self.path, f"{self.name}.*.log")))
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._dirty.wait()
+            # group all appends of the interval into a single fsync
+            time.sleep(self.fsync_interval)
+            self.flush()
+
+    def append(self, event: dict[str, any]) -> None:
+        """
+        Appends an event. The event is fsynced within `fsync_interval` seconds.
+
+        :param event: The event, a JSON serializable dictionary
+        :return:
+        """
+        _line = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(_line)
+        self._dirty.set()
+
+    def flush(self) -> None:
+        """
+        Writes and fsyncs all appended events
+
+        :return:
+        """
+        with self._lock:
+            self._dirty.clear()
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def snapshot(self, state: dict[str, any]) -> None:
+        """
+        Starts a new log segment and writes a snapshot of the state in the background. The caller must ensure that no
+        events are appended between capturing the state and calling this method.
+
+        :param state: The state containing all events appended so far, a JSON serializable dictionary
+        :return:
+        """
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_file(self._segment), "a")
+            _first_segment = self._segment
+        _writer = threading.Thread(target=self._write_snapshot, args=(state, _first_segment), daemon=True)
+        _writer.start()
+        self._snapshot_writers = [w for w in self._snapshot_writers if w.is_alive()] + [_writer]
+
+    def _write_snapshot(self, state: dict[str, any], first_segment: int) -> None:
+        with self._snapshot_lock:
+            if first_segment <= self._snapshot_segment:
+                return  # a newer snapshot has already been written
+            _tmp = f"{self._snapshot_file()}.tmp"
+            with open(_tmp, "w") as f:
+                json.dump({"first_segment": first_segment, "state": state}, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(_tmp, self._snapshot_file())
+            self._snapshot_segment = first_segment
+            for segment in self._segments():
+                if segment < first_segment:
+                    os.remove(self._segment_file(segment))
+        logger.info(f"Wrote {self.name} snapshot, replay starts at segment {first_segment}")
+
+    def recover(self) -> tuple[dict[str, any] | None, list[dict[str, any]]]:
+        """
+        Reads the latest snapshot and the events appended after it
+
+        :return: The snapshot state (None if there is no snapshot) and the list of events to replay
+        """
+        _state, _first_segment = None, 0
+        if os.path.exists(self._snapshot_file()):
+            with open(self._snapshot_file()) as f:
+                _snapshot = json.load(f)
+            _state, _first_segment = _snapshot["state"], _snapshot["first_segment"]
+        _events = []
+        for segment in self._segments():
+            if segment < _first_segment or segment == self._segment:
+                continue
+            with open(self._segment_file(segment)) as f:
+                for line in f:
+                    try:
+                        _events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # a torn write at the end of a segment after a crash
+                        logger.warning(f"Skipping incomplete event in {self._segment_file(segment)}")
+        return _state, _events
+
+    def close(self) -> None:
+        """
+        Flushes and closes the log, waiting for pending snapshots to be written
+
+        :return:
+        """
+        for _writer in self._snapshot_writers:
+            _writer.join()
+        self.flush()
+        self._closed = True
+        self._dirty.set()
+        with self._lock:
+            self._file.close()
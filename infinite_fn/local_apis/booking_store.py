@@ -0,0 +1,370 @@
+"""
+Thread-safe, indexed stores of bookings: in process memory (`BookingStore`) or in the shared state database
+(`SqliteBookingStore`) when several worker processes serve the app
+"""
+import json
+import re
+import threading
+
+from infinite_fn.local_apis.booking_log import BookingLog
+from infinite_fn.local_apis.state_db import STATE_BACKEND, StateDB, get_state_db
+
+
+class BookingStore(object):
+    """
+    Stores bookings (dictionaries) by booking id with optional secondary indexes on booking fields.
+    Lookups by id or by an indexed field, inserts and removals are O(1).
+    Changes can be made durable by attaching a `BookingLog` with `attach_log`.
+    """
+
+    def __init__(self, id_prefix: str = "BOOKING", indexes: tuple[str, ...] = ()) -> None:
+        """
+        Initializes the store
+
+        :param id_prefix: The prefix of the ids generated by `new_id` (e.g. "BOOKING" for "BOOKING0")
+        :param indexes: The booking fields to index (e.g. ("user_id",))
+        """
+        self.id_prefix = id_prefix
+        self._bookings: dict[str, dict[str, any]] = {}
+        # per field: field value -> ordered set (dict with None values) of booking ids
+        self._indexes: dict[str, dict[any, dict[str, None]]] = {field: {} for field in indexes}
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._log = None
+        self._events_since_snapshot = 0
+
+    def attach_log(self, log: BookingLog) -> None:
+        """
+        Restores the bookings from the latest snapshot and the events logged after it, then logs all further changes
+
+        :param log: The booking log
+        :return:
+        """
+        with self._lock:
+            _state, _events = log.recover()
+            self._log = None
+            self.clear()
+            if _state is not None:
+                self._next_id = _state["next_id"]
+                for booking_id, booking in _state["bookings"]:
+                    self.add(booking, booking_id)
+            for event in _events:
+                if event["op"] == "add":
+                    self.add(event["booking"], event["id"])
+                elif event["op"] == "remove":
+                    self.remove(event["id"])
+                elif event["op"] == "clear":
+                    self.clear()
+            self._log = log
+            self._events_since_snapshot = len(_events)
+
+    def snapshot(self) -> None:
+        """
+        Writes a snapshot of all bookings to the attached log so that recovery does not need to replay older events
+
+        :return:
+        """
+        with self._lock:
+            if self._log is None:
+                return
+            self._log.snapshot({"next_id": self._next_id, "bookings": list(self._bookings.items())})
+            self._events_since_snapshot = 0
+
+    def _append_event(self, event: dict[str, any]) -> None:
+        if self._log is None:
+            return
+        self._log.append(event)
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self._log.snapshot_every:
+            self.snapshot()
+
+    def new_id(self) -> str:
+        """
+        Returns a new booking id. Ids are never reused, even after a booking is removed.
+
+        :return: The booking id
+        """
+        with self._lock:
+            _id = f"{self.id_prefix}{self._next_id}"
+            self._next_id += 1
+            return _id
+
+    def _reserve_id(self, booking_id: str) -> None:
+        _suffix = booking_id[len(self.id_prefix):] if booking_id.startswith(self.id_prefix) else ""
+        if _suffix.isdigit():
+            self._next_id = max(self._next_id, int(_suffix) + 1)
+
+    def add(self, booking: dict[str, any], booking_id: str = None) -> str:
+        """
+        Adds (or replaces) a booking
+
+        :param booking: The booking
+        :param booking_id: The booking id. If None the booking's 'id' field is used or a new id is generated.
+        :return: The booking id
+        """
+        with self._lock:
+            if booking_id is None:
+                booking_id = booking.get("id") or self.new_id()
+            self._reserve_id(booking_id)
+            self._remove(booking_id)
+            self._bookings[booking_id] = booking
+            for field, index in self._indexes.items():
+                index.setdefault(booking.get(field), {})[booking_id] = None
+            self._append_event({"op": "add", "id": booking_id, "booking": booking})
+            return booking_id
+
+    def remove(self, booking_id: str) -> dict[str, any] | None:
+        """
+        Removes a booking
+
+        :param booking_id: The booking id
+        :return: The removed booking or None if no booking with the given id exists
+        """
+        with self._lock:
+            _booking = self._remove(booking_id)
+            if _booking is not None:
+                self._append_event({"op": "remove", "id": booking_id})
+            return _booking
+
+    def _remove(self, booking_id: str) -> dict[str, any] | None:
+        _booking = self._bookings.pop(booking_id, None)
+        if _booking is None:
+            return None
+        for field, index in self._indexes.items():
+            _ids = index.get(_booking.get(field))
+            if _ids is not None:
+                _ids.pop(booking_id, None)
+                if len(_ids) == 0:
+                    del index[_booking.get(field)]
+        return _booking
+
+    def get(self, booking_id: str) -> dict[str, any] | None:
+        """
+        Returns a booking by id
+
+        :param booking_id: The booking id
+        :return: The booking or None if no booking with the given id exists
+        """
+        return self._bookings.get(booking_id)
+
+    def find(self, field: str, value: any) -> list[dict[str, any]]:
+        """
+        Returns all bookings whose indexed field has the given value, in insertion order
+
+        :param field: The indexed field (e.g. "user_id")
+        :param value: The value to look for
+        :return: List of bookings
+        """
+        with self._lock:
+            return [self._bookings[i] for i in self._indexes[field].get(value, ())]
+
+    def first(self, field: str, value: any) -> dict[str, any] | None:
+        """
+        Returns the first booking whose indexed field has the given value
+
+        :param field: The indexed field (e.g. "name_for_booking")
+        :param value: The value to look for
+        :return: The booking or None if there is no such booking
+        """
+        with self._lock:
+            _ids = self._indexes[field].get(value)
+            return self._bookings[next(iter(_ids))] if _ids else None
+
+    def items(self) -> list[tuple[str, dict[str, any]]]:
+        """
+        Returns a snapshot of all (booking id, booking) pairs
+
+        :return: List of (booking id, booking) pairs
+        """
+        with self._lock:
+            return list(self._bookings.items())
+
+    def clear(self) -> None:
+        """
+        Removes all bookings. Generated ids are still not reused.
+
+        :return:
+        """
+        with self._lock:
+            self._bookings.clear()
+            for index in self._indexes.values():
+                index.clear()
+            self._append_event({"op": "clear"})
+
+    def __getitem__(self, booking_id: str) -> dict[str, any]:
+        return self._bookings[booking_id]
+
+    def __contains__(self, booking_id: str) -> bool:
+        return booking_id in self._bookings
+
+    def __len__(self) -> int:
+        return len(self._bookings)
+
+
+class SqliteBookingStore(object):
+    """
+    A `BookingStore` kept in the shared SQLite state database, so that the bookings made in one worker process are
+    visible to all others. Each store is a namespace of the `bookings` table; indexed fields are served by expression
+    indexes on the JSON of the bookings. The database is durable itself, so no `BookingLog` is attached.
+    """
+
+    def __init__(self, name: str, id_prefix: str = "BOOKING", indexes: tuple[str, ...] = (),
+                 db: StateDB = None) -> None:
+        """
+        Initializes the store
+
+        :param name: The name of the store (e.g. "lodgings")
+        :param id_prefix: The prefix of the ids generated by `new_id` (e.g. "BOOKING" for "BOOKING0")
+        :param indexes: The booking fields to index (e.g. ("user_id",))
+        :param db: The state database. Defaults to INFINITE_FN_STATE_DB.
+        """
+        for identifier in (name, *indexes):
+            if re.fullmatch(r"\w+", identifier) is None:
+                raise ValueError(f"Invalid store or field name: {identifier}")
+        self.name = name
+        self.id_prefix = id_prefix
+        self._indexes = tuple(indexes)
+        self._db = db if db is not None else get_state_db()
+        with self._db.transaction() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS bookings (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "store TEXT NOT NULL, id TEXT NOT NULL, booking TEXT NOT NULL, UNIQUE (store, id))")
+            cursor.execute("CREATE TABLE IF NOT EXISTS booking_ids (store TEXT PRIMARY KEY, next_id INTEGER NOT NULL)")
+            cursor.execute("INSERT OR IGNORE INTO booking_ids VALUES (?, 0)", (name,))
+            for field in self._indexes:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS bookings_{name}_{field} "
+                               f"ON bookings (store, json_extract(booking, '$.{field}'))")
+
+    def new_id(self) -> str:
+        """
+        Returns a new booking id. Ids are never reused, even after a booking is removed.
+
+        :return: The booking id
+        """
+        with self._db.transaction() as cursor:
+            return self._new_id(cursor)
+
+    def _new_id(self, cursor) -> str:
+        _next = cursor.execute("SELECT next_id FROM booking_ids WHERE store = ?", (self.name,)).fetchone()[0]
+        cursor.execute("UPDATE booking_ids SET next_id = ? WHERE store = ?", (_next + 1, self.name))
+        return f"{self.id_prefix}{_next}"
+
+    def add(self, booking: dict[str, any], booking_id: str = None) -> str:
+        """
+        Adds (or replaces) a booking
+
+        :param booking: The booking
+        :param booking_id: The booking id. If None the booking's 'id' field is used or a new id is generated.
+        :return: The booking id
+        """
+        with self._db.transaction() as cursor:
+            if booking_id is None:
+                booking_id = booking.get("id") or self._new_id(cursor)
+            _suffix = booking_id[len(self.id_prefix):] if booking_id.startswith(self.id_prefix) else ""
+            if _suffix.isdigit():
+                cursor.execute("UPDATE booking_ids SET next_id = MAX(next_id, ?) WHERE store = ?",
+                               (int(_suffix) + 1, self.name))
+            cursor.execute("DELETE FROM bookings WHERE store = ? AND id = ?", (self.name, booking_id))
+            cursor.execute("INSERT INTO bookings (store, id, booking) VALUES (?, ?, ?)",
+                           (self.name, booking_id, json.dumps(booking)))
+            return booking_id
+
+    def remove(self, booking_id: str) -> dict[str, any] | None:
+        """
+        Removes a booking
+
+        :param booking_id: The booking id
+        :return: The removed booking or None if no booking with the given id exists
+        """
+        with self._db.transaction() as cursor:
+            _row = cursor.execute("SELECT booking FROM bookings WHERE store = ? AND id = ?",
+                                  (self.name, booking_id)).fetchone()
+            if _row is None:
+                return None
+            cursor.execute("DELETE FROM bookings WHERE store = ? AND id = ?", (self.name, booking_id))
+            return json.loads(_row[0])
+
+    def get(self, booking_id: str) -> dict[str, any] | None:
+        """
+        Returns a booking by id
+
+        :param booking_id: The booking id
+        :return: The booking or None if no booking with the given id exists
+        """
+        _rows = self._db.execute("SELECT booking FROM bookings WHERE store = ? AND id = ?", (self.name, booking_id))
+        return json.loads(_rows[0][0]) if len(_rows) > 0 else None
+
+    def _select(self, field: str, value: any, limit: int = -1) -> list[dict[str, any]]:
+        if field not in self._indexes:
+            raise KeyError(field)
+        _rows = self._db.execute(f"SELECT booking FROM bookings WHERE store = ? "
+                                 f"AND json_extract(booking, '$.{field}') IS ? ORDER BY seq LIMIT ?",
+                                 (self.name, value, limit))
+        return [json.loads(r[0]) for r in _rows]
+
+    def find(self, field: str, value: any) -> list[dict[str, any]]:
+        """
+        Returns all bookings whose indexed field has the given value, in insertion order
+
+        :param field: The indexed field (e.g. "user_id")
+        :param value: The value to look for
+        :return: List of bookings
+        """
+        return self._select(field, value)
+
+    def first(self, field: str, value: any) -> dict[str, any] | None:
+        """
+        Returns the first booking whose indexed field has the given value
+
+        :param field: The indexed field (e.g. "name_for_booking")
+        :param value: The value to look for
+        :return: The booking or None if there is no such booking
+        """
+        _bookings = self._select(field, value, limit=1)
+        return _bookings[0] if len(_bookings) > 0 else None
+
+    def items(self) -> list[tuple[str, dict[str, any]]]:
+        """
+        Returns a snapshot of all (booking id, booking) pairs
+
+        :return: List of (booking id, booking) pairs
+        """
+        return [(r[0], json.loads(r[1])) for r in
+                self._db.execute("SELECT id, booking FROM bookings WHERE store = ? ORDER BY seq", (self.name,))]
+
+    def clear(self) -> None:
+        """
+        Removes all bookings. Generated ids are still not reused.
+
+        :return:
+        """
+        self._db.execute("DELETE FROM bookings WHERE store = ?", (self.name,))
+
+    def __getitem__(self, booking_id: str) -> dict[str, any]:
+        _booking = self.get(booking_id)
+        if _booking is None:
+            raise KeyError(booking_id)
+        return _booking
+
+    def __contains__(self, booking_id: str) -> bool:
+        return len(self._db.execute("SELECT 1 FROM bookings WHERE store = ? AND id = ?", (self.name, booking_id))) > 0
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM bookings WHERE store = ?", (self.name,))[0][0]
+
+
+def create_booking_store(name: str, id_prefix: str = "BOOKING", indexes: tuple[str, ...] = (),
+                         backend: str = STATE_BACKEND) -> BookingStore | SqliteBookingStore:
+    """
+    Creates the booking store of the configured state backend
+
+    :param name: The name of the store (e.g. "lodgings"), used for its table namespace and booking log
+    :param id_prefix: The prefix of generated booking ids
+    :param indexes: The booking fields to index
+    :param backend: "memory" (default) or "sqlite" when bookings are shared by several worker processes
+    :return: The booking store
+    """
+    if backend == "sqlite":
+        return SqliteBookingStore(name, id_prefix=id_prefix, indexes=indexes)
+    if backend != "memory":
+        raise ValueError(f"Unknown state backend {backend}. Expected memory or sqlite")
+    return BookingStore(id_prefix=id_prefix, indexes=indexes)
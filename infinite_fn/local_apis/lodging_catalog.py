@@ -0,0 +1,142 @@
+"""
+Per-location lodging catalog cache
+"""
+import os
+import random
+import string
+import threading
+from collections import OrderedDict
+
+from infinite_fn.local_apis.lodging_table import LodgingTable
+
+CATALOG_MAX_LOCATIONS = int(os.getenv("INFINITE_FN_LODGING_CATALOG_SIZE", "256"))
+POSSIBLE_AMENITIES = ['Free WiFi', 'Parking', 'Breakfast', 'Pool', 'Gym']
+
+
+class Lodging(object):
+    """
+    A compact lodging record
+    """
+    __slots__ = ('id', 'name', 'location', 'price', 'rating', 'amenities')
+
+    def __init__(self, id: str, name: str, location: str, price: float, rating: float, amenities: tuple[str, ...]):
+        self.id = id
+        self.name = name
+        self.location = location
+        self.price = price
+        self.rating = rating
+        self.amenities = amenities
+
+    def to_dict(self) -> dict[str, any]:
+        """
+        Returns the lodging as a dictionary
+
+        :return: Dictionary with id, name, location, price, rating and amenities keys
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'location': self.location,
+            'price': self.price,
+            'rating': self.rating,
+            'amenities': list(self.amenities)
+        }
+
+
+def generate_lodgings(location: str, count: int = 10) -> list[Lodging]:
+    """
+    Generates dummy lodgings for a location. The lodgings of a location are always the same.
+
+    :param location: The location (e.g. "London")
+    :param count: The number of lodgings
+    :return: List of lodgings
+    """
+    _random = random.Random(location)
+    lodgings = []
+    for i in range(count):
+        lodgings.append(Lodging(id=f'LODGE{i}',
+                                name='Lodge-' + ''.join(_random.choices(string.ascii_uppercase, k=5)),
+                                location=location,
+                                price=round(_random.uniform(50.0, 200.0), 2),
+                                rating=round(_random.uniform(1.0, 5.0), 1),
+                                amenities=tuple(_random.sample(POSSIBLE_AMENITIES,
+                                                               k=_random.randint(1, len(POSSIBLE_AMENITIES))))))
+    return lodgings
+
+
+class _CatalogEntry(object):
+    __slots__ = ('lodgings', 'by_id', 'table')
+
+    def __init__(self, lodgings: list[Lodging]) -> None:
+        self.lodgings = lodgings
+        self.by_id = {lodging.id: lodging for lodging in lodgings}
+        self.table = None
+
+
+class LodgingCatalog(object):
+    """
+    Generates (or loads) the lodgings of each location once and keeps the most recently used locations in memory
+    """
+
+    def __init__(self, loader: callable = generate_lodgings, max_locations: int = CATALOG_MAX_LOCATIONS) -> None:
+        """
+        Initializes the catalog
+
+        :param loader: A callable that returns the list of `Lodging`s of a location
+        :param max_locations: The maximum number of locations kept in memory
+        """
+        self._loader = loader
+        self._max_locations = max_locations
+        self._entries: OrderedDict[str, _CatalogEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, location: str) -> _CatalogEntry:
+        with self._lock:
+            _entry = self._entries.get(location)
+            if _entry is not None:
+                self._entries.move_to_end(location)
+                return _entry
+        _entry = _CatalogEntry(self._loader(location))
+        with self._lock:
+            _entry = self._entries.setdefault(location, _entry)
+            self._entries.move_to_end(location)
+            while len(self._entries) > self._max_locations:
+                self._entries.popitem(last=False)
+            return _entry
+
+    def lodgings(self, location: str) -> list[Lodging]:
+        """
+        Returns the lodgings of a location
+
+        :param location: The location (e.g. "London")
+        :return: List of lodgings
+        """
+        return self._entry(location).lodgings
+
+    def get(self, location: str, lodging_id: str) -> Lodging | None:
+        """
+        Returns a lodging by id
+
+        :param location: The location of the lodging (e.g. "London")
+        :param lodging_id: The id of the lodging (e.g. "LODGE0")
+        :return: The lodging or None if the location has no lodging with that id
+        """
+        return self._entry(location).by_id.get(lodging_id)
+
+    def table(self, location: str) -> LodgingTable:
+        """
+        Returns the columnar table of the lodgings of a location
+
+        :param location: The location (e.g. "London")
+        :return: The lodging table
+        """
+        _entry = self._entry(location)
+        if _entry.table is None:
+            _entry.table = LodgingTable([lodging.to_dict() for lodging in _entry.lodgings])
+        return _entry.table
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, location: str) -> bool:
+        return location in self._entries
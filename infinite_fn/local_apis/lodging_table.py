@@ -0,0 +1,131 @@
+"""
+Columnar, vectorized lodging query engine
+"""
+import numpy as np
+
+SORT_COLUMNS = ("price", "rating")
+
+
+class LodgingTable(object):
+    """
+    A columnar table of lodgings. Prices and ratings are held in NumPy arrays and amenities as a bitmask per lodging
+    so that filters, sorting and limits are evaluated in one vectorized pass.
+    """
+
+    def __init__(self, records: list[dict[str, any]]) -> None:
+        """
+        Builds the table from lodging dictionaries
+
+        :param records: The lodgings. Each lodging should be a dictionary with 'price', 'rating' and 'amenities' keys.
+                        A missing price or rating is NaN, so the lodging never matches a filter on that column and
+                        is sorted last; missing amenities are an empty list.
+        """
+        self.records = records
+        self.amenity_bits: dict[str, int] = {}
+        for record in records:
+            for amenity in record.get('amenities', []):
+                self.amenity_bits.setdefault(amenity, len(self.amenity_bits))
+        if len(self.amenity_bits) > 64:
+            raise ValueError("At most 64 distinct amenities are supported")
+        self.price = self._column(records, 'price')
+        self.rating = self._column(records, 'rating')
+        self.amenities = np.fromiter((self.amenity_mask(r.get('amenities', [])) for r in records), dtype=np.uint64,
+                                     count=len(records))
+
+    @staticmethod
+    def _column(records: list[dict[str, any]], key: str) -> np.ndarray:
+        return np.fromiter((np.nan if r.get(key) is None else r[key] for r in records), dtype=np.float64,
+                           count=len(records))
+
+    def amenity_mask(self, amenities: list[str]) -> int | None:
+        """
+        Returns the bitmask of a list of amenities
+
+        :param amenities: The amenities (e.g. ['Free WiFi', 'Parking'])
+        :return: The bitmask or None if an amenity is not offered by any lodging in the table
+        """
+        _mask = 0
+        for amenity in amenities:
+            if amenity not in self.amenity_bits:
+                return None
+            _mask |= 1 << self.amenity_bits[amenity]
+        return _mask
+
+    def query(self, rows: np.ndarray = None, min_price: float = None, max_price: float = None,
+              min_rating: float = None, amenities: list[str] = None, sort_by: str = None, ascending: bool = True,
+              limit: int = None) -> np.ndarray:
+        """
+        Filters, sorts and limits the lodgings
+
+        :param rows: Restricts the query to these row indices, in this order. Defaults to all rows.
+        :param min_price: The minimum price (inclusive)
+        :param max_price: The maximum price (inclusive)
+        :param min_rating: The minimum rating (inclusive)
+        :param amenities: The amenities that every lodging must offer
+        :param sort_by: The column to sort by, one of SORT_COLUMNS. Ties keep their original order.
+        :param ascending: Whether to sort in ascending order
+        :param limit: The maximum number of rows to return, not negative
+        :return: The matching row indices
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"The limit must not be negative, got {limit}")
+        _price = self.price if rows is None else self.price[rows]
+        _mask = np.ones(len(_price), dtype=bool)
+        if min_price is not None:
+            _mask &= _price >= min_price
+        if max_price is not None:
+            _mask &= _price <= max_price
+        if min_rating is not None:
+            _mask &= (self.rating if rows is None else self.rating[rows]) >= min_rating
+        if amenities:
+            _required = self.amenity_mask(amenities)
+            if _required is None:
+                return np.empty(0, dtype=np.intp)
+            _required = np.uint64(_required)
+            _mask &= ((self.amenities if rows is None else self.amenities[rows]) & _required) == _required
+        _selected = np.flatnonzero(_mask) if rows is None else np.asarray(rows)[_mask]
+        if sort_by is not None:
+            if sort_by not in SORT_COLUMNS:
+                raise ValueError(f"Cannot sort by {sort_by}. Expected one of {SORT_COLUMNS}")
+            _keys = getattr(self, sort_by)[_selected]
+            _keys = _keys if ascending else -_keys
+            if limit is not None and 0 < limit < len(_selected):
+                # only the rows up to the limit-th smallest key need to be sorted
+                _top = _keys <= np.partition(_keys, limit - 1)[limit - 1]
+                _selected, _keys = _selected[_top], _keys[_top]
+            _selected = _selected[np.argsort(_keys, kind="stable")]
+        return _selected[:limit] if limit is not None else _selected
+
+    def select(self, rows: np.ndarray) -> "LodgingView":
+        """
+        Returns the lodgings at the given row indices
+
+        :param rows: The row indices
+        :return: The lodgings, backed by this table
+        """
+        return LodgingView([self.records[i] for i in rows], table=self, rows=rows)
+
+    @staticmethod
+    def view(lodgings: list[dict[str, any]]) -> tuple["LodgingTable", np.ndarray]:
+        """
+        Returns the table and row indices behind a list of lodgings. Lists returned by previous queries reuse their
+        table so chained queries do not rebuild the columns. Other lists (e.g. lodgings passed back as JSON by the
+        LLM) are converted in one pass over the records, which costs about as much as filtering them directly.
+
+        :param lodgings: The lodgings
+        :return: The table and the row indices of the lodgings (None for all rows of the table)
+        """
+        if isinstance(lodgings, LodgingView):
+            return lodgings.table, lodgings.rows
+        return LodgingTable(lodgings), None
+
+
+class LodgingView(list):
+    """
+    A list of lodgings that remembers the table and rows it was selected from
+    """
+
+    def __init__(self, records: list[dict[str, any]], table: LodgingTable, rows: np.ndarray) -> None:
+        super().__init__(records)
+        self.table = table
+        self.rows = rows
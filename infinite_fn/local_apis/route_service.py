@@ -0,0 +1,204 @@
+"""
+Memoized routes between locations and route matrices for trip planning
+"""
+import os
+import random
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+ROUTE_CACHE_SIZE = int(os.getenv("INFINITE_FN_ROUTE_CACHE_SIZE", "100000"))
+TRANSPORTATION_TYPES = ("car", "bus", "train", "plane")
+# itineraries up to this number of stops are ordered exactly, longer ones greedily
+EXACT_ROUTE_MAX_STOPS = 12
+
+
+class Route(object):
+    """
+    The distance, available transportation types and costs between two locations
+    """
+    __slots__ = ('distance', 'modes', 'costs')
+
+    def __init__(self, distance: int, modes: tuple[str, ...], costs: dict[str, int]) -> None:
+        """
+        :param distance: The distance in kilometers
+        :param modes: The available transportation types
+        :param costs: The cost of each transportation type
+        """
+        self.distance = distance
+        self.modes = modes
+        self.costs = costs
+
+    def cheapest_mode(self) -> str:
+        return min(self.modes, key=lambda m: self.costs[m])
+
+
+def generate_route(location1: str, location2: str) -> Route:
+    """
+    Generates a dummy route. Routes are symmetric and always the same for the same pair of locations.
+
+    :param location1: The first location
+    :param location2: The second location
+    :return: The route
+    """
+    _random = random.Random("|".join(sorted((location1, location2))))
+    return Route(distance=_random.randint(1, 1000),
+                 modes=TRANSPORTATION_TYPES[:_random.randint(1, len(TRANSPORTATION_TYPES))],
+                 costs={mode: _random.randint(1, 1000) for mode in TRANSPORTATION_TYPES})
+
+
+class RouteMatrix(object):
+    """
+    Routes between all pairs of N locations. `distances` and `costs` are (N x N) arrays, the cost of a pair is the
+    cost of the requested transportation type or of the cheapest available one, and NaN if the type is not available.
+    """
+
+    def __init__(self, locations: list[str], routes: list[list[Route | None]], transportation_type: str = None) -> None:
+        """
+        :param locations: The locations
+        :param routes: The route of every pair of locations, None on the diagonal
+        :param transportation_type: The transportation type of the costs, None for the cheapest available one
+        """
+        self.locations = locations
+        self.transportation_type = transportation_type
+        _n = len(locations)
+        self.distances = np.zeros((_n, _n), dtype=np.int64)
+        self.costs = np.zeros((_n, _n), dtype=np.float64)
+        self.modes: list[list[str | None]] = [[None] * _n for _ in range(_n)]
+        for i in range(_n):
+            for j in range(_n):
+                _route = routes[i][j]
+                if _route is None:
+                    continue
+                self.distances[i, j] = _route.distance
+                if transportation_type is None:
+                    self.modes[i][j] = _route.cheapest_mode()
+                elif transportation_type in _route.modes:
+                    self.modes[i][j] = transportation_type
+                self.costs[i, j] = _route.costs[self.modes[i][j]] if self.modes[i][j] is not None else np.nan
+
+    def cheapest_route(self, return_to_start: bool = False) -> tuple[list[int], float]:
+        """
+        Orders the locations so that the total cost is minimal, starting at the first location
+
+        :param return_to_start: Whether the route ends at the first location
+        :return: The order (indices of the locations) and the total cost (inf if there is no route)
+        """
+        return cheapest_route(self.costs, return_to_start)
+
+
+def cheapest_route(costs: np.ndarray, return_to_start: bool = False) -> tuple[list[int], float]:
+    """
+    Finds the cheapest order to visit all locations, starting at location 0. Up to EXACT_ROUTE_MAX_STOPS locations the
+    order is optimal (Held-Karp), otherwise it is built greedily from the nearest unvisited location.
+
+    :param costs: The (N x N) cost matrix, NaN or inf where there is no route
+    :param return_to_start: Whether the route ends at location 0
+    :return: The order (indices) and the total cost (inf if there is no route)
+    """
+    _costs = np.where(np.isnan(costs), np.inf, costs).astype(np.float64)
+    _n = len(_costs)
+    if _n <= 1:
+        return list(range(_n)), 0.0
+    if _n > EXACT_ROUTE_MAX_STOPS:
+        return _greedy_route(_costs, return_to_start)
+    # best[mask, j]: cheapest cost of a path from 0 visiting the locations in mask (always including 0), ending in j
+    _full = 1 << _n
+    best = np.full((_full, _n), np.inf)
+    parent = np.full((_full, _n), -1, dtype=np.int64)
+    best[1, 0] = 0.0
+    _bits = 1 << np.arange(_n)
+    for mask in range(1, _full, 2):
+        _row = best[mask]
+        if not np.isfinite(_row).any():
+            continue
+        # extend every path ending in j by every location k not in mask
+        _step = _row[:, None] + _costs
+        for k in np.flatnonzero((mask & _bits) == 0):
+            j = int(np.argmin(_step[:, k]))
+            if _step[j, k] < best[mask | _bits[k], k]:
+                best[mask | _bits[k], k] = _step[j, k]
+                parent[mask | _bits[k], k] = j
+    _ends = best[_full - 1] + (_costs[:, 0] if return_to_start else 0.0)
+    _last = int(np.argmin(_ends))
+    _total = float(_ends[_last])
+    if not np.isfinite(_total):
+        return list(range(_n)), float("inf")
+    _order, mask = [], _full - 1
+    while _last != -1:
+        _order.append(_last)
+        mask, _last = mask & ~(1 << _last), int(parent[mask, _last])
+    _order.reverse()
+    return _order + ([0] if return_to_start else []), _total
+
+
+def _greedy_route(costs: np.ndarray, return_to_start: bool) -> tuple[list[int], float]:
+    _visited = np.zeros(len(costs), dtype=bool)
+    _visited[0] = True
+    _order, _total = [0], 0.0
+    while not _visited.all():
+        _next = int(np.argmin(np.where(_visited, np.inf, costs[_order[-1]])))
+        _total += costs[_order[-1], _next]
+        _order.append(_next)
+        _visited[_next] = True
+    if return_to_start:
+        _total += costs[_order[-1], 0]
+        _order.append(0)
+    return _order, float(_total)
+
+
+class RouteService(object):
+    """
+    Memoizes routes between pairs of locations. Routes are symmetric, so (A, B) and (B, A) share one entry.
+    """
+
+    def __init__(self, loader: callable = generate_route, max_entries: int = ROUTE_CACHE_SIZE) -> None:
+        """
+        :param loader: A callable (location1, location2) returning the `Route` between them
+        :param max_entries: The maximum number of routes kept, the least recently used routes are evicted
+        """
+        self._loader = loader
+        self._max_entries = max_entries
+        self._routes: OrderedDict[tuple[str, str], Route] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def route(self, location1: str, location2: str) -> Route:
+        """
+        Returns the route between two locations
+
+        :param location1: The first location
+        :param location2: The second location
+        :return: The route
+        """
+        _key = (location1, location2) if location1 <= location2 else (location2, location1)
+        with self._lock:
+            _route = self._routes.get(_key)
+            if _route is not None:
+                self._routes.move_to_end(_key)
+                return _route
+        _route = self._loader(*_key)
+        with self._lock:
+            _route = self._routes.setdefault(_key, _route)
+            self._routes.move_to_end(_key)
+            while len(self._routes) > self._max_entries:
+                self._routes.popitem(last=False)
+            return _route
+
+    def matrix(self, locations: list[str], transportation_type: str = None) -> RouteMatrix:
+        """
+        Returns the routes between all pairs of locations
+
+        :param locations: The locations
+        :param transportation_type: The transportation type of the costs, None for the cheapest available one
+        :return: The route matrix
+        """
+        _n = len(locations)
+        _routes = [[None] * _n for _ in range(_n)]
+        for i in range(_n):
+            for j in range(i + 1, _n):
+                _routes[i][j] = _routes[j][i] = self.route(locations[i], locations[j])
+        return RouteMatrix(locations, _routes, transportation_type)
+
+    def __len__(self) -> int:
+        return len(self._routes)
@@ -0,0 +1,100 @@
+"""
+Local SQLite database of the state shared by the worker processes (chat sessions and bookings).
+
+With INFINITE_FN_STATE_BACKEND=sqlite the session and booking stores keep their state in INFINITE_FN_STATE_DB instead
+of process memory, so that any worker can serve any request. The database runs in WAL mode: readers do not block the
+writer and writes are committed without waiting for a full fsync of the database file.
+"""
+import os
+import sqlite3
+import threading
+
+STATE_BACKEND = os.getenv("INFINITE_FN_STATE_BACKEND", "memory")
+STATE_DB_PATH = os.getenv("INFINITE_FN_STATE_DB", "./state.db")
+BUSY_TIMEOUT = float(os.getenv("INFINITE_FN_STATE_DB_BUSY_TIMEOUT", "30"))
+
+
+class StateDB(object):
+    """
+    A connection to the state database that can be shared by the threads of a process.
+    Statements are serialized by a lock; other processes use their own connections.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, busy_timeout: float = BUSY_TIMEOUT) -> None:
+        """
+        Opens (and if needed creates) the database
+
+        :param path: The database file
+        :param busy_timeout: The number of seconds to wait for a lock held by another process
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+    def execute(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """
+        Runs a single statement in its own transaction
+
+        :param sql: The statement
+        :param parameters: The statement parameters
+        :return: The result rows
+        """
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def transaction(self) -> "_Transaction":
+        """
+        Returns a context manager that runs statements in one write transaction, e.g.
+
+            with db.transaction() as cursor:
+                cursor.execute(...)
+
+        :return: The transaction
+        """
+        return _Transaction(self)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class _Transaction(object):
+    def __init__(self, db: StateDB) -> None:
+        self._db = db
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self._db._lock.acquire()
+        try:
+            # take the write lock up front so that read-modify-write sequences are atomic across processes
+            self._db._connection.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._db._lock.release()
+            raise
+        return self._db._connection.cursor()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            self._db._connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self._db._lock.release()
+
+
+_databases: dict[str, StateDB] = {}
+_databases_lock = threading.Lock()
+
+
+def get_state_db(path: str = STATE_DB_PATH) -> StateDB:
+    """
+    Returns the connection of this process to a state database, opening it on first use
+
+    :param path: The database file
+    :return: The database
+    """
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = StateDB(path)
+        return _databases[path]
@@ -0,0 +1,144 @@
+"""
+TTL cache of weather data keyed by (location, date) with array-backed bulk lookups
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+WEATHER_CACHE_TTL = float(os.getenv("INFINITE_FN_WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("INFINITE_FN_WEATHER_CACHE_SIZE", "100000"))
+NUMERIC_FIELDS = ('temperature', 'humidity', 'rainfall', 'wind_speed', 'pressure', 'UV_index')
+
+
+def date_range(days: int, start: datetime.date = None, step: int = 1) -> list[str]:
+    """
+    Returns consecutive dates in YYYY-MM-DD format
+
+    :param days: The number of dates
+    :param start: The first date. Defaults to today.
+    :param step: The number of days between dates, use -1 for past dates
+    :return: List of dates
+    """
+    start = start if start is not None else datetime.date.today()
+    return [(start + datetime.timedelta(days=i * step)).isoformat() for i in range(days)]
+
+
+class WeatherFrame(object):
+    """
+    Weather data of several locations and dates. Each numeric field is a (locations x dates) NumPy array.
+    """
+
+    def __init__(self, locations: list[str], dates: list[str | None], records: list[list[dict[str, any]]]) -> None:
+        """
+        Builds the frame
+
+        :param locations: The locations (rows)
+        :param dates: The dates (columns), None for current weather
+        :param records: The weather records, one list of records (one per date) per location
+        """
+        self.locations = locations
+        self.dates = dates
+        self._records = records
+        _shape = (len(locations), len(dates))
+        self._columns = {field: np.fromiter((r[field] for row in records for r in row), dtype=np.float64,
+                                            count=_shape[0] * _shape[1]).reshape(_shape) for field in NUMERIC_FIELDS}
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self._columns[field]
+
+    def record(self, location_idx: int, date_idx: int) -> dict[str, any]:
+        """
+        Returns a single weather record
+
+        :param location_idx: The index of the location
+        :param date_idx: The index of the date
+        :return: The weather record
+        """
+        return self._records[location_idx][date_idx]
+
+    def records(self, location_idx: int = 0) -> list[dict[str, any]]:
+        """
+        Returns the weather records of a location for all dates
+
+        :param location_idx: The index of the location
+        :return: List of weather records
+        """
+        return list(self._records[location_idx])
+
+
+class WeatherCache(object):
+    """
+    A bounded, thread-safe cache of weather records with a TTL per (location, date)
+    """
+
+    def __init__(self, fetch: callable, ttl: float = WEATHER_CACHE_TTL, max_entries: int = WEATHER_CACHE_SIZE,
+                 clock: callable = time.monotonic, fetch_many: callable = None) -> None:
+        """
+        Initializes the cache
+
+        :param fetch: A callable (location, date) returning a weather record
+        :param ttl: The number of seconds a record is kept
+        :param max_entries: The maximum number of records kept, the least recently used records are evicted
+        :param clock: The clock used for expiry
+        :param fetch_many: A callable taking a list of (location, date) pairs and returning their weather records in
+                           one batch (e.g. `WeatherProvider.fetch_many`). Defaults to calling `fetch` for each pair.
+        """
+        self._fetch = fetch
+        self._fetch_many_fn = fetch_many
+        self.ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str | None], tuple[float, dict[str, any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fetch_many(self, keys: list[tuple[str, str | None]]) -> list[dict[str, any]]:
+        if self._fetch_many_fn is not None:
+            return self._fetch_many_fn(keys)
+        return [self._fetch(location, date) for location, date in keys]
+
+    def get_many(self, locations: list[str], dates: list[str | None]) -> WeatherFrame:
+        """
+        Returns the weather of several locations and dates, fetching only the records that are not cached
+
+        :param locations: The locations (e.g. ["London", "Paris"])
+        :param dates: The dates in YYYY-MM-DD format, None for current weather
+        :return: The weather frame
+        """
+        _now = self._clock()
+        _keys = [(location, date) for location in locations for date in dates]
+        _found = {}
+        with self._lock:
+            for key in _keys:
+                _entry = self._entries.get(key)
+                if _entry is not None and _entry[0] > _now:
+                    self._entries.move_to_end(key)
+                    _found[key] = _entry[1]
+        _missing = list(dict.fromkeys(k for k in _keys if k not in _found))
+        if len(_missing) > 0:
+            _fetched = self._fetch_many(_missing)
+            with self._lock:
+                for key, record in zip(_missing, _fetched):
+                    self._entries[key] = (_now + self.ttl, record)
+                    self._entries.move_to_end(key)
+                    _found[key] = record
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return WeatherFrame(locations, dates, [[_found[(location, date)] for date in dates] for location in locations])
+
+    def get(self, location: str, date: str = None) -> dict[str, any]:
+        """
+        Returns the weather of a location and date
+
+        :param location: The location
+        :param date: The date in YYYY-MM-DD format, None for current weather
+        :return: The weather record
+        """
+        return self.get_many([location], [date]).record(0, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,198 @@
+"""
+Weather data providers.
+
+`RandomWeatherProvider` generates deterministic dummy data. `HttpWeatherProvider` fetches the data from a weather API
+(e.g. the stub server in `infinite_fn.local_apis.weather_stub_server`) over a pooled HTTP connection, with a rate limit
+and a timeout per request. Concurrent requests for the same (location, date) are coalesced into one upstream call.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+WEATHER_PROVIDER = os.getenv("INFINITE_FN_WEATHER_PROVIDER", "random")
+WEATHER_API_URL = os.getenv("INFINITE_FN_WEATHER_API_URL", "http://localhost:8765")
+WEATHER_API_TIMEOUT = float(os.getenv("INFINITE_FN_WEATHER_API_TIMEOUT", "5"))
+WEATHER_API_RATE = float(os.getenv("INFINITE_FN_WEATHER_API_RATE", "50"))
+WEATHER_API_POOL_SIZE = int(os.getenv("INFINITE_FN_WEATHER_API_POOL_SIZE", "16"))
+
+
+class WeatherProvider(object):
+    """
+    Base class of weather providers
+    """
+
+    def fetch(self, location: str, date: str = None) -> dict[str, any]:
+        """
+        Fetches the weather of a location and date
+
+        :param location: The location (e.g. "London")
+        :param date: The date in YYYY-MM-DD format, None for current weather
+        :return: The weather record
+        """
+        raise NotImplementedError()
+
+    def fetch_many(self, keys: list[tuple[str, str | None]]) -> list[dict[str, any]]:
+        """
+        Fetches the weather of several (location, date) pairs
+
+        :param keys: The (location, date) pairs
+        :return: The weather records, in the order of the keys
+        """
+        return [self.fetch(location, date) for location, date in keys]
+
+    def close(self) -> None:
+        pass
+
+
+class RandomWeatherProvider(WeatherProvider):
+    """
+    Dummy weather data. The weather of a (location, date) is always the same for the same seed.
+    """
+
+    def __init__(self, seed: str = "") -> None:
+        """
+        :param seed: The seed, change it to get different weather
+        """
+        self.seed = seed
+
+    def fetch(self, location: str, date: str = None) -> dict[str, any]:
+        _random = random.Random(f"{self.seed}:{location}:{date}")
+        return {
+            'location': location,
+            'date': date if date else 'current',
+            'temperature': _random.randint(-30, 50),  # Temperature in degrees Celsius
+            'humidity': _random.randint(0, 100),  # Humidity in percentage
+            'rainfall': _random.randint(0, 50) if _random.random() < 0.3 else 0,  # 30% chance of rain
+            'wind_speed': _random.randint(0, 20),  # Wind speed in km/h
+            'wind_direction': _random.choice(['N', 'S', 'E', 'W']),  # Wind direction
+            'pressure': _random.randint(950, 1050),  # Atmospheric pressure in hPa
+            'UV_index': _random.randint(0, 11)  # UV index
+        }
+
+
+class RateLimiter(object):
+    """
+    Thread-safe token bucket
+    """
+
+    def __init__(self, rate: float, burst: int = None, clock: callable = time.monotonic,
+                 sleep: callable = time.sleep) -> None:
+        """
+        :param rate: The number of permits per second, 0 or less for no limit
+        :param burst: The maximum number of permits that can be taken at once. Defaults to one second worth of permits.
+        :param clock: The clock
+        :param sleep: The function used to wait for permits
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a permit, waiting until one is available
+
+        :return: The number of seconds waited
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            _now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (_now - self._updated) * self.rate)
+            self._updated = _now
+            self._tokens -= 1
+            # a negative balance reserves a future permit, the caller waits until it is due
+            _wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if _wait > 0:
+            self._sleep(_wait)
+        return _wait
+
+
+class HttpWeatherProvider(WeatherProvider):
+    """
+    Fetches weather data with `GET <base_url>/weather?location=<location>&date=<date>`
+    """
+
+    def __init__(self, base_url: str = WEATHER_API_URL, timeout: float = WEATHER_API_TIMEOUT,
+                 rate: float = WEATHER_API_RATE, pool_size: int = WEATHER_API_POOL_SIZE) -> None:
+        """
+        :param base_url: The URL of the weather API
+        :param timeout: The timeout of a request in seconds
+        :param rate: The maximum number of upstream requests per second, 0 for no limit
+        :param pool_size: The number of pooled connections, also the number of concurrent requests of `fetch_many`
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.upstream_requests = 0
+        self._limiter = RateLimiter(rate)
+        self._session = requests.Session()
+        _adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", _adapter)
+        self._session.mount("https://", _adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="weather-api")
+        self._inflight: dict[tuple[str, str | None], Future] = {}
+        self._lock = threading.Lock()
+
+    def _request(self, location: str, date: str = None) -> dict[str, any]:
+        self._limiter.acquire()
+        _params = {"location": location}
+        if date is not None:
+            _params["date"] = date
+        with self._lock:
+            self.upstream_requests += 1
+        _response = self._session.get(f"{self.base_url}/weather", params=_params, timeout=self.timeout)
+        _response.raise_for_status()
+        return _response.json()
+
+    def _submit(self, location: str, date: str = None) -> Future:
+        _key = (location, date)
+        with self._lock:
+            _future = self._inflight.get(_key)
+            if _future is not None:
+                return _future
+            _future = self._executor.submit(self._request, location, date)
+            self._inflight[_key] = _future
+        _future.add_done_callback(lambda f: self._forget(_key, f))
+        return _future
+
+    def _forget(self, key: tuple[str, str | None], future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def fetch(self, location: str, date: str = None) -> dict[str, any]:
+        return self._submit(location, date).result()
+
+    def fetch_many(self, keys: list[tuple[str, str | None]]) -> list[dict[str, any]]:
+        _futures = [self._submit(location, date) for location, date in keys]
+        return [f.result() for f in _futures]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._session.close()
+
+
+def get_weather_provider(name: str = WEATHER_PROVIDER) -> WeatherProvider:
+    """
+    Returns the weather provider by name
+
+    :param name: "random" or "http"
+    :return: The weather provider
+    """
+    if name == "random":
+        return RandomWeatherProvider()
+    if name == "http":
+        logger.info(f"Fetching weather data from {WEATHER_API_URL}")
+        return HttpWeatherProvider()
+    raise ValueError(f"Unknown weather provider {name}. Expected random or http")
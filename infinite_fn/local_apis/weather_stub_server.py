@@ -0,0 +1,82 @@
+"""
+A local weather API serving `RandomWeatherProvider` data, for tests and benchmarks.
+
+Run it with `python -m infinite_fn.local_apis.weather_stub_server [port] [latency]`.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from infinite_fn.local_apis.weather_provider import RandomWeatherProvider
+
+
+class WeatherStubServer(ThreadingHTTPServer):
+    """
+    Serves `GET /weather?location=<location>&date=<date>`
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, seed: str = "") -> None:
+        """
+        :param port: The port, 0 for a free port
+        :param latency: Seconds added to every response, to simulate a remote API
+        :param seed: The seed of the weather data
+        """
+        super().__init__(("127.0.0.1", port), _WeatherHandler)
+        self.latency = latency
+        self.provider = RandomWeatherProvider(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "WeatherStubServer":
+        """
+        Serves requests in a background thread
+
+        :return: The server
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="weather-stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _WeatherHandler(BaseHTTPRequestHandler):
+    server: WeatherStubServer
+
+    def do_GET(self) -> None:
+        _url = urlparse(self.path)
+        _query = parse_qs(_url.query)
+        if _url.path != "/weather" or "location" not in _query:
+            self.send_error(404)
+            return
+        with self.server._lock:
+            self.server.requests += 1
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        _body = json.dumps(self.server.provider.fetch(_query["location"][0], _query.get("date", [None])[0])).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_body)))
+        self.end_headers()
+        self.wfile.write(_body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+if __name__ == '__main__':
+    _server = WeatherStubServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765,
+                                latency=float(sys.argv[2]) if len(sys.argv) > 2 else 0.0)
+    print(f"Serving weather data on {_server.url}")
+    _server.serve_forever()
@@ -1,24 +1,49 @@
-import importlib
-import inspect
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator
 
-import gradio as gr
 from dotenv import load_dotenv
-from func_ai.function_indexer import FunctionIndexer
-from func_ai.utils import OpenAIInterface
 
-_chat_message = []
+from infinite_fn.context import SUMMARY_TOKENS, ContextManager, split_conversation
+from infinite_fn.semantic_cache import SemanticCache
+from infinite_fn.sessions import Session, SessionConflictError, create_session_store
+from infinite_fn.startup import INDEXED_MODULES, Readiness, create_function_indexer, start_in_background
+from infinite_fn.telemetry import configure_exporters, telemetry
+
+if TYPE_CHECKING:
+    from infinite_fn.llm import AsyncOpenAIInterface
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
-_fi = FunctionIndexer()
+# gradio, func_ai and the function index are loaded lazily so that the server starts before the index is ready
+_fi = None
+_search = None
+readiness = Readiness()
+
+CONCURRENCY = int(os.getenv("INFINITE_FN_CONCURRENCY", "32"))
+SEMANTIC_CACHE_ENABLED = os.getenv("INFINITE_FN_SEMANTIC_CACHE", "1") == "1"
+MULTI_CALL_ENABLED = os.getenv("INFINITE_FN_MULTI_CALL", "0") == "1"
+MULTI_CALL_MODEL = os.getenv("INFINITE_FN_MULTI_CALL_MODEL", "gpt-3.5-turbo-1106")
+SERVER_PORT = int(os.getenv("INFINITE_FN_PORT", "9003"))
+# with more than one worker process, sessions and bookings are kept in the shared state database
+WORKERS = int(os.getenv("INFINITE_FN_WORKERS", "1"))
 
 
-def get_llm() -> OpenAIInterface:
+def get_llm() -> "AsyncOpenAIInterface":
     """
     Returns the LLM interface with system prompt
 
     :return:
     """
-    intf = OpenAIInterface()
+    from infinite_fn.llm import AsyncOpenAIInterface
+
+    intf = AsyncOpenAIInterface()
     intf.add_conversation_message({"role": "system",
                                    "content": "You are a helpful assistant that helps people in achieving their goal through a variety of functions."
                                               "Do not answer the user's question directly but first reflect on what the user wants to achieve."
@@ -30,80 +55,261 @@ def get_llm() -> OpenAIInterface:
     return intf
 
 
-def index_module(module_name: str, function_indexer: FunctionIndexer):
+def get_summarizer() -> "AsyncOpenAIInterface":
     """
-    Indexes all functions in a module
+    Returns a new LLM interface for summarizing older turns of a conversation
 
-    :param module_name: The name of the module to index (e.g. "func_ai.utils")
-    :param function_indexer:  The function indexer to use
     :return:
     """
-    module = importlib.import_module(module_name)
-    functions = inspect.getmembers(module, inspect.isfunction)
-    # print({fn: isinstance(f, functools.partial) for fn, f in functions})
-    function_indexer.index_functions([f for _, f in functions], enhanced_summary=True)
+    from infinite_fn.llm import AsyncOpenAIInterface
+
+    return AsyncOpenAIInterface(max_tokens=SUMMARY_TOKENS)
 
 
-def update_convo(user_message: str):
+_sessions = create_session_store(llm_factory=get_llm)
+_context = ContextManager(summarizer_factory=get_summarizer, on_update=_sessions.save)
+_semantic_cache = SemanticCache()
+
+
+async def update_convo(user_message: str, session: Session) -> AsyncIterator[str]:
     """
-    Updates the conversation with a user message
+    Updates the conversation with a user message. The reply is yielded as it is produced: first the reflection and the
+    selected functions as each stage finishes, then the final answer token by token.
 
     :param user_message:
-    :return:
+    :param session: The chat session of the user
+    :return: Async iterator of the reply so far
     """
-    global _fi
-    _llm_interface = get_llm()
-    _resp = _llm_interface.send(user_message)
-    _fresp = _fi.find_functions(query=_resp['content'], max_results=3)
-    assert len(_fresp) > 0, "No functions found"
-    if len(_fresp) >= 1:
+    from infinite_fn.executor import aexecute_function_call, aexecute_tool_calls, tool_schemas
+    from infinite_fn.llm import aembed
+    from infinite_fn.routing import route
+    from infinite_fn.schema_compiler import compact_schema
+
+    _llm_interface = session.llm_interface
+    _context.fit(session)
+    _stages = []
+    _query_embedding, _cached, _cache_context = None, None, None
+    _system, _summary, _turns = split_conversation(_llm_interface.conversation_store.conversation)
+    if SEMANTIC_CACHE_ENABLED and _summary is None and len(_turns) == 0:
+        # only the first message of a conversation is looked up: the routing of a later message depends on the
+        # earlier turns. Entries are scoped by the system prompt, so the cached reflection is the one this
+        # conversation would get and is replayed instead of asking the LLM.
+        _cache_context = json.dumps(_system, sort_keys=True)
+        with telemetry.span("semantic_cache") as _span:
+            _query_embedding = await aembed(_fi, user_message)
+            _cached = _semantic_cache.get(_query_embedding, context=_cache_context)
+            _span.set(hit=_cached is not None)
+        telemetry.increment("semantic_cache_lookups", "hit" if _cached is not None else "miss")
+    elif SEMANTIC_CACHE_ENABLED:
+        telemetry.increment("semantic_cache_lookups", "bypass")
+    _cached_reflection, _cached_candidates = _cached if _cached is not None else (None, None)
+    _route = await route(_llm_interface, _search, user_message, max_results=3, query_embedding=_query_embedding,
+                         candidates=_cached_candidates, reflection=_cached_reflection)
+    _reflection, _fresp = _route.reflection, _route.candidates
+    if _cache_context is not None and _cached is None and len(_fresp) > 0:
+        _semantic_cache.put(_query_embedding, (_reflection, _fresp), context=_cache_context)
+    if _reflection is not None:
+        _stages.append(f"_{_reflection}_")
+        yield "\n\n".join(_stages)
+    _answer = None
+    _final_params = {}
+    if len(_fresp) == 0:
+        _answer = "I am sorry but I cannot help you with that any further."
+        _llm_interface.add_conversation_message({"role": "assistant", "content": _answer})
+    elif MULTI_CALL_ENABLED:
         _llm_interface.add_conversation_message({"role": "assistant",
-                                                 "content": f"I have found a function to call: {_fresp[0].name}"},
-                                                update_llm=True,
-                                                functions=[_fresp[0].wrapper.schema])
-        _fresp[0].wrapper.from_response(_llm_interface.conversation_store.get_last_message())
-        _llm_interface.add_conversation_message(_fresp[0].wrapper.last_call['function_response'], update_llm=True)
+                                                 "content": f"I have found functions to call: "
+                                                            f"{', '.join(r.name for r in _fresp)}"})
+        with telemetry.span("function_selection", llm_interface=_llm_interface):
+            await _llm_interface.aupdate_llm_conversation(tools=tool_schemas([r.wrapper for r in _fresp]),
+                                                          model=MULTI_CALL_MODEL)
+        _tool_calls = _llm_interface.conversation_store.get_last_message().get("tool_calls")
+        if _tool_calls:
+            _stages.append(f"_Calling {', '.join(tc['function']['name'] for tc in _tool_calls)}_")
+            yield "\n\n".join(_stages)
+            for _tool_response in await aexecute_tool_calls({r.name: r.wrapper for r in _fresp}, _tool_calls):
+                _llm_interface.add_conversation_message(_tool_response)
+            _final_params = dict(model=MULTI_CALL_MODEL)
     else:
         _llm_interface.add_conversation_message({"role": "assistant",
-                                                 "content": f"I am sorry but I cannot help you with that any further."},
-                                                update_llm=True)
-    return f"{_llm_interface.conversation_store.get_last_message()['content']}\n\n Usage: {_llm_interface.get_usage()}"
+                                                 "content": f"I have found a function to call: {_fresp[0].name}"})
+        with telemetry.span("function_selection", llm_interface=_llm_interface):
+            await _llm_interface.aupdate_llm_conversation(functions=[compact_schema(_fresp[0].wrapper)])
+        _message = _llm_interface.conversation_store.get_last_message()
+        if "function_call" in _message:
+            _stages.append(f"_Calling {_fresp[0].name}_")
+            yield "\n\n".join(_stages)
+            _llm_interface.add_conversation_message(await aexecute_function_call(_fresp[0].wrapper, _message))
+    if _answer is None and _llm_interface.conversation_store.get_last_message()["role"] in ("function", "tool"):
+        _answer = ""
+        try:
+            with telemetry.span("final_answer"):
+                async for _token in _llm_interface.astream(**_final_params):
+                    _answer += _token
+                    yield "\n\n".join(_stages + [_answer])
+        except Exception:
+            # the partial answer was added to the conversation with a note by `astream`
+            logger.exception(f"Streaming the answer of session {session.session_id} failed")
+            _note = "_The answer was interrupted by an error, please try again._"
+            _answer = f"{_answer}\n\n{_note}" if _answer else _note
+    elif _answer is None:
+        _answer = _llm_interface.conversation_store.get_last_message()["content"]
+    _context.schedule(session)
+    yield "\n\n".join(_stages + [f"{_answer}\n\n Usage: {_llm_interface.get_usage()}"])
+
+
+def load_index(update: bool = True) -> None:
+    """
+    Restores the bookings, loads (and if needed updates) the function index and marks the app as ready
+
+    :param update: Whether to index new and changed functions and prewarm the attraction cache. Worker processes
+                   load the index built by the main process read-only instead, and the main process prewarms the
+                   attraction cache they share.
+    :return:
+    """
+    global _fi, _search
+    from infinite_fn.indexing import index_modules
+    from infinite_fn.local_apis.booking_log import BOOKING_DATA_PATH, BookingLog
+    from infinite_fn.local_apis.booking_store import BookingStore
+    from infinite_fn.python_fns import attractions, lodging, trip
+    from infinite_fn.search import HybridFunctionSearch
+
+    readiness.set_stage("restoring bookings")
+    for _name, _store in (("trips", trip.trip_bookings), ("attractions", attractions.attraction_bookings),
+                          ("lodgings", lodging.bookings)):
+        # bookings in the shared state database are durable without a log
+        if isinstance(_store, BookingStore):
+            _store.attach_log(BookingLog(BOOKING_DATA_PATH, _name))
+    readiness.set_stage("loading function index")
+    _indexer = create_function_indexer(read_only=not update)
+    if update:
+        readiness.set_stage("indexing")
+        index_modules(INDEXED_MODULES, _indexer)
+    _fi, _search = _indexer, HybridFunctionSearch(_indexer)
+    readiness.set_ready()
+    if update:
+        threading.Thread(target=attractions.attraction_cache.prewarm, name="attraction-prewarm", daemon=True).start()
+
+
+async def respond(history, text, session_id: str):
+    history = history + [[text, ""]]
+    yield history, ""
+    if not readiness.is_ready:
+        history[-1][1] = "_Loading the function index, please wait..._"
+        yield history, ""
+        while not readiness.is_ready:
+            if readiness.error is not None:
+                history[-1][1] = "I am sorry but I cannot help you right now."
+                yield history, ""
+                return
+            await asyncio.sleep(0.1)
+    _session = _sessions.get(session_id)
+    _saved = True
+    async with _session.lock:
+        try:
+            with telemetry.span("turn", llm_interface=_session.llm_interface) as _span:
+                async for _reply in update_convo(text, _session):
+                    history[-1][1] = _reply
+                    # the time the UI takes to consume an update is not part of the turn
+                    _yielded = time.perf_counter()
+                    try:
+                        yield history, ""
+                    finally:
+                        _span.exclude(time.perf_counter() - _yielded)
+        finally:
+            # what the turn added to the conversation is kept even if it failed
+            try:
+                _sessions.save(_session)
+            except SessionConflictError:
+                logger.warning(f"Session {session_id} was continued by another worker, the turn was not saved")
+                _saved = False
+    if not _saved:
+        history[-1][1] += "\n\n_This conversation was continued in another window meanwhile, so this reply was not " \
+                          "kept in it._"
+        yield history, ""
+
 
+def create_app():
+    """
+    Creates the web app: the chat UI at / plus `/healthz` (the process is up) and `/ready` (the function index is
+    loaded, 503 until then)
+
+    :return: The FastAPI app
+    """
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+
+    async def _respond(history, text, request: gr.Request):
+        async for _update in respond(history, text, request.session_hash):
+            yield _update
+
+    with gr.Blocks() as demo:
+        chatbot = gr.Chatbot([], elem_id="chatbot")
+
+        with gr.Row():
+            with gr.Column(scale=1):
+                txt = gr.Textbox(
+                    show_label=False,
+                    placeholder="Enter text and press enter",
+                    container=False
+                )
+        txt.submit(_respond, [chatbot, txt], [chatbot, txt])
+    demo.queue(concurrency_count=CONCURRENCY)
+
+    app = FastAPI()
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    @app.get("/ready")
+    def ready():
+        return JSONResponse(readiness.to_dict(), status_code=200 if readiness.is_ready else 503)
+
+    return gr.mount_gradio_app(app, demo, path="/")
 
-def add_text(history, text):
-    global _chat_message
-    history = history + [(text, None)]
-    _chat_message.append(update_convo(text))
-    return history, ""
 
+def create_worker_app():
+    """
+    Creates the web app of a worker process. The function index is loaded read-only from the index built by the main
+    process, see `serve`.
+
+    :return: The FastAPI app
+    """
+    configure_exporters()
+    start_in_background(functools.partial(load_index, update=False), readiness, name="load-index")
+    return create_app()
+
+
+def serve(workers: int = WORKERS) -> None:
+    """
+    Serves the app on INFINITE_FN_PORT. With more than one worker, the function index is built once in this process
+    and the workers share it memory-mapped read-only; sessions and bookings are kept in the shared state database.
+
+    :param workers: The number of worker processes
+    :return:
+    """
+    import uvicorn
 
-def bot(history):
-    global _chat_message
-    history[-1][1] = _chat_message[-1]
-    return history
+    if workers <= 1:
+        configure_exporters()
+        start_in_background(load_index, readiness, name="load-index")
+        uvicorn.run(create_app(), host="0.0.0.0", port=SERVER_PORT)
+        return
+    from infinite_fn.build_index import build_index
 
+    # inherited by the worker processes, which import this module again
+    os.environ["INFINITE_FN_STATE_BACKEND"] = "sqlite"
+    build_index()
+    from infinite_fn.python_fns import attractions
 
-with gr.Blocks() as demo:
-    chatbot = gr.Chatbot([], elem_id="chatbot")
+    # once for all workers, which read the prewarmed attractions from the shared cache file
+    threading.Thread(target=attractions.attraction_cache.prewarm, name="attraction-prewarm", daemon=True).start()
+    uvicorn.run("infinite_fn.main:create_worker_app", factory=True, host="0.0.0.0", port=SERVER_PORT,
+                workers=workers)
 
-    with gr.Row():
-        with gr.Column(scale=1):
-            txt = gr.Textbox(
-                show_label=False,
-                placeholder="Enter text and press enter",
-                container=False
-            )
-    txt.submit(add_text, [chatbot, txt], [chatbot, txt]).then(
-        bot, chatbot, chatbot
-    )
 
 if __name__ == "__main__":
-    # print(_fi._collection.get())
-    # _fi.reset_function_index()
-    index_module("infinite_fn.python_fns.trip", _fi)
-    index_module("infinite_fn.python_fns.attractions", _fi)
-    index_module("infinite_fn.python_fns.weather", _fi)
-    index_module("infinite_fn.python_fns.lodging", _fi)
-
-    demo.launch(server_name="0.0.0.0", server_port=9003)
+    serve()
     # run_alternative_convo()
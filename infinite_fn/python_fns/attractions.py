@@ -2,24 +2,41 @@ import uuid
 
 from func_ai.utils.llm_tools import OpenAIInterface
 
+from infinite_fn.local_apis.attraction_cache import AttractionCache, LLMAttractionLoader
+from infinite_fn.local_apis.booking_store import create_booking_store
+from infinite_fn.tool_registry import tool
 
-def get_attractions_for_location(location: str):
+attraction_cache = AttractionCache(LLMAttractionLoader(OpenAIInterface))
+
+
+@tool(timeout=60)
+def get_attractions_for_location(location: str) -> list[dict[str, str]]:
     """
-    Returns a list of attractions for a given location. The function will return at most 10 attrachions.
-    Each attraction will have a short description.
+    Returns a list of attractions for a given location. The function will return at most 10 attractions.
+    Each attraction will have a name and a short description.
 
     :param location: The location for which to return attractions. E.g. "London"
     :return: Returns a list of attractions
     """
-    llm_interface = OpenAIInterface()
-    _resp = llm_interface.send(
-        f"What are the best attractions in {location}? Give me at most 10 attractions. Provide a short description for each attraction.")
-    return _resp['content']
+    return attraction_cache.get(location)
+
+
+@tool(timeout=120)
+def get_attractions_for_locations(locations: list[str]) -> dict[str, list[dict[str, str]]]:
+    """
+    Returns the attractions of several locations at once, e.g. to compare destinations.
+    The function will return at most 10 attractions per location, each with a name and a short description.
+
+    :param locations: The locations for which to return attractions. E.g. ["London", "Paris"]
+    :return: Returns a dictionary of location to its list of attractions
+    """
+    return attraction_cache.get_many(locations)
 
 
-attraction_bookings = {}
+attraction_bookings = create_booking_store("attractions", indexes=("name_for_booking",))
 
 
+@tool(side_effect=True)
 def book_attraction(location: str, name_for_booking: str, attraction_name: str, date_and_time: str,
                     persons: int) -> str:
     """
@@ -33,15 +50,16 @@ def book_attraction(location: str, name_for_booking: str, attraction_name: str,
     :return: Returns the booking number
     """
     booking_uuid = str(uuid.uuid4())
-    attraction_bookings[booking_uuid] = {
+    attraction_bookings.add({
         "location": location,
         "name_for_booking": name_for_booking,
         "attraction_name": attraction_name,
         "date_and_time": date_and_time,
-        "persons": persons}
+        "persons": persons}, booking_uuid)
     return booking_uuid
 
 
+@tool
 def get_attraction_booking_by_id(booking_uuid: str) -> dict[str, any]:
     """
     Returns the booking for a given booking uuid.
@@ -52,12 +70,12 @@ def get_attraction_booking_by_id(booking_uuid: str) -> dict[str, any]:
     return attraction_bookings[booking_uuid]
 
 
+@tool
 def get_attraction_booking_by_name(name_for_booking: str) -> dict[str, any]:
     """
-    Returns the booking for a given booking uuid.
+    Returns the booking for a given name for booking.
 
-    :param booking_uuid: The booking uuid
-    :return: Returns the booking
+    :param name_for_booking: The name of the person who made the booking
+    :return: Returns the booking or None if there is no booking under that name
     """
-    return next(iter(
-        [booking for booking in attraction_bookings.values() if booking['name_for_booking'] == name_for_booking]))
+    return attraction_bookings.first('name_for_booking', name_for_booking)
@@ -1,7 +1,13 @@
-import random
-import string
+from infinite_fn.local_apis.booking_store import create_booking_store
+from infinite_fn.local_apis.lodging_catalog import LodgingCatalog
+from infinite_fn.local_apis.lodging_table import LodgingTable
+from infinite_fn.tool_registry import tool
 
+# The lodgings of each location are generated once and cached
+catalog = LodgingCatalog()
 
+
+@tool(pure=True, json_result=True)
 def get_all_lodgings(location):
     """
     Returns list of logding options for a given location. The response includes hotels, guest houses, B&Bs and hostels.
@@ -9,48 +15,23 @@ def get_all_lodgings(location):
     :param location: The location for which to return lodgings. E.g. "London"
     :return: Returns a list of lodgings
     """
-    lodgings = []
-    possible_amenities = ['Free WiFi', 'Parking', 'Breakfast', 'Pool', 'Gym']
-
-    # Create 10 dummy lodgings for the given location
-    for i in range(10):
-        lodging_id = f'LODGE{i}'  # Create an ID like 'LODGE0', 'LODGE1', etc.
-        lodging_name = 'Lodge-' + ''.join(random.choices(string.ascii_uppercase, k=5))
-        lodging_price = round(random.uniform(50.0, 200.0), 2)
-        lodging_rating = round(random.uniform(1.0, 5.0), 1)
-        lodging_amenities = random.sample(possible_amenities, k=random.randint(1, len(possible_amenities)))
-
-        # Add the lodging to the list
-        lodgings.append({
-            'id': lodging_id,
-            'name': lodging_name,
-            'location': location,
-            'price': lodging_price,
-            'rating': lodging_rating,
-            'amenities': lodging_amenities
-        })
-
-    return lodgings
+    return [lodging.to_dict() for lodging in catalog.lodgings(location)]
 
 
-def get_lodging_by_id(lodging_id):
+@tool(pure=True)
+def get_lodging_by_id(lodging_id, location='London'):
     """
     This function returns a specific lodging based on its id.
 
     :param lodging_id: The id of the lodging to return. E.g. "LODGE0"
+    :param location: The location of the lodging. Default is "London".
     :return: Returns a dictionary representing a lodging or None if no such lodging exists
     """
-    # Assume that all lodgings are in 'London' for this dummy data
-    all_lodgings = get_all_lodgings('London')
-
-    for lodging in all_lodgings:
-        if lodging['id'] == lodging_id:
-            return lodging  # Found the lodging
-
-    # If we got here, no lodging with the given id was found
-    return None
+    lodging = catalog.get(location, lodging_id)
+    return lodging.to_dict() if lodging is not None else None
 
 
+@tool(pure=True, json_result=True)
 def filter_lodgings_by_price(lodgings, min_price, max_price):
     """
     This function filters the list of lodgings by price and returns lodgings in the given price range.
@@ -60,9 +41,11 @@ def filter_lodgings_by_price(lodgings, min_price, max_price):
     :param max_price: The maximum price of the lodgings to return. E.g. 200.0
     :return: Returns a list of lodgings in the given price range
     """
-    return [lodging for lodging in lodgings if min_price <= lodging['price'] <= max_price]
+    table, rows = LodgingTable.view(lodgings)
+    return table.select(table.query(rows, min_price=min_price, max_price=max_price))
 
 
+@tool(pure=True, json_result=True)
 def filter_lodgings_by_rating(lodgings, min_rating):
     """
     This function filters the list of lodgings by rating and returns lodgings with a rating greater than or equal to the given rating.
@@ -71,9 +54,11 @@ def filter_lodgings_by_rating(lodgings, min_rating):
     :param min_rating: The minimum rating of the lodgings to return. E.g. 3.5
     :return: Returns a list of lodgings with a rating greater than or equal to the given rating
     """
-    return [lodging for lodging in lodgings if lodging['rating'] >= min_rating]
+    table, rows = LodgingTable.view(lodgings)
+    return table.select(table.query(rows, min_rating=min_rating))
 
 
+@tool(pure=True, json_result=True)
 def filter_lodgings_by_amenities(lodgings, amenities):
     """
     This function filters the list of lodgings by amenities and returns lodgings that offer all the given amenities.
@@ -82,9 +67,11 @@ def filter_lodgings_by_amenities(lodgings, amenities):
     :param amenities: The list of amenities to filter by. E.g. ['Free WiFi', 'Parking']
     :return: Returns a list of lodgings that offer all the given amenities
     """
-    return [lodging for lodging in lodgings if all(amenity in lodging.get('amenities', []) for amenity in amenities)]
+    table, rows = LodgingTable.view(lodgings)
+    return table.select(table.query(rows, amenities=amenities))
 
 
+@tool(pure=True, json_result=True)
 def sort_lodgings_by_price(lodgings, ascending=True):
     """
     This function sorts the list of lodgings by price in ascending or descending order.
@@ -93,9 +80,11 @@ def sort_lodgings_by_price(lodgings, ascending=True):
     :param ascending: Whether to sort in ascending order. Default is True.
     :return: Returns a list of lodgings sorted by price
     """
-    return sorted(lodgings, key=lambda lodging: lodging['price'], reverse=not ascending)
+    table, rows = LodgingTable.view(lodgings)
+    return table.select(table.query(rows, sort_by='price', ascending=ascending))
 
 
+@tool(pure=True, json_result=True)
 def sort_lodgings_by_rating(lodgings, ascending=False):
     """
     This function sorts the list of lodgings by rating in ascending or descending order.
@@ -104,13 +93,36 @@ def sort_lodgings_by_rating(lodgings, ascending=False):
     :param ascending: Whether to sort in ascending order. Default is False.
     :return: Returns a list of lodgings sorted by rating
     """
-    return sorted(lodgings, key=lambda lodging: lodging['rating'], reverse=not ascending)
+    table, rows = LodgingTable.view(lodgings)
+    return table.select(table.query(rows, sort_by='rating', ascending=ascending))
+
+
+@tool(pure=True, json_result=True)
+def search_lodgings(location, min_price=None, max_price=None, min_rating=None, amenities=None, sort_by=None,
+                    ascending=True, limit=None):
+    """
+    This function searches the lodgings of a location, filtering, sorting and limiting them in a single step.
+
+    :param location: The location for which to search lodgings. E.g. "London"
+    :param min_price: The minimum price of the lodgings to return. E.g. 50.0
+    :param max_price: The maximum price of the lodgings to return. E.g. 200.0
+    :param min_rating: The minimum rating of the lodgings to return. E.g. 3.5
+    :param amenities: The list of amenities every lodging must offer. E.g. ['Free WiFi', 'Parking']
+    :param sort_by: The field to sort by, either "price" or "rating"
+    :param ascending: Whether to sort in ascending order. Default is True.
+    :param limit: The maximum number of lodgings to return. E.g. 5
+    :return: Returns a list of matching lodgings
+    """
+    table = catalog.table(location)
+    return table.select(table.query(min_price=min_price, max_price=max_price, min_rating=min_rating,
+                                    amenities=amenities, sort_by=sort_by, ascending=ascending, limit=limit))
 
 
-# A list of bookings. Each booking is a dictionary.
-bookings = []
+# The bookings, indexed by booking id and user id. Each booking is a dictionary.
+bookings = create_booking_store("lodgings", id_prefix="BOOKING", indexes=("user_id",))
 
 
+@tool(side_effect=True)
 def book_lodging(lodging_id, user_id, start_date, end_date):
     """
     This function creates a booking for a specific lodging.
@@ -121,9 +133,8 @@ def book_lodging(lodging_id, user_id, start_date, end_date):
     :param end_date: The end date of the booking. E.g. "2023-07-07"
     :return: Returns a dictionary representing the new booking
     """
-    global bookings
     # Create a unique booking id
-    booking_id = f'BOOKING{len(bookings)}'
+    booking_id = bookings.new_id()
     new_booking = {
         'id': booking_id,
         'lodging_id': lodging_id,
@@ -131,10 +142,11 @@ def book_lodging(lodging_id, user_id, start_date, end_date):
         'start_date': start_date,
         'end_date': end_date
     }
-    bookings.append(new_booking)
+    bookings.add(new_booking, booking_id)
     return new_booking
 
 
+@tool(side_effect=True)
 def cancel_booking(booking_id):
     """
     This function cancels a specific booking.
@@ -142,14 +154,10 @@ def cancel_booking(booking_id):
     :param booking_id: The id of the booking to cancel. E.g. "BOOKING0"
     :return: Returns a boolean indicating whether the cancellation was successful
     """
-    global bookings
-    for i, booking in enumerate(bookings):
-        if booking['id'] == booking_id:
-            del bookings[i]
-            return True  # Cancelled successfully
-    return False  # No booking with the given id was found
+    return bookings.remove(booking_id) is not None
 
 
+@tool
 def get_user_bookings(user_id):
     """
     This function returns all bookings for a specific user.
@@ -157,5 +165,4 @@ def get_user_bookings(user_id):
     :param user_id: The id of the user to return bookings for. E.g. "USER123"
     :return: Returns a list of bookings for the given user
     """
-    global bookings
-    return [booking for booking in bookings if booking['user_id'] == user_id]
+    return bookings.find('user_id', user_id)
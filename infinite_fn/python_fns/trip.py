@@ -2,10 +2,16 @@
 This file contains functions related to trip organization which include finding the distance between two locations, finding the types of transportation between two locations, and finding the cost of transportation between two locations.
 It also includes booking  of a trip.
 """
-import random
 import uuid
 
+from infinite_fn.local_apis.booking_store import create_booking_store
+from infinite_fn.local_apis.route_service import RouteService
+from infinite_fn.tool_registry import tool
 
+routes = RouteService()
+
+
+@tool(pure=True)
 def distance_between_two_locations(location1: str, location2: str) -> int:
     """
     Find the distance between two locations.
@@ -14,9 +20,10 @@ def distance_between_two_locations(location1: str, location2: str) -> int:
     :param location2: The second location
     :return: The distance between the two locations in kilometers
     """
-    return random.randint(1, 1000)
+    return routes.route(location1, location2).distance
 
 
+@tool(pure=True)
 def types_of_transportation_between_two_locations(location1: str, location2: str):
     """
     Provides transportation options between two locations.
@@ -25,10 +32,10 @@ def types_of_transportation_between_two_locations(location1: str, location2: str
     :param location2: The second location
     :return: A list of transportation types which can be used to travel between the two locations. Possible values are "car", "bus", "train", and "plane".
     """
-    transportation_types = ["car", "bus", "train", "plane"]
-    return [transportation_types[x - 1] for x in range(random.randint(1, len(transportation_types)))]
+    return list(routes.route(location1, location2).modes)
 
 
+@tool(pure=True)
 def cost_of_transportation_between_two_locations(location1: str, location2: str, transportation_type: str,
                                                  currency: str = "$") -> int:
     """
@@ -40,12 +47,57 @@ def cost_of_transportation_between_two_locations(location1: str, location2: str,
     :param currency: The currency to use for the cost
     :return: The cost of transportation between the two locations in currency
     """
-    return f"{random.randint(1, 1000)} {currency}"
+    _route = routes.route(location1, location2)
+    _mode = transportation_type.lower()
+    if _mode not in _route.costs:
+        return f"Unknown transportation type {transportation_type}"
+    if _mode not in _route.modes:
+        return f"{transportation_type} is not available between {location1} and {location2}. " \
+               f"Available transportation types: {', '.join(_route.modes)}"
+    return f"{_route.costs[_mode]} {currency}"
+
+
+@tool(pure=True)
+def routes_between_locations(locations: list[str], transportation_type: str = None) -> dict[str, any]:
+    """
+    Find the distances, transportation types and costs between every pair of several locations at once.
+    Use this instead of asking for each pair of locations separately.
+
+    :param locations: The locations, e.g. ["London", "Paris", "Rome"]
+    :param transportation_type: The type of transportation to price. If not specified, the cheapest available type is used.
+    :return: A dictionary with the locations and, for each pair of locations (same order as the locations), the distance in kilometers, the transportation type and its cost in dollars (None where the transportation type is not available)
+    """
+    _matrix = routes.matrix(locations, transportation_type.lower() if transportation_type else None)
+    return {"locations": locations,
+            "distances": _matrix.distances.tolist(),
+            "transportation_types": _matrix.modes,
+            "costs": [[None if c != c else int(c) for c in row] for row in _matrix.costs.tolist()]}
+
+
+@tool(pure=True)
+def cheapest_itinerary(locations: list[str], transportation_type: str = None, return_to_start: bool = False) -> dict[str, any]:
+    """
+    Find the cheapest order in which to visit several locations, starting at the first location.
+
+    :param locations: The locations to visit, starting with the starting point, e.g. ["London", "Paris", "Rome"]
+    :param transportation_type: The type of transportation to use. If not specified, the cheapest available type is used for each leg.
+    :param return_to_start: Whether the trip ends back at the starting point
+    :return: A dictionary with the ordered legs of the trip (from, to, transportation type, distance in kilometers and cost in dollars) and the total cost, or an error if no such itinerary exists
+    """
+    _matrix = routes.matrix(locations, transportation_type.lower() if transportation_type else None)
+    _order, _total = _matrix.cheapest_route(return_to_start)
+    if _total == float("inf"):
+        return {"error": f"No itinerary by {transportation_type} connects all locations"}
+    return {"legs": [{"from": locations[i], "to": locations[j], "transportation_type": _matrix.modes[i][j],
+                      "distance": int(_matrix.distances[i, j]), "cost": int(_matrix.costs[i, j])}
+                     for i, j in zip(_order, _order[1:])],
+            "total_cost": int(_total)}
 
 
-trip_bookings = {}
+trip_bookings = create_booking_store("trips")
 
 
+@tool(side_effect=True)
 def book_trip(location1: str, location2: str, transportation_type: str, cost: int, date: str) -> str:
     """
     Book a trip between two locations.
@@ -59,10 +111,12 @@ def book_trip(location1: str, location2: str, transportation_type: str, cost: in
     """
     booking_id = str(uuid.uuid4())
 
-    trip_bookings[booking_id] = (location1, location2, transportation_type, cost, date)
+    trip_bookings.add({"location1": location1, "location2": location2, "transportation_type": transportation_type,
+                       "cost": cost, "date": date}, booking_id)
     return f"Booking ID: {booking_id}\nLocation 1: {location1}\nLocation 2: {location2}\nTransportation Type: {transportation_type}\nCost: {cost}"
 
 
+@tool(side_effect=True)
 def cancel_trip(booking_id: str) -> str:
     """
     Cancel a trip by booking ID.
@@ -70,8 +124,7 @@ def cancel_trip(booking_id: str) -> str:
     :param booking_id: The booking ID
     :return: A string containing the cancellation information
     """
-    if booking_id in trip_bookings:
-        del trip_bookings[booking_id]
+    if trip_bookings.remove(booking_id) is not None:
         return f"Booking ID: {booking_id} cancelled."
     else:
         return f"Booking ID: {booking_id} not found."
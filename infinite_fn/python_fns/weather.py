@@ -1,35 +1,31 @@
-import random
+from infinite_fn.local_apis.weather_cache import WEATHER_CACHE_TTL, WeatherCache, date_range
+from infinite_fn.local_apis.weather_provider import get_weather_provider
+from infinite_fn.tool_registry import tool
 
+weather_provider = get_weather_provider()
 
+
+@tool(ttl=WEATHER_CACHE_TTL)
 def fetch_weather_data(location: str, date: str = None) -> dict:
     """
     Fetch weather data for the specified location and date.
 
-    This function currently returns random dummy data. In a real-world implementation,
-    it would make a request to a weather data API and return the result.
+    The data comes from the weather provider selected with INFINITE_FN_WEATHER_PROVIDER, which returns dummy data
+    by default.
 
     :param location: The location to fetch weather data for.
     :param date: The date to fetch weather data for. If not specified, fetches current
                  weather data. Dates should be specified in YYYY-MM-DD format.
     :return: A dictionary containing weather data.
     """
+    return weather_provider.fetch(location, date)
 
-    # Dummy weather data
-    weather_data = {
-        'location': location,
-        'date': date if date else 'current',
-        'temperature': random.randint(-30, 50),  # Temperature in degrees Celsius
-        'humidity': random.randint(0, 100),  # Humidity in percentage
-        'rainfall': random.randint(0, 50) if random.random() < 0.3 else 0,  # 30% chance of rain
-        'wind_speed': random.randint(0, 20),  # Wind speed in km/h
-        'wind_direction': random.choice(['N', 'S', 'E', 'W']),  # Wind direction
-        'pressure': random.randint(950, 1050),  # Atmospheric pressure in hPa
-        'UV_index': random.randint(0, 11)  # UV index
-    }
 
-    return weather_data
+# Weather records are cached per (location, date) so that repeated questions do not fetch them again
+weather_cache = WeatherCache(fetch_weather_data, fetch_many=weather_provider.fetch_many)
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def current_weather(location: str) -> dict:
     """
     Fetch current weather data for the specified location.
@@ -37,9 +33,10 @@ def current_weather(location: str) -> dict:
     :param location: The location to fetch current weather data for.
     :return: A dictionary containing current weather data.
     """
-    return fetch_weather_data(location)
+    return weather_cache.get(location)
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def forecast_weather(location: str, days: int) -> list:
     """
     Fetch weather forecast data for the specified location for a number of days.
@@ -48,10 +45,10 @@ def forecast_weather(location: str, days: int) -> list:
     :param days: The number of days to fetch the forecast for.
     :return: A list of dictionaries each containing weather data for a day.
     """
-    forecast = [fetch_weather_data(location) for _ in range(days)]
-    return forecast
+    return weather_cache.get_many([location], date_range(days)).records()
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def historical_weather(location: str, date: str) -> dict:
     """
     Fetch historical weather data for the specified location and date.
@@ -60,9 +57,10 @@ def historical_weather(location: str, date: str) -> dict:
     :param date: The date to fetch historical weather data for. Dates should be specified in YYYY-MM-DD format.
     :return: A dictionary containing historical weather data.
     """
-    return fetch_weather_data(location, date)
+    return weather_cache.get(location, date)
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def average_temperature(location: str, days: int = 30) -> float:
     """
     Calculate the average temperature for the specified location over a number of past days.
@@ -72,15 +70,13 @@ def average_temperature(location: str, days: int = 30) -> float:
     :return: The average temperature over the specified number of days.
     """
     # Fetch historical weather data for the specified number of days
-    historical_data = forecast_weather(location, days)
+    historical_data = weather_cache.get_many([location], date_range(days, step=-1))
 
     # Calculate the average temperature
-    total_temperature = sum(day['temperature'] for day in historical_data)
-    average_temp = total_temperature / days
-
-    return average_temp
+    return float(historical_data['temperature'].mean())
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def max_min_temperature(location: str, days: int = 30) -> tuple:
     """
     Calculate the maximum and minimum temperature for the specified location over a number of past days.
@@ -90,15 +86,14 @@ def max_min_temperature(location: str, days: int = 30) -> tuple:
     :return: A tuple where the first element is the maximum temperature and the second element is the minimum temperature over the specified number of days.
     """
     # Fetch historical weather data for the specified number of days
-    historical_data = forecast_weather(location, days)
+    historical_data = weather_cache.get_many([location], date_range(days, step=-1))
 
     # Calculate the maximum and minimum temperature
-    max_temperature = max(day['temperature'] for day in historical_data)
-    min_temperature = min(day['temperature'] for day in historical_data)
-
-    return (max_temperature, min_temperature)
+    temperatures = historical_data['temperature']
+    return (int(temperatures.max()), int(temperatures.min()))
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def rain_chance(location: str, hours: int = 24) -> float:
     """
     Calculate the chance of rain for the specified location over the next number of hours.
@@ -110,14 +105,16 @@ def rain_chance(location: str, hours: int = 24) -> float:
     # Fetch forecast data for the specified number of hours
     # For simplicity, we're using daily forecast data here, so we divide hours by 24
     days = hours // 24
-    forecast_data = [fetch_weather_data(location) for _ in range(days)]
+    if days == 0:
+        return 0
+    forecast_data = weather_cache.get_many([location], date_range(days))
 
     # Calculate the chance of rain
     # For simplicity, we're assuming that if rainfall is > 0, it's raining
-    rainy_days = sum(1 for day in forecast_data if day['rainfall'] > 0)
-    return (rainy_days / days) * 100 if days > 0 else 0
+    return float((forecast_data['rainfall'] > 0).mean() * 100)
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def uv_index(location: str) -> int:
     """
     Fetch the UV index for the specified location.
@@ -128,10 +125,11 @@ def uv_index(location: str) -> int:
     # For this demonstration, we are using the 'fetch_weather_data' function to get dummy data
     # In a real-world application, we would fetch the UV index data from an appropriate source
 
-    weather_data = fetch_weather_data(location)
+    weather_data = weather_cache.get(location)
     return weather_data['UV_index']
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def humidity(location: str) -> int:
     """
     Fetch the current humidity for the specified location.
@@ -140,10 +138,11 @@ def humidity(location: str) -> int:
     :return: The current humidity for the specified location.
     """
     # Fetch weather data for the specified location
-    weather_data = fetch_weather_data(location)
+    weather_data = weather_cache.get(location)
     return weather_data['humidity']
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def wind_speed(location: str) -> float:
     """
     Fetch the current wind speed for the specified location.
@@ -152,10 +151,11 @@ def wind_speed(location: str) -> float:
     :return: The current wind speed for the specified location.
     """
     # Fetch weather data for the specified location
-    weather_data = fetch_weather_data(location)
+    weather_data = weather_cache.get(location)
     return weather_data['wind_speed']
 
 
+@tool(ttl=WEATHER_CACHE_TTL)
 def feels_like_temperature(location: str) -> float:
     """
     Calculate the "feels like" temperature for the specified location.
@@ -164,7 +164,7 @@ def feels_like_temperature(location: str) -> float:
     :return: The "feels like" temperature for the specified location.
     """
     # Fetch weather data for the specified location
-    weather_data = fetch_weather_data(location)
+    weather_data = weather_cache.get(location)
 
     # Simple formula to calculate "feels like" temperature
     # This is a dummy formula and does not reflect actual methods of calculating "feels like" temperature
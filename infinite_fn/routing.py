@@ -0,0 +1,181 @@
+"""
+Query to function routing strategies.
+
+- reflect: the LLM reflects on the user message and the reflection is used to search the function index
+- direct: the raw user message is used to search the function index, no LLM call is made
+- parallel: reflection and raw message lookup run concurrently and the results are merged
+- fallback: the raw user message is used unless the best match is further than a distance threshold in which case
+  the reflection is used
+"""
+import asyncio
+import os
+import statistics
+import time
+from collections import namedtuple
+from typing import TYPE_CHECKING
+
+from infinite_fn.telemetry import telemetry
+
+if TYPE_CHECKING:
+    from func_ai.function_indexer import FunctionIndexer, SearchResult
+
+    from infinite_fn.llm import AsyncOpenAIInterface
+
+ROUTING_MODES = ("reflect", "direct", "parallel", "fallback")
+ROUTING_MODE = os.getenv("INFINITE_FN_ROUTING_MODE", "reflect")
+FALLBACK_DISTANCE = float(os.getenv("INFINITE_FN_ROUTING_FALLBACK_DISTANCE", "0.25"))
+
+RouteResult = namedtuple('RouteResult', ['mode', 'reflection', 'candidates', 'latency'])
+
+# Labelled queries used to compare the retrieval accuracy of the routing modes
+EVALUATION_CASES = [
+    ("What's the weather like in London right now?", "current_weather"),
+    ("Will it rain in Paris tomorrow?", "rain_chance"),
+    ("How strong is the sun in Madrid today?", "uv_index"),
+    ("What will the weather be in Berlin over the next 5 days?", "forecast_weather"),
+    ("What does it feel like outside in Oslo?", "feels_like_temperature"),
+    ("How far is Sofia from Plovdiv?", "distance_between_two_locations"),
+    ("How can I get from Rome to Naples?", "types_of_transportation_between_two_locations"),
+    ("How much is a train ticket from Rome to Milan?", "cost_of_transportation_between_two_locations"),
+    ("Book me a plane from Sofia to London on 2023-09-01 10:00:00", "book_trip"),
+    ("What should I visit in Barcelona?", "get_attractions_for_location"),
+    ("Show me hotels in Vienna", "get_all_lodgings"),
+    ("Cancel my lodging booking BOOKING3", "cancel_booking"),
+]
+
+
+async def afind_functions(function_indexer: "FunctionIndexer", query: str, max_results: int = 2,
+                          query_embedding: list[float] = None) -> list["SearchResult"]:
+    """
+    Searches the function index without blocking the event loop
+
+    :param function_indexer: The function indexer to search
+    :param query: Query string
+    :param max_results: Maximum number of results
+    :param query_embedding: The embedding of the query if it is already known, so it is not embedded again. Only
+                            supported by `HybridFunctionSearch`.
+    :return: List of search results
+    """
+    if query_embedding is not None:
+        return await asyncio.to_thread(function_indexer.find_functions, query=query, max_results=max_results,
+                                       query_embedding=query_embedding)
+    return await asyncio.to_thread(function_indexer.find_functions, query=query, max_results=max_results)
+
+
+def merge_results(*results: list["SearchResult"], max_results: int = 3) -> list["SearchResult"]:
+    """
+    Merges several result lists keeping the best distance of every function
+
+    :param results: The result lists to merge
+    :param max_results: Maximum number of results
+    :return: The merged results ordered by distance
+    """
+    _best = {}
+    for r in (r for _results in results for r in _results):
+        if r.name not in _best or r.distance < _best[r.name].distance:
+            _best[r.name] = r
+    return sorted(_best.values(), key=lambda x: x.distance)[:max_results]
+
+
+async def _reflect(llm_interface: "AsyncOpenAIInterface", user_message: str) -> str:
+    with telemetry.span("reflection", llm_interface=llm_interface):
+        return (await llm_interface.asend(user_message))['content']
+
+
+async def _find(function_indexer: "FunctionIndexer", query: str, max_results: int,
+                query_embedding: list[float] = None) -> list["SearchResult"]:
+    with telemetry.span("find_functions") as _span:
+        _results = await afind_functions(function_indexer, query=query, max_results=max_results,
+                                         query_embedding=query_embedding)
+        _span.set(results=len(_results))
+        return _results
+
+
+async def route(llm_interface: "AsyncOpenAIInterface", function_indexer: "FunctionIndexer", user_message: str,
+                mode: str = ROUTING_MODE, max_results: int = 3,
+                fallback_distance: float = FALLBACK_DISTANCE, query_embedding: list[float] = None,
+                candidates: list["SearchResult"] = None, reflection: str = None) -> RouteResult:
+    """
+    Finds the candidate functions for a user message and adds the user message (and reflection if one was made) to
+    the conversation.
+
+    :param llm_interface: The LLM interface of the conversation
+    :param function_indexer: The function indexer (or `HybridFunctionSearch`) to search
+    :param user_message: The user message
+    :param mode: The routing mode, one of ROUTING_MODES
+    :param max_results: Maximum number of candidate functions
+    :param fallback_distance: The distance above which the fallback mode reflects on the user message
+    :param query_embedding: The embedding of the user message if it is already known, used for the searches of the
+                            raw user message
+    :param candidates: Previously found candidates for the user message (e.g. from the semantic cache). The function
+                       index is not searched.
+    :param reflection: The reflection that was made with the previously found candidates, if any. It is added to the
+                       conversation instead of asking the LLM again, which is only valid if the conversation before
+                       the user message is the same (e.g. only the system prompt).
+    :return: The routing result
+    """
+    if mode not in ROUTING_MODES:
+        raise ValueError(f"Unknown routing mode: {mode}. Expected one of {ROUTING_MODES}")
+    _started = time.perf_counter()
+    _reflection = None
+    if candidates is not None:
+        _candidates = candidates[:max_results]
+        if reflection is not None:
+            _reflection = reflection
+            llm_interface.add_conversation_message({"role": "user", "content": user_message})
+            llm_interface.add_conversation_message({"role": "assistant", "content": reflection})
+        elif mode == "direct" or (mode == "fallback" and len(_candidates) > 0 and
+                                _candidates[0].distance <= fallback_distance):
+            llm_interface.add_conversation_message({"role": "user", "content": user_message})
+        else:
+            _reflection = await _reflect(llm_interface, user_message)
+    elif mode == "reflect":
+        _reflection = await _reflect(llm_interface, user_message)
+        _candidates = await _find(function_indexer, _reflection, max_results)
+    elif mode == "parallel":
+        _reflection, _direct = await asyncio.gather(_reflect(llm_interface, user_message),
+                                                    _find(function_indexer, user_message, max_results,
+                                                          query_embedding))
+        _reflected = await _find(function_indexer, _reflection, max_results)
+        _candidates = merge_results(_direct, _reflected, max_results=max_results)
+    else:
+        _candidates = await _find(function_indexer, user_message, max_results, query_embedding)
+        if mode == "fallback" and (len(_candidates) == 0 or _candidates[0].distance > fallback_distance):
+            _reflection = await _reflect(llm_interface, user_message)
+            _reflected = await _find(function_indexer, _reflection, max_results)
+            _candidates = merge_results(_candidates, _reflected, max_results=max_results)
+        else:
+            llm_interface.add_conversation_message({"role": "user", "content": user_message})
+    return RouteResult(mode=mode, reflection=_reflection, candidates=_candidates,
+                       latency=time.perf_counter() - _started)
+
+
+async def evaluate_routing(function_indexer: "FunctionIndexer", llm_factory: callable,
+                           cases: list[tuple[str, str]] = None,
+                           modes: tuple[str] = ROUTING_MODES) -> dict[str, dict[str, float]]:
+    """
+    Measures the latency and the first-result accuracy of routing modes over a set of labelled queries
+
+    :param function_indexer: The function indexer to search
+    :param llm_factory: A callable returning a new LLM interface with the system prompt
+    :param cases: List of (user message, expected function name) tuples. Defaults to EVALUATION_CASES.
+    :param modes: The routing modes to evaluate
+    :return: Dictionary of mode to accuracy, mean and p50/p99 latency in seconds
+    """
+    cases = cases if cases is not None else EVALUATION_CASES
+    _report = {}
+    for mode in modes:
+        _latencies = []
+        _correct = 0
+        for user_message, expected in cases:
+            _result = await route(llm_factory(), function_indexer, user_message, mode=mode)
+            _latencies.append(_result.latency)
+            _correct += int(len(_result.candidates) > 0 and _result.candidates[0].name == expected)
+        _latencies.sort()
+        _report[mode] = {
+            "accuracy": _correct / len(cases),
+            "mean_latency": statistics.fmean(_latencies),
+            "p50_latency": _latencies[len(_latencies) // 2],
+            "p99_latency": _latencies[min(len(_latencies) - 1, int(len(_latencies) * 0.99))],
+        }
+    return _report
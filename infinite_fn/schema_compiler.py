@@ -0,0 +1,393 @@
+"""
+Compact function schemas for the function calling API.
+
+The schemas generated from the reST docstrings of `python_fns` repeat the full docstring, including the `:return:`
+prose, in every function-calling request. The compiler keeps only what the model needs to call the function: a
+description trimmed to a token budget, typed parameters with short descriptions, the required parameters and enum
+values inferred from the docstrings (e.g. `Possible values are "car", "bus", ...`) or `Literal` annotations.
+Schemas are compiled when the functions are indexed and cached by the content hash of the function.
+
+`python -m infinite_fn.schema_compiler` prints the token count of each indexed function's schema, compared with the
+schema generated by func_ai.
+"""
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import types
+import typing
+
+from infinite_fn.index_manifest import function_content_hash
+from infinite_fn.lexical import tokenize
+from infinite_fn.tool_registry import module_tools
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+SCHEMA_DESCRIPTION_TOKENS = int(os.getenv("INFINITE_FN_SCHEMA_DESCRIPTION_TOKENS", "40"))
+SCHEMA_PARAMETER_TOKENS = int(os.getenv("INFINITE_FN_SCHEMA_PARAMETER_TOKENS", "30"))
+
+_FIELD = re.compile(r"^:(param|return|returns|raises|type|rtype)\b\s*(\w*)\s*:?\s*(.*)$")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\"'])")
+_ENUM = re.compile(r"(?:possible values are|one of|either|can be)\s*:?\s*"
+                   r"((?:[\"'][^\"']+[\"']\s*(?:,\s*(?:and\s+|or\s+)?|\s+(?:and|or)\s+)?){2,})", re.IGNORECASE)
+_QUOTED = re.compile(r"[\"']([^\"']+)[\"']")
+# sentences with examples or formats are the most useful to the model and are kept first
+_HINT = re.compile(r"e\.g\.|for example|format|[\"'\[]", re.IGNORECASE)
+_EXAMPLE = re.compile(r"(?:e\.g\.|for example)\s*:?\s*(\S+)", re.IGNORECASE)
+_ORDINALS = {"1": "first", "2": "second", "3": "third"}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with tiktoken if it is installed, otherwise approximates them by words and punctuation
+
+    :param text: The text
+    :return: The number of tokens
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def count_schema_tokens(schema: dict[str, any]) -> int:
+    """
+    Counts the tokens of a function schema as it is sent to the API
+
+    :param schema: The function schema
+    :return: The number of tokens
+    """
+    return count_tokens(json.dumps(schema, separators=(",", ":")))
+
+
+def parse_docstring(docstring: str) -> tuple[str, dict[str, str], str]:
+    """
+    Splits a reST docstring into its description, parameter descriptions and return description.
+    Field descriptions may continue on the following lines.
+
+    :param docstring: The docstring
+    :return: The description, dictionary of parameter name to description and the return description
+    """
+    _description, _params, _returns = [], {}, []
+    _current = _description
+    for line in (docstring or "").splitlines():
+        _line = line.strip()
+        _field = _FIELD.match(_line)
+        if _field is not None:
+            _kind, _name, _text = _field.groups()
+            if _kind == "param" and _name:
+                _current = _params.setdefault(_name, [])
+            elif _kind in ("return", "returns"):
+                _current = _returns
+            else:
+                _current = []
+            _current.append(_text)
+        elif _line:
+            _current.append(_line)
+    return (" ".join(_description), {k: " ".join(v).strip() for k, v in _params.items()},
+            " ".join(_returns).strip())
+
+
+def _sentences(text: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE.split(" ".join(text.split())) if s.strip()]
+
+
+def infer_enum(text: str) -> tuple[list[str] | None, str]:
+    """
+    Finds enumerated values in a description (e.g. `either "price" or "rating"`)
+
+    :param text: The description
+    :return: The values (None if there are none) and the description without the sentence listing them
+    """
+    _kept, _values = [], None
+    for sentence in _sentences(text):
+        _match = _ENUM.search(sentence)
+        if _match is None or _values is not None:
+            _kept.append(sentence)
+            continue
+        _values = _QUOTED.findall(_match.group(1))
+        _rest = sentence[:_match.start()].rstrip(" ,;:")
+        if _rest:
+            _kept.append(_rest + ".")
+    return _values, " ".join(_kept)
+
+
+def _singular(term: str) -> str:
+    return term[:-1] if term.endswith("s") and not term.endswith("ss") else term
+
+
+def module_enums(functions: list[callable]) -> dict[str, list[str]]:
+    """
+    Infers enum values for parameters from the docstrings of related functions. A sentence listing values applies to
+    the parameters with multi-word names whose words all appear in that sentence or the one before it, e.g. the
+    transportation types returned by one function become the enum of `transportation_type` in the others.
+
+    :param functions: The functions of a module
+    :return: Dictionary of parameter name to values
+    """
+    _names = {name for f in functions for name in inspect.signature(_unwrap(f)[0]).parameters if "_" in name}
+    _enums = {}
+    for func in functions:
+        _description, _params, _returns = parse_docstring(inspect.getdoc(_unwrap(func)[0]) or "")
+        for part in [_description, _returns, *_params.values()]:
+            _part_sentences = _sentences(part)
+            for idx, sentence in enumerate(_part_sentences):
+                _match = _ENUM.search(sentence)
+                if _match is None:
+                    continue
+                _terms = {_singular(t) for t in tokenize(" ".join(_part_sentences[max(0, idx - 1):idx + 1]))}
+                for name in _names:
+                    if all(_singular(p) in _terms for p in name.split("_") if p):
+                        _enums.setdefault(name, _QUOTED.findall(_match.group(1)))
+    return _enums
+
+
+def trim(text: str, max_tokens: int) -> str:
+    """
+    Trims a description to whole sentences within a token budget. Sentences with examples or formats are kept before
+    the others, the kept sentences stay in their original order. A first sentence longer than the budget is cut at a
+    word boundary.
+
+    :param text: The description
+    :param max_tokens: The token budget
+    :return: The trimmed description
+    """
+    _all = _sentences(text)
+    _order = sorted(range(len(_all)), key=lambda i: (i > 0 and _HINT.search(_all[i]) is None, i))
+    _kept, _used = set(), 0
+    for i in _order:
+        _tokens = count_tokens(_all[i])
+        if _used + _tokens <= max_tokens:
+            _kept.add(i)
+            _used += _tokens
+    if len(_kept) == 0 and len(_all) > 0:
+        _words = _all[0].split()
+        while len(_words) > 1 and count_tokens(" ".join(_words)) > max_tokens:
+            _words.pop()
+        return " ".join(_words)
+    return " ".join(_all[i] for i in sorted(_kept))
+
+
+def _redundant(text: str, name: str) -> bool:
+    # a description that only restates the parameter name (e.g. "The first location" for location1)
+    _name_terms = set()
+    for word, number in re.findall(r"([a-z]+)(\d*)", name.lower()):
+        _name_terms.update({_singular(word), _ORDINALS.get(number, number)})
+    _terms = {_singular(t) for t in tokenize(text)}
+    return len(_terms) > 0 and _terms <= _name_terms
+
+
+def _example_type(text: str) -> dict[str, any] | None:
+    _match = _EXAMPLE.search(text)
+    if _match is None:
+        return None
+    _example = _match.group(1).rstrip(".,;")
+    if _example.startswith("["):
+        return {"type": "array", "items": {"type": "string"}}
+    if re.fullmatch(r"-?\d+", _example):
+        return {"type": "integer"}
+    if re.fullmatch(r"-?\d*\.\d+", _example):
+        return {"type": "number"}
+    if _example in ("True", "False"):
+        return {"type": "boolean"}
+    return None
+
+
+def _dedupe(text: str, seen: set[str]) -> str:
+    _kept = []
+    for sentence in _sentences(text):
+        _key = " ".join(tokenize(sentence))
+        if _key and _key in seen:
+            continue
+        seen.add(_key)
+        _kept.append(sentence)
+    return " ".join(_kept)
+
+
+def _unwrap(func: callable) -> tuple[callable, set[str]]:
+    if isinstance(func, functools.partial):
+        _fixed = set(func.keywords or {}) | set(list(inspect.signature(func.func).parameters)[:len(func.args)])
+        return func.func, _fixed
+    return func, set()
+
+
+def json_type(annotation: any) -> dict[str, any]:
+    """
+    Returns the JSON schema of a type annotation
+
+    :param annotation: The annotation (e.g. list[str])
+    :return: The JSON schema
+    """
+    _origin = typing.get_origin(annotation)
+    _args = typing.get_args(annotation)
+    if _origin is typing.Literal:
+        return {**json_type(type(_args[0])), "enum": list(_args)}
+    if _origin in (typing.Union, types.UnionType):
+        _types = [a for a in _args if a is not type(None)]
+        return json_type(_types[0]) if len(_types) > 0 else {"type": "string"}
+    if annotation in (list, tuple, set) or _origin in (list, tuple, set):
+        return {"type": "array", "items": json_type(_args[0])} if _args else {"type": "array"}
+    if annotation is dict or _origin is dict:
+        return {"type": "object"}
+    if annotation is bool:
+        return {"type": "boolean"}
+    if annotation is int:
+        return {"type": "integer"}
+    if annotation is float:
+        return {"type": "number"}
+    return {"type": "string"}
+
+
+def compile_schema(func: callable, description_tokens: int = SCHEMA_DESCRIPTION_TOKENS,
+                   parameter_tokens: int = SCHEMA_PARAMETER_TOKENS,
+                   enums: dict[str, list[str]] = None) -> dict[str, any]:
+    """
+    Compiles the compact schema of a function
+
+    :param func: The function (or a functools.partial of it, whose fixed arguments are left out)
+    :param description_tokens: The token budget of the function description
+    :param parameter_tokens: The token budget of each parameter description
+    :param enums: Enum values of parameters that are not listed in their own description (see `module_enums`)
+    :return: The function schema
+    """
+    _target, _fixed = _unwrap(func)
+    _description, _param_docs, _ = parse_docstring(inspect.getdoc(_target) or "")
+    try:
+        _hints = typing.get_type_hints(_target)
+    except Exception:
+        _hints = getattr(_target, "__annotations__", {})
+    _description = trim(_description, description_tokens)
+    _seen = {" ".join(tokenize(s)) for s in _sentences(_description)}
+    _properties, _required = {}, []
+    for name, param in inspect.signature(_target).parameters.items():
+        if name in _fixed or name in ("self", "cls") or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        _enum, _doc = infer_enum(_param_docs.get(name, ""))
+        if name in _hints:
+            _property = json_type(_hints[name])
+        elif param.default not in (param.empty, None):
+            _property = json_type(type(param.default))
+        else:
+            _property = _example_type(_doc) or {"type": "string"}
+        _enum = _property.pop("enum", None) or _enum or (enums or {}).get(name)
+        _doc = trim(_dedupe(_doc, set(_seen)), parameter_tokens)
+        if _doc and not _redundant(_doc, name):
+            _property["description"] = _doc
+        if _enum:
+            _property["enum"] = _enum
+        _properties[name] = _property
+        if param.default is param.empty:
+            _required.append(name)
+    _parameters = {"type": "object", "properties": _properties}
+    if len(_required) > 0:
+        _parameters["required"] = _required
+    return {"name": _target.__name__, "description": _description, "parameters": _parameters}
+
+
+class SchemaCompiler(object):
+    """
+    Compiles compact schemas and caches them by function content hash, so a schema is recompiled only when its
+    function changes
+    """
+
+    def __init__(self, description_tokens: int = SCHEMA_DESCRIPTION_TOKENS,
+                 parameter_tokens: int = SCHEMA_PARAMETER_TOKENS) -> None:
+        """
+        :param description_tokens: The token budget of function descriptions
+        :param parameter_tokens: The token budget of parameter descriptions
+        """
+        self.description_tokens = description_tokens
+        self.parameter_tokens = parameter_tokens
+        self._schemas: dict[str, dict[str, any]] = {}
+        self._lock = threading.Lock()
+
+    def compile_functions(self, functions: list[callable]) -> None:
+        """
+        Compiles the schemas of functions, inferring enums across the functions of each module
+
+        :param functions: The functions
+        :return:
+        """
+        _by_module = {}
+        for func in functions:
+            _by_module.setdefault(_unwrap(func)[0].__module__, []).append(func)
+        for _functions in _by_module.values():
+            _enums = module_enums(_functions)
+            _compiled = {function_content_hash(_unwrap(f)[0]): compile_schema(f, self.description_tokens,
+                                                                              self.parameter_tokens, _enums)
+                         for f in _functions}
+            with self._lock:
+                self._schemas.update(_compiled)
+
+    def schema(self, func: callable) -> dict[str, any]:
+        """
+        Returns the compact schema of a function, compiling the schemas of the tools of its module on a cache miss
+
+        :param func: The function
+        :return: The function schema
+        """
+        _target = _unwrap(func)[0]
+        _key = function_content_hash(_target)
+        with self._lock:
+            _schema = self._schemas.get(_key)
+        if _schema is None:
+            _siblings = module_tools(_target.__module__)
+            self.compile_functions(list({id(f): f for f in _siblings + [func]}.values()))
+            with self._lock:
+                _schema = self._schemas[_key]
+        return _schema
+
+
+schema_compiler = SchemaCompiler()
+
+
+def compact_schema(wrapper: any) -> dict[str, any]:
+    """
+    Returns the compact schema of a function wrapper, to be passed in place of `wrapper.schema`
+
+    :param wrapper: The `OpenAIFunctionWrapper`
+    :return: The function schema
+    """
+    return schema_compiler.schema(wrapper.func)
+
+
+def schema_report(functions: list[callable], original_schema: callable,
+                  compiler: SchemaCompiler = schema_compiler) -> list[dict[str, any]]:
+    """
+    Compares the token count of the compact schema of each function with another schema generator
+
+    :param functions: The functions
+    :param original_schema: A callable returning the schema to compare with (e.g. func_ai's `func_to_json`)
+    :param compiler: The schema compiler
+    :return: List of dictionaries with the function name, original tokens, compact tokens and the saving in percent
+    """
+    compiler.compile_functions(functions)
+    _rows = []
+    for func in functions:
+        _original = count_schema_tokens(original_schema(func))
+        _compact = count_schema_tokens(compiler.schema(func))
+        _rows.append({"name": _unwrap(func)[0].__name__, "original_tokens": _original, "compact_tokens": _compact,
+                      "saved_percent": 100.0 * (_original - _compact) / _original if _original else 0.0})
+    return _rows
+
+
+if __name__ == '__main__':
+    from func_ai.utils.py_function_parser import func_to_json
+
+    from infinite_fn.indexing import module_functions
+    from infinite_fn.startup import INDEXED_MODULES
+
+    _report = schema_report([f for m in INDEXED_MODULES for f in module_functions(m)], func_to_json)
+    print(f"{'function':<48} {'func_ai':>8} {'compact':>8} {'saved':>7}")
+    for row in _report:
+        print(f"{row['name']:<48} {row['original_tokens']:>8} {row['compact_tokens']:>8} {row['saved_percent']:>6.1f}%")
+    _original, _compact = sum(r["original_tokens"] for r in _report), sum(r["compact_tokens"] for r in _report)
+    print(f"{'total':<48} {_original:>8} {_compact:>8} {100.0 * (_original - _compact) / _original:>6.1f}%")
+    if _encoding is None:
+        print("(approximate token counts, install tiktoken for exact counts)")
@@ -0,0 +1,94 @@
+"""
+Hybrid lexical and semantic function search
+"""
+import os
+
+from func_ai.function_indexer import FunctionIndexer, SearchResult
+
+from infinite_fn.lexical import BM25Index, function_document
+
+HYBRID_ALPHA = float(os.getenv("INFINITE_FN_HYBRID_ALPHA", "0.6"))
+HYBRID_CANDIDATES = int(os.getenv("INFINITE_FN_HYBRID_CANDIDATES", "20"))
+# the BM25 score at which the lexical score is 0.5
+HYBRID_BM25_HALF_SCORE = float(os.getenv("INFINITE_FN_HYBRID_BM25_HALF_SCORE", "3.0"))
+
+
+class HybridFunctionSearch(object):
+    """
+    Fuses the vector search of a `FunctionIndexer` with a BM25 index over the names, docstrings and parameter names of
+    the indexed functions. It exposes the same `find_functions` method as `FunctionIndexer` so it can be used in its
+    place for searching.
+    """
+
+    def __init__(self, function_indexer: FunctionIndexer, alpha: float = HYBRID_ALPHA,
+                 candidates: int = HYBRID_CANDIDATES, bm25_half_score: float = HYBRID_BM25_HALF_SCORE) -> None:
+        """
+        Initializes the search and builds the lexical index
+
+        :param function_indexer: The function indexer
+        :param alpha: The weight of the vector similarity, the lexical score is weighted with 1 - alpha
+        :param candidates: The number of candidates taken from each of the vector and lexical searches
+        :param bm25_half_score: The BM25 score that is mapped to a lexical score of 0.5, see `lexical_score`
+        """
+        self.function_indexer = function_indexer
+        self.alpha = alpha
+        self.candidates = candidates
+        self.bm25_half_score = bm25_half_score
+        self._lexical = BM25Index({})
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Rebuilds the lexical index from the functions currently in the function index. Call after indexing.
+
+        :return:
+        """
+        self._lexical = BM25Index({h: function_document(w.func, name=w.name,
+                                                        parameters=list(w.parameters.get("properties", {}).keys()))
+                                   for h, w in self.function_indexer._functions.items()})
+
+    def lexical_score(self, bm25: float) -> float:
+        """
+        Maps a BM25 score to [0, 1) with a saturating function. Unlike normalizing by the best score of the query, a
+        weak lexical match gets a low score even if it is the best one.
+
+        :param bm25: The BM25 score
+        :return: The lexical score
+        """
+        return bm25 / (bm25 + self.bm25_half_score)
+
+    def find_functions(self, query: str, max_results: int = 2,
+                       query_embedding: list[float] = None) -> list[SearchResult]:
+        """
+        Finds functions by a weighted sum of the vector similarity and the lexical score of the query.
+        The results are ranked by the fused score, their distance is the cosine distance of the vector search as
+        returned by `FunctionIndexer.find_functions`, so distance thresholds apply to both. Functions that are only
+        found by the lexical search have a distance of 1.
+
+        :param query: Query string
+        :param max_results: Maximum number of results
+        :param query_embedding: The embedding of the query if it is already known, so it is not embedded again
+        :return: List of search results ordered by descending fused score
+        """
+        _functions = self.function_indexer._functions
+        _distances = {}
+        if query_embedding is not None:
+            _res = self.function_indexer._collection.query(query_embeddings=[query_embedding],
+                                                           n_results=self.candidates)
+        else:
+            _res = self.function_indexer._collection.query(query_texts=[query], n_results=self.candidates)
+        for metadata, distance in zip(_res["metadatas"][0], _res["distances"][0]):
+            if metadata["hash"] in _functions:
+                _distances[metadata["hash"]] = distance
+        _lexical = dict(self._lexical.search(query, max_results=self.candidates))
+        _ranked = []
+        for _hash in set(_distances) | set(_lexical):
+            if _hash not in _functions:
+                continue
+            _distance = _distances.get(_hash, 1.0)
+            _score = self.alpha * max(0.0, 1.0 - _distance) + \
+                (1 - self.alpha) * self.lexical_score(_lexical.get(_hash, 0.0))
+            _ranked.append((_score, SearchResult(name=_functions[_hash].name, wrapper=_functions[_hash],
+                                                 function=_functions[_hash].func, distance=_distance)))
+        _ranked.sort(key=lambda x: x[0], reverse=True)
+        return [r for _, r in _ranked[:max_results]]
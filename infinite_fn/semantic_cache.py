@@ -0,0 +1,132 @@
+"""
+Semantic cache keyed on query embeddings
+"""
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("INFINITE_FN_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("INFINITE_FN_SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("INFINITE_FN_SEMANTIC_CACHE_SIZE", "2048"))
+
+
+class SemanticCache(object):
+    """
+    A bounded cache that returns the value stored for the most similar previous query if its cosine similarity is
+    above a threshold. Entries are scoped by a context (e.g. a hash of the conversation that precedes the query) and
+    only match queries with the same context. Entries expire after a TTL and the least recently used entry is evicted
+    when the cache is full.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_SIZE, clock: callable = time.monotonic) -> None:
+        """
+        Initializes the cache
+
+        :param threshold: The minimum cosine similarity for a cache hit (e.g. 0.95)
+        :param ttl: The number of seconds after which an entry expires
+        :param max_entries: The maximum number of entries
+        :param clock: The clock used for expiry and recency
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._expires = np.full(max_entries, -np.inf)
+        self._last_used = np.full(max_entries, -np.inf)
+        self._contexts = np.zeros(max_entries, dtype=np.int64)
+        self._values = [None] * max_entries
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        _vector = np.asarray(embedding, dtype=np.float32)
+        _norm = np.linalg.norm(_vector)
+        return _vector / _norm if _norm > 0 else _vector
+
+    @staticmethod
+    def _context_key(context: str) -> int:
+        return int.from_bytes(hashlib.blake2b(context.encode(), digest_size=8).digest(), "little", signed=True)
+
+    def get(self, embedding, context: str = "") -> any:
+        """
+        Returns the value of the most similar live entry of a context
+
+        :param embedding: The query embedding
+        :param context: The context of the query
+        :return: The cached value or None on a cache miss
+        """
+        _query = self._normalize(embedding)
+        _context = self._context_key(context)
+        _now = self._clock()
+        with self._lock:
+            if self._embeddings is not None:
+                _similarities = self._embeddings @ _query
+                _similarities[(self._expires <= _now) | (self._contexts != _context)] = -np.inf
+                _idx = int(np.argmax(_similarities))
+                if _similarities[_idx] >= self.threshold:
+                    self._hits += 1
+                    self._last_used[_idx] = _now
+                    return self._values[_idx]
+            self._misses += 1
+            return None
+
+    def put(self, embedding, value: any, context: str = "") -> None:
+        """
+        Stores a value for a query embedding, evicting expired or least recently used entries when full
+
+        :param embedding: The query embedding
+        :param value: The value to cache
+        :param context: The context of the query
+        :return:
+        """
+        _vector = self._normalize(embedding)
+        _now = self._clock()
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.max_entries, _vector.shape[0]), dtype=np.float32)
+            _free = np.flatnonzero(self._expires <= _now)
+            if len(_free) > 0:
+                _idx = int(_free[0])
+            else:
+                _idx = int(np.argmin(self._last_used))
+                self._evictions += 1
+            self._embeddings[_idx] = _vector
+            self._expires[_idx] = _now + self.ttl
+            self._last_used[_idx] = _now
+            self._contexts[_idx] = self._context_key(context)
+            self._values[_idx] = value
+
+    def clear(self) -> None:
+        """
+        Removes all entries
+
+        :return:
+        """
+        with self._lock:
+            self._expires[:] = -np.inf
+            self._last_used[:] = -np.inf
+            self._values = [None] * self.max_entries
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the cache metrics
+
+        :return: Dictionary of hits, misses, hit rate, evictions and number of live entries
+        """
+        with self._lock:
+            _lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / _lookups if _lookups > 0 else 0.0,
+                "evictions": self._evictions,
+                "size": int(np.count_nonzero(self._expires > self._clock())),
+            }
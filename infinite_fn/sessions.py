@@ -0,0 +1,227 @@
+"""
+Bounded per-session conversation state, kept in process memory or in the shared state database when several worker
+processes serve the app
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from infinite_fn.local_apis.state_db import STATE_BACKEND, StateDB, get_state_db
+
+MAX_SESSIONS = int(os.getenv("INFINITE_FN_MAX_SESSIONS", "1000"))
+SESSION_TTL = float(os.getenv("INFINITE_FN_SESSION_TTL", "1800"))
+MAX_SESSION_MESSAGES = int(os.getenv("INFINITE_FN_MAX_SESSION_MESSAGES", "24"))
+
+
+class SessionConflictError(Exception):
+    """
+    Raised when a session is saved that another process has saved since it was loaded
+    """
+
+
+class Session(object):
+    """
+    The conversation state of a single chat session
+    """
+    __slots__ = ("session_id", "llm_interface", "max_messages", "last_access", "lock", "version")
+
+    def __init__(self, session_id: str, llm_interface: any, max_messages: int = MAX_SESSION_MESSAGES) -> None:
+        """
+        Initializes the session
+
+        :param session_id: The id of the session (e.g. the Gradio session hash)
+        :param llm_interface: The LLM interface which holds the conversation of the session
+        :param max_messages: The maximum number of non-system messages kept in the conversation
+        """
+        self.session_id = session_id
+        self.llm_interface = llm_interface
+        self.max_messages = max_messages
+        self.last_access = 0.0
+        self.lock = asyncio.Lock()
+        # the version of the conversation in the shared state database (see `SqliteSessionStore`)
+        self.version = 0
+
+    def trim(self) -> None:
+        """
+        Trims the conversation to the system messages and the most recent messages. The retained tail always starts
+        with a user message so that function calls and their responses are never separated. If the most recent turn
+        alone is longer than the limit, the whole turn is kept.
+
+        :return:
+        """
+        _store = self.llm_interface.conversation_store
+        _system = [m for m in _store.conversation if m["role"] == "system"]
+        _messages = [m for m in _store.conversation if m["role"] != "system"]
+        if len(_messages) <= self.max_messages:
+            return
+        _users = [i for i, m in enumerate(_messages) if m["role"] == "user"]
+        _start = next((i for i in _users if i >= len(_messages) - self.max_messages), _users[-1] if _users else 0)
+        _store.conversation = _system + _messages[_start:]
+
+
+class SessionStore(object):
+    """
+    A thread-safe store of chat sessions with LRU and TTL eviction of idle sessions
+    """
+
+    def __init__(self, llm_factory: callable, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL,
+                 max_messages: int = MAX_SESSION_MESSAGES, clock: callable = time.monotonic) -> None:
+        """
+        Initializes the session store
+
+        :param llm_factory: A callable that returns a new LLM interface for a new session
+        :param max_sessions: The maximum number of sessions kept in memory
+        :param ttl: The number of seconds after which an idle session is evicted
+        :param max_messages: The maximum number of non-system messages kept per session
+        :param clock: The clock used to track session access times
+        """
+        self._llm_factory = llm_factory
+        self._max_sessions = max_sessions
+        self._ttl = ttl
+        self._max_messages = max_messages
+        self._clock = clock
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """
+        Returns the session with the given id. A new session is created if it does not exist or has expired.
+
+        :param session_id: The id of the session
+        :return: The session
+        """
+        _now = self._clock()
+        with self._lock:
+            self._evict_expired(_now)
+            _session = self._sessions.get(session_id)
+            if _session is None:
+                _session = Session(session_id, self._llm_factory(), max_messages=self._max_messages)
+                self._sessions[session_id] = _session
+                while len(self._sessions) > self._max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            _session.last_access = _now
+            return _session
+
+    def save(self, session: Session) -> None:
+        """
+        Records the conversation of a session after a turn. Sessions are kept in memory, so there is nothing to do.
+
+        :param session: The session
+        :return:
+        """
+
+    def remove(self, session_id: str) -> None:
+        """
+        Removes a session
+
+        :param session_id: The id of the session
+        :return:
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_expired(self, now: float) -> None:
+        # sessions are ordered by last access so expired sessions are always at the front
+        while len(self._sessions) > 0:
+            _session = next(iter(self._sessions.values()))
+            if now - _session.last_access < self._ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    A session store whose conversations are kept in the shared SQLite state database, so that consecutive turns of a
+    session can be served by different worker processes. Sessions are still cached in process memory; a cached
+    conversation is reloaded when another process has saved a newer version of it. Saves compare and set the version,
+    so a turn that ran on an outdated conversation (e.g. two browser tabs of one session served by different workers)
+    does not overwrite the turn that was saved first.
+    """
+
+    def __init__(self, llm_factory: callable, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL,
+                 max_messages: int = MAX_SESSION_MESSAGES, clock: callable = time.monotonic,
+                 db: StateDB = None, wall_clock: callable = time.time) -> None:
+        """
+        Initializes the session store. See `SessionStore`.
+
+        :param db: The state database. Defaults to INFINITE_FN_STATE_DB.
+        :param wall_clock: The clock of the saved access times, shared by all processes
+        """
+        super().__init__(llm_factory, max_sessions=max_sessions, ttl=ttl, max_messages=max_messages, clock=clock)
+        self._db = db if db is not None else get_state_db()
+        self._wall_clock = wall_clock
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                         "conversation TEXT NOT NULL, last_access REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def get(self, session_id: str) -> Session:
+        """
+        Returns the session with the given id with the latest saved conversation
+
+        :param session_id: The id of the session
+        :return: The session
+        """
+        _session = super().get(session_id)
+        _rows = self._db.execute("SELECT version, conversation FROM sessions WHERE session_id = ? AND last_access > ?",
+                                 (session_id, self._wall_clock() - self._ttl))
+        if len(_rows) > 0 and _rows[0][0] != _session.version:
+            _session.version = _rows[0][0]
+            _session.llm_interface.conversation_store.conversation = json.loads(_rows[0][1])
+        return _session
+
+    def save(self, session: Session) -> None:
+        """
+        Saves the conversation of a session if no other process has saved it since it was loaded, and removes the
+        sessions that expired in all processes
+
+        :param session: The session
+        :return:
+        :raises SessionConflictError: If another process saved the session first. The session is reloaded with the
+                                      saved conversation.
+        """
+        _now = self._wall_clock()
+        with self._db.transaction() as cursor:
+            _row = cursor.execute("SELECT version, conversation FROM sessions WHERE session_id = ? AND last_access > ?",
+                                  (session.session_id, _now - self._ttl)).fetchone()
+            _conflict = _row is not None and _row[0] != session.version
+            if not _conflict:
+                cursor.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                               (session.session_id, session.version + 1,
+                                json.dumps(session.llm_interface.conversation_store.conversation), _now))
+            cursor.execute("DELETE FROM sessions WHERE last_access <= ?", (_now - self._ttl,))
+        if _conflict:
+            session.version = _row[0]
+            session.llm_interface.conversation_store.conversation = json.loads(_row[1])
+            raise SessionConflictError(f"Session {session.session_id} was saved by another process")
+        session.version += 1
+
+    def remove(self, session_id: str) -> None:
+        super().remove(session_id)
+        self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+def create_session_store(llm_factory: callable, backend: str = STATE_BACKEND, **kwargs) -> SessionStore:
+    """
+    Creates the session store of the configured state backend
+
+    :param llm_factory: A callable that returns a new LLM interface for a new session
+    :param backend: "memory" (default) or "sqlite" when sessions are shared by several worker processes
+    :param kwargs: Further arguments of the session store
+    :return: The session store
+    """
+    if backend == "sqlite":
+        return SqliteSessionStore(llm_factory, **kwargs)
+    if backend != "memory":
+        raise ValueError(f"Unknown state backend {backend}. Expected memory or sqlite")
+    return SessionStore(llm_factory, **kwargs)
@@ -0,0 +1,111 @@
+"""
+Application startup: creating and loading the function index in the background and tracking readiness.
+
+func_ai (and with it chromadb and openai) is imported only when the function index is created, so the web server can
+start and report its readiness before the index is loaded.
+"""
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from func_ai.function_indexer import FunctionIndexer
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKEND = os.getenv("INFINITE_FN_VECTOR_BACKEND", "numpy")
+INDEXED_MODULES = ["infinite_fn.python_fns.trip",
+                   "infinite_fn.python_fns.attractions",
+                   "infinite_fn.python_fns.weather",
+                   "infinite_fn.python_fns.lodging"]
+
+
+def create_function_indexer(backend: str = VECTOR_BACKEND, read_only: bool = False) -> "FunctionIndexer":
+    """
+    Creates the function indexer. Functions already in the persisted index are loaded.
+
+    :param backend: "numpy" for the in-process index in INFINITE_FN_VECTOR_INDEX_PATH or "chroma"
+    :param read_only: Whether the numpy index is only loaded and queried (by worker processes). It must exist.
+    :return: The function indexer
+    """
+    from func_ai.function_indexer import FunctionIndexer
+
+    if backend == "numpy":
+        from infinite_fn.vector_index import NumpyClient
+        return FunctionIndexer(chroma_client=NumpyClient(read_only=read_only))
+    return FunctionIndexer()
+
+
+class Readiness(object):
+    """
+    Thread-safe startup state: the current stage, whether the app is ready to serve and the error if startup failed
+    """
+
+    def __init__(self, clock: callable = time.monotonic) -> None:
+        self._clock = clock
+        self._started = clock()
+        self._ready = threading.Event()
+        self._ready_after = None
+        self.stage = "starting"
+        self.error = None
+
+    def set_stage(self, stage: str) -> None:
+        """
+        Records the current startup stage (e.g. "indexing")
+
+        :param stage: The stage
+        :return:
+        """
+        self.stage = stage
+        logger.info(f"Startup stage: {stage} ({self._clock() - self._started:.2f}s)")
+
+    def set_ready(self) -> None:
+        self._ready_after = self._clock() - self._started
+        self.stage = "ready"
+        self._ready.set()
+        logger.info(f"Ready to serve after {self._ready_after:.2f}s")
+
+    def fail(self, error: BaseException) -> None:
+        self.stage = "failed"
+        self.error = repr(error)
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Blocks until the app is ready
+
+        :param timeout: The maximum number of seconds to wait
+        :return: Whether the app is ready
+        """
+        return self._ready.wait(timeout)
+
+    def to_dict(self) -> dict[str, any]:
+        return {"ready": self.is_ready, "stage": self.stage, "error": self.error,
+                "seconds": self._ready_after if self._ready_after is not None else self._clock() - self._started}
+
+
+def start_in_background(target: callable, readiness: Readiness, name: str = "startup") -> threading.Thread:
+    """
+    Runs a startup task in a daemon thread, marking the app as failed if it raises
+
+    :param target: The startup task, it should call `readiness.set_ready()` when done
+    :param readiness: The readiness state
+    :param name: The name of the thread
+    :return: The thread
+    """
+
+    def _run() -> None:
+        try:
+            target()
+        except BaseException as e:
+            logger.exception("Startup failed")
+            readiness.fail(e)
+
+    _thread = threading.Thread(target=_run, name=name, daemon=True)
+    _thread.start()
+    return _thread
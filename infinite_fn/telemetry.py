@@ -0,0 +1,342 @@
+"""
+Lightweight tracing of the chat and indexing pipelines.
+
+Each stage runs in a span that records its duration and, when given the LLM interface of the stage, the prompt and
+completion tokens it used. Finished spans are aggregated into in-process histograms (see `Telemetry.summary` for
+p50/p99) and passed to the configured exporters: a Prometheus text endpoint and/or a JSONL file.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_EXPORT = os.getenv("INFINITE_FN_TELEMETRY_EXPORT", "")
+TELEMETRY_JSONL_PATH = os.getenv("INFINITE_FN_TELEMETRY_JSONL_PATH", "./telemetry.jsonl")
+TELEMETRY_PORT = int(os.getenv("INFINITE_FN_TELEMETRY_PORT", "9464"))
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def usage_tokens(usage: dict[str, dict[str, int]]) -> tuple[int, int]:
+    """
+    Returns the total prompt and completion tokens of an LLM interface usage (see `OpenAIInterface.get_usage`)
+
+    :param usage: Dictionary of model to token counts
+    :return: The prompt and completion tokens
+    """
+    return (sum(u.get("prompt_tokens", 0) for u in usage.values()),
+            sum(u.get("completion_tokens", 0) for u in usage.values()))
+
+
+class Histogram(object):
+    """
+    Cumulative-bucket histogram of observed values
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        :param buckets: The upper bounds of the buckets, in ascending order
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by linear interpolation within the bucket that contains it
+
+        :param q: The quantile, between 0 and 1
+        :return: The estimated value (NaN if nothing was observed)
+        """
+        if self.count == 0:
+            return math.nan
+        _rank = q * self.count
+        _seen = 0
+        for i, c in enumerate(self.counts):
+            if c > 0 and _seen + c >= _rank:
+                _lower = self.buckets[i - 1] if i > 0 else 0.0
+                _upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return _lower + (_upper - _lower) * (_rank - _seen) / c
+            _seen += c
+        return self.max
+
+
+class Span(object):
+    """
+    A timed pipeline stage
+    """
+    __slots__ = ('name', 'attributes', 'start', 'duration', 'excluded')
+
+    def __init__(self, name: str, attributes: dict[str, any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = 0.0
+        self.excluded = 0.0
+
+    def set(self, **attributes) -> None:
+        """
+        Adds attributes to the span (e.g. function="current_weather")
+        """
+        self.attributes.update(attributes)
+
+    def exclude(self, seconds: float) -> None:
+        """
+        Excludes time that was not spent in the stage from its duration (e.g. waiting for the consumer of a stream)
+
+        :param seconds: The number of seconds to exclude
+        """
+        self.excluded += seconds
+
+    def to_dict(self) -> dict[str, any]:
+        return {"name": self.name, "start": self.start, "duration": self.duration, **self.attributes}
+
+
+class Telemetry(object):
+    """
+    Records spans into per-stage histograms and token counters and passes them to exporters
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, clock: callable = time.perf_counter) -> None:
+        """
+        :param buckets: The histogram buckets in seconds
+        :param clock: The clock used to time spans
+        """
+        self.buckets = buckets
+        self._clock = clock
+        # keyed by (stage, function); function is "" for stages that do not call a function
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+        self._tokens: dict[tuple[str, str], int] = {}
+        self._errors: dict[str, int] = {}
+        # keyed by (counter, result)
+        self._counters: dict[tuple[str, str], int] = {}
+        self._sinks: list[callable] = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: callable) -> None:
+        """
+        Passes every finished span to a sink
+
+        :param sink: A callable taking the span as a dictionary
+        :return:
+        """
+        self._sinks.append(sink)
+
+    @contextmanager
+    def span(self, name: str, llm_interface: any = None, **attributes) -> Iterator[Span]:
+        """
+        Times a stage. Usable in synchronous and asynchronous code. A stage that is closed or cancelled by its caller
+        (GeneratorExit, CancelledError) is recorded without an error.
+
+        :param name: The stage (e.g. "reflection")
+        :param llm_interface: The LLM interface of the stage. The tokens it uses during the span are recorded.
+        :param attributes: Attributes of the span (e.g. function="current_weather")
+        :return: The span
+        """
+        _span = Span(name, attributes)
+        _usage = usage_tokens(llm_interface.get_usage()) if llm_interface is not None else None
+        _started = self._clock()
+        try:
+            yield _span
+        except (GeneratorExit, asyncio.CancelledError):
+            _span.set(cancelled=True)
+            raise
+        except BaseException as e:
+            _span.set(error=repr(e))
+            raise
+        finally:
+            _span.duration = max(0.0, self._clock() - _started - _span.excluded)
+            if _usage is not None:
+                _prompt, _completion = usage_tokens(llm_interface.get_usage())
+                _span.set(prompt_tokens=_prompt - _usage[0], completion_tokens=_completion - _usage[1])
+            self.record(_span)
+
+    def record(self, span: Span) -> None:
+        """
+        Aggregates a finished span and exports it
+
+        :param span: The span
+        :return:
+        """
+        _key = (span.name, str(span.attributes.get("function", "")))
+        with self._lock:
+            _histogram = self._histograms.get(_key)
+            if _histogram is None:
+                _histogram = self._histograms[_key] = Histogram(self.buckets)
+            _histogram.observe(span.duration)
+            for kind in ("prompt", "completion"):
+                if f"{kind}_tokens" in span.attributes:
+                    self._tokens[(span.name, kind)] = (self._tokens.get((span.name, kind), 0)
+                                                       + span.attributes[f"{kind}_tokens"])
+            if "error" in span.attributes:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+        _record = span.to_dict()
+        for sink in self._sinks:
+            try:
+                sink(_record)
+            except Exception:
+                logger.exception(f"Telemetry sink {sink} failed")
+
+    def increment(self, counter: str, result: str, amount: int = 1) -> None:
+        """
+        Counts an event that is not a timed stage (e.g. a semantic cache lookup)
+
+        :param counter: The counter (e.g. "semantic_cache_lookups")
+        :param result: The outcome of the event (e.g. "hit")
+        :param amount: The amount to add
+        :return:
+        """
+        with self._lock:
+            self._counters[(counter, result)] = self._counters.get((counter, result), 0) + amount
+
+    def counters(self) -> dict[str, dict[str, int]]:
+        """
+        Returns the event counters
+
+        :return: Dictionary of counter to result to count
+        """
+        _counters = {}
+        with self._lock:
+            for (counter, result), count in sorted(self._counters.items()):
+                _counters.setdefault(counter, {})[result] = count
+        return _counters
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the count, mean, p50 and p99 duration of each stage over all its functions
+
+        :return: Dictionary of stage to statistics in seconds
+        """
+        _summary = {}
+        with self._lock:
+            _stages = sorted({stage for stage, _ in self._histograms})
+            for stage in _stages:
+                _merged = Histogram(self.buckets)
+                for (s, _), h in self._histograms.items():
+                    if s == stage:
+                        _merged.counts = [a + b for a, b in zip(_merged.counts, h.counts)]
+                        _merged.count += h.count
+                        _merged.sum += h.sum
+                        _merged.max = max(_merged.max, h.max)
+                _summary[stage] = {"count": _merged.count, "mean": _merged.sum / _merged.count,
+                                   "p50": _merged.quantile(0.5), "p99": _merged.quantile(0.99)}
+        return _summary
+
+    def prometheus_text(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format
+
+        :return: The metrics
+        """
+        _lines = ["# TYPE infinite_fn_stage_seconds histogram"]
+        with self._lock:
+            for (stage, function), h in sorted(self._histograms.items()):
+                _labels = f'stage="{stage}"' + (f',function="{function}"' if function else "")
+                _cumulative = 0
+                for bound, c in zip(list(self.buckets) + ["+Inf"], h.counts):
+                    _cumulative += c
+                    _lines.append(f'infinite_fn_stage_seconds_bucket{{{_labels},le="{bound}"}} {_cumulative}')
+                _lines.append(f"infinite_fn_stage_seconds_sum{{{_labels}}} {h.sum}")
+                _lines.append(f"infinite_fn_stage_seconds_count{{{_labels}}} {h.count}")
+            _lines.append("# TYPE infinite_fn_stage_tokens_total counter")
+            for (stage, kind), tokens in sorted(self._tokens.items()):
+                _lines.append(f'infinite_fn_stage_tokens_total{{stage="{stage}",kind="{kind}"}} {tokens}')
+            _lines.append("# TYPE infinite_fn_stage_errors_total counter")
+            for stage, errors in sorted(self._errors.items()):
+                _lines.append(f'infinite_fn_stage_errors_total{{stage="{stage}"}} {errors}')
+            for counter in sorted({c for c, _ in self._counters}):
+                _lines.append(f"# TYPE infinite_fn_{counter}_total counter")
+                for (c, result), count in sorted(self._counters.items()):
+                    if c == counter:
+                        _lines.append(f'infinite_fn_{counter}_total{{result="{result}"}} {count}')
+        return "\n".join(_lines) + "\n"
+
+    def serve_prometheus(self, port: int = TELEMETRY_PORT) -> ThreadingHTTPServer:
+        """
+        Serves the metrics on `http://0.0.0.0:<port>/metrics` from a background thread
+
+        :param port: The port
+        :return: The server
+        """
+        _telemetry = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                _body = _telemetry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(_body)))
+                self.end_headers()
+                self.wfile.write(_body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="telemetry-metrics", daemon=True).start()
+        logger.info(f"Serving metrics on port {_server.server_address[1]}")
+        return _server
+
+
+class JsonlSink(object):
+    """
+    Appends every span as a JSON document to a file
+    """
+
+    def __init__(self, path: str = TELEMETRY_JSONL_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def __call__(self, span: dict[str, any]) -> None:
+        _line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            self._file.write(_line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+telemetry = Telemetry()
+
+
+def configure_exporters(exporters: str = TELEMETRY_EXPORT, target: Telemetry = telemetry) -> None:
+    """
+    Starts the exporters listed in INFINITE_FN_TELEMETRY_EXPORT
+
+    :param exporters: Comma separated exporters: "prometheus" and/or "jsonl"
+    :param target: The telemetry to export
+    :return:
+    """
+    for exporter in (e.strip() for e in exporters.split(",") if e.strip()):
+        if exporter == "prometheus":
+            try:
+                target.serve_prometheus()
+            except OSError as e:
+                # with several worker processes only the first one can bind the metrics port
+                logger.warning(f"Metrics of process {os.getpid()} are not exported: {e}")
+        elif exporter == "jsonl":
+            target.add_sink(JsonlSink())
+        else:
+            raise ValueError(f"Unknown telemetry exporter {exporter}. Expected prometheus or jsonl")
@@ -0,0 +1,209 @@
+"""
+Declarative registry of the tool functions that are indexed and offered to the LLM.
+
+Tools are registered with the `tool` decorator, which records how the executor may run them:
+
+    @tool(ttl=600)
+    def current_weather(location: str) -> dict: ...
+
+    @tool(side_effect=True)
+    def book_trip(...) -> str: ...
+
+    @tool(pure=True, json_result=True)
+    def filter_lodgings_by_price(lodgings, min_price, max_price): ...
+
+Pure tools and tools with a TTL are cacheable: their results are memoized by normalized arguments in
+`ToolResultCache`. Side-effecting tools are never cached. Helper functions in the tool modules are not registered and
+are therefore not indexed. Tools whose results the LLM passes on as arguments of other tools declare `json_result` so
+that their results are kept as JSON instead of being compacted into a table.
+"""
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from infinite_fn.index_manifest import function_identifier
+
+TOOL_CACHE_SIZE = int(os.getenv("INFINITE_FN_TOOL_CACHE_SIZE", "1024"))
+
+
+class ToolSpec(object):
+    """
+    Execution metadata of a tool
+    """
+
+    def __init__(self, func: callable, pure: bool = False, ttl: float = None, side_effect: bool = False,
+                 timeout: float = None, json_result: bool = False) -> None:
+        """
+        :param func: The tool function
+        :param pure: Whether the result depends only on the arguments, so it can be cached without expiry
+        :param ttl: The number of seconds a result can be cached for
+        :param side_effect: Whether the tool changes state (e.g. makes a booking). Its results are never cached.
+        :param timeout: The maximum number of seconds to wait for the tool. Defaults to the executor timeout.
+        :param json_result: Whether the result is passed on as an argument of other tools (e.g. a list of lodgings to
+                            filter), so it is added to the conversation as JSON with a larger budget
+        """
+        if side_effect and (pure or ttl is not None):
+            raise ValueError(f"Side-effecting tool {func.__name__} cannot be pure or cached")
+        self.func = func
+        self.pure = pure
+        self.ttl = ttl
+        self.side_effect = side_effect
+        self.timeout = timeout
+        self.json_result = json_result
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__
+
+    @property
+    def cacheable(self) -> bool:
+        return self.pure or self.ttl is not None
+
+    def to_dict(self) -> dict[str, any]:
+        return {"name": self.name, "pure": self.pure, "ttl": self.ttl, "side_effect": self.side_effect,
+                "timeout": self.timeout, "json_result": self.json_result}
+
+
+# module name -> function name -> spec
+_registry: dict[str, dict[str, ToolSpec]] = {}
+_registry_lock = threading.Lock()
+
+
+def tool(func: callable = None, *, pure: bool = False, ttl: float = None, side_effect: bool = False,
+         timeout: float = None, json_result: bool = False) -> callable:
+    """
+    Registers a function as a tool. Usable with or without arguments (`@tool` or `@tool(pure=True)`).
+    The function itself is returned unchanged.
+
+    :param func: The tool function
+    :param pure: See `ToolSpec`
+    :param ttl: See `ToolSpec`
+    :param side_effect: See `ToolSpec`
+    :param timeout: See `ToolSpec`
+    :param json_result: See `ToolSpec`
+    :return: The function, or a decorator if no function is given
+    """
+
+    def _register(f: callable) -> callable:
+        f.__tool__ = ToolSpec(f, pure=pure, ttl=ttl, side_effect=side_effect, timeout=timeout,
+                              json_result=json_result)
+        with _registry_lock:
+            _registry.setdefault(f.__module__, {})[f.__name__] = f.__tool__
+        return f
+
+    return _register(func) if func is not None else _register
+
+
+def tool_spec(func: callable) -> ToolSpec | None:
+    """
+    Returns the metadata of a tool
+
+    :param func: The function
+    :return: The tool spec or None if the function is not a registered tool
+    """
+    return getattr(func, "__tool__", None)
+
+
+def module_tools(module_name: str) -> list[callable]:
+    """
+    Returns the tools registered in a module, in definition order
+
+    :param module_name: The name of the module (e.g. "infinite_fn.python_fns.trip")
+    :return: List of functions
+    """
+    with _registry_lock:
+        return [spec.func for spec in _registry.get(module_name, {}).values()]
+
+
+def normalize_arguments(func: callable, arguments: dict[str, any]) -> str:
+    """
+    Returns a canonical form of the arguments of a call: defaults are applied and keys are sorted, so that calls that
+    differ only in argument order or in passing a default compare equal
+
+    :param func: The function
+    :param arguments: The keyword arguments of the call
+    :return: The normalized arguments as JSON
+    :raises TypeError: If the arguments do not match the signature of the function
+    """
+    _bound = inspect.signature(func).bind(**arguments)
+    _bound.apply_defaults()
+    return json.dumps(_bound.arguments, sort_keys=True, default=str)
+
+
+class ToolResultCache(object):
+    """
+    Bounded, thread-safe LRU of the results of cacheable tools, keyed by tool and normalized arguments.
+    Entries of tools with a TTL expire, entries of pure tools are kept until they are evicted.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_SIZE, clock: callable = time.monotonic) -> None:
+        """
+        :param max_entries: The maximum number of cached results
+        :param clock: Returns the current time in seconds
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], tuple[float, any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, func: callable, arguments: dict[str, any]) -> tuple[str, str] | None:
+        """
+        Returns the cache key of a call
+
+        :param func: The tool function
+        :param arguments: The keyword arguments of the call
+        :return: The key, or None if the tool is not cacheable or the arguments do not match its signature
+        """
+        _spec = tool_spec(func)
+        if _spec is None or not _spec.cacheable:
+            return None
+        try:
+            return function_identifier(func), normalize_arguments(func, arguments)
+        except TypeError:
+            return None
+
+    def get(self, key: tuple[str, str]) -> tuple[bool, any]:
+        """
+        Looks up a result
+
+        :param key: The key returned by `key`
+        :return: Whether the result was found and the result
+        """
+        with self._lock:
+            _entry = self._entries.get(key)
+            if _entry is None or _entry[0] <= self._clock():
+                if _entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, _entry[1]
+
+    def put(self, key: tuple[str, str], func: callable, result: any) -> None:
+        """
+        Stores a result
+
+        :param key: The key returned by `key`
+        :param func: The tool function
+        :param result: The result of the call
+        :return:
+        """
+        _ttl = tool_spec(func).ttl
+        with self._lock:
+            self._entries[key] = (self._clock() + _ttl if _ttl is not None else float("inf"), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
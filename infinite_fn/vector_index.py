@@ -0,0 +1,287 @@
+"""
+Embedded, NumPy based vector index.
+
+`NumpyClient` implements the subset of the chromadb client and collection API used by `FunctionIndexer` so that it can
+be passed as `chroma_client` to run the function index in-process without a Chroma/ClickHouse deployment.
+
+Persisted embeddings are memory-mapped read-only, so worker processes that load the same index share its pages in the
+OS page cache instead of each holding a copy.
+
+Each write of a collection goes to a new version directory holding its embeddings and documents; the version is then
+published by atomically replacing the `<name>.current` pointer file. A process that loads the collection while it is
+being written, or after a write was interrupted, always sees a complete, consistent version.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+VECTOR_INDEX_PATH = os.getenv("INFINITE_FN_VECTOR_INDEX_PATH", "./function_index")
+
+
+class NumpyCollection(object):
+    """
+    A collection of documents whose normalized embeddings are held in a contiguous float32 matrix.
+    The matrix is persisted as a .npy file in a version directory and memory-mapped on load.
+    """
+
+    def __init__(self, name: str, path: str = None, embedding_function: callable = None,
+                 metadata: dict[str, any] = None, read_only: bool = False) -> None:
+        """
+        Initializes the collection, loading it from disk if it was persisted before
+
+        :param name: The name of the collection
+        :param path: The directory where the collection is persisted. If None the collection is kept in memory only.
+        :param embedding_function: The function used to embed documents and query texts
+        :param metadata: The collection metadata
+        :param read_only: Whether the collection is only loaded and queried, e.g. by worker processes. It must exist.
+        """
+        self.name = name
+        self.read_only = read_only
+        self.metadata = metadata or {}
+        self._path = path
+        self._embedding_function = embedding_function
+        self._lock = threading.RLock()
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._positions = {}
+        self._version = 0
+        if path is not None and (os.path.exists(self._file("current")) or os.path.exists(self._file("json"))):
+            self._load()
+        elif read_only:
+            raise FileNotFoundError(f"Collection {name} was not found in {path}")
+
+    def _file(self, ext: str) -> str:
+        return os.path.join(self._path, f"{self.name}.{ext}")
+
+    def _version_dir(self, version: int) -> str:
+        return self._file(f"v{version:06d}")
+
+    def _current_version(self) -> int:
+        try:
+            with open(self._file("current")) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _load(self) -> None:
+        self._version = self._current_version()
+        if self._version > 0:
+            _json, _npy = (os.path.join(self._version_dir(self._version), f) for f in ("data.json", "embeddings.npy"))
+        else:
+            # written before collections were versioned
+            _json, _npy = self._file("json"), self._file("npy")
+        with open(_json) as f:
+            _data = json.load(f)
+        self._ids = _data["ids"]
+        self._documents = _data["documents"]
+        self._metadatas = _data["metadatas"]
+        self._positions = {_id: idx for idx, _id in enumerate(self._ids)}
+        self._embeddings = np.load(_npy, mmap_mode="r")
+
+    def _persist(self) -> None:
+        if self._path is None:
+            return
+        os.makedirs(self._path, exist_ok=True)
+        _version = max(self._version, self._current_version()) + 1
+        while os.path.exists(self._version_dir(_version)):
+            # left behind by an interrupted write
+            _version += 1
+        _tmp_dir = tempfile.mkdtemp(dir=self._path, prefix=f".{self.name}.")
+        try:
+            with open(os.path.join(_tmp_dir, "embeddings.npy"), "wb") as f:
+                np.save(f, self._embeddings)
+            with open(os.path.join(_tmp_dir, "data.json"), "w") as f:
+                json.dump({"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas}, f)
+            os.rename(_tmp_dir, self._version_dir(_version))
+        except BaseException:
+            shutil.rmtree(_tmp_dir, ignore_errors=True)
+            raise
+        _fd, _tmp_pointer = tempfile.mkstemp(dir=self._path, prefix=f".{self.name}.current.")
+        with os.fdopen(_fd, "w") as f:
+            f.write(str(_version))
+        os.replace(_tmp_pointer, self._file("current"))
+        self._version = _version
+        self._remove_old_versions()
+
+    def _remove_old_versions(self) -> None:
+        # the previous version is kept for processes that read the pointer just before it was replaced
+        for entry in os.listdir(self._path):
+            _prefix, _, _suffix = entry.rpartition(".v")
+            if _prefix == self.name and _suffix.isdigit() and int(_suffix) < self._version - 1:
+                shutil.rmtree(os.path.join(self._path, entry), ignore_errors=True)
+        for ext in ("json", "npy"):
+            if os.path.exists(self._file(ext)):
+                os.remove(self._file(ext))
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise ValueError(f"Collection {self.name} is read-only")
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        if self._embedding_function is None:
+            raise ValueError("Embeddings must be provided when the collection has no embedding function")
+        return self._normalize(self._embedding_function(texts))
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        _matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        _norms = np.linalg.norm(_matrix, axis=1, keepdims=True)
+        _norms[_norms == 0] = 1.0
+        return _matrix / _norms
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def get(self, ids: list[str] = None, include: list[str] = None) -> dict[str, list]:
+        """
+        Returns documents by id
+
+        :param ids: The ids to return. If None all documents are returned.
+        :param include: Ignored, for chromadb compatibility
+        :return: Dictionary of ids, documents and metadatas
+        """
+        with self._lock:
+            _idx = range(len(self._ids)) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+            return {
+                "ids": [self._ids[i] for i in _idx],
+                "documents": [self._documents[i] for i in _idx],
+                "metadatas": [self._metadatas[i] for i in _idx],
+            }
+
+    def upsert(self, ids: list[str], embeddings: list[list[float]] = None, documents: list[str] = None,
+               metadatas: list[dict[str, any]] = None) -> None:
+        """
+        Inserts or replaces documents
+
+        :param ids: The document ids
+        :param embeddings: The document embeddings. If None the documents are embedded with the embedding function.
+        :param documents: The documents
+        :param metadatas: The document metadatas
+        :return:
+        """
+        self._check_writable()
+        documents = documents if documents is not None else [""] * len(ids)
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+        _vectors = self._embed(documents) if embeddings is None else self._normalize(embeddings)
+        with self._lock:
+            _matrix = np.array(self._embeddings, dtype=np.float32) if len(self._ids) > 0 \
+                else np.zeros((0, _vectors.shape[1]), dtype=np.float32)
+            _new_rows = []
+            for _id, _vector, _document, _metadata in zip(ids, _vectors, documents, metadatas):
+                if _id in self._positions:
+                    _pos = self._positions[_id]
+                    _matrix[_pos] = _vector
+                    self._documents[_pos] = _document
+                    self._metadatas[_pos] = _metadata
+                else:
+                    self._positions[_id] = len(self._ids)
+                    self._ids.append(_id)
+                    self._documents.append(_document)
+                    self._metadatas.append(_metadata)
+                    _new_rows.append(_vector)
+            if len(_new_rows) > 0:
+                _matrix = np.concatenate([_matrix, np.stack(_new_rows)])
+            self._embeddings = np.ascontiguousarray(_matrix)
+            self._persist()
+
+    add = upsert
+
+    def delete(self, ids: list[str] = None) -> None:
+        """
+        Deletes documents by id
+
+        :param ids: The ids to delete
+        :return:
+        """
+        self._check_writable()
+        with self._lock:
+            _remove = {self._positions[i] for i in ids or [] if i in self._positions}
+            if len(_remove) == 0:
+                return
+            _keep = [i for i in range(len(self._ids)) if i not in _remove]
+            self._embeddings = np.ascontiguousarray(np.asarray(self._embeddings)[_keep], dtype=np.float32)
+            self._ids = [self._ids[i] for i in _keep]
+            self._documents = [self._documents[i] for i in _keep]
+            self._metadatas = [self._metadatas[i] for i in _keep]
+            self._positions = {_id: idx for idx, _id in enumerate(self._ids)}
+            self._persist()
+
+    def query(self, query_texts: list[str] = None, query_embeddings: list[list[float]] = None,
+              n_results: int = 10, include: list[str] = None) -> dict[str, list[list]]:
+        """
+        Returns the nearest documents of each query by cosine distance
+
+        :param query_texts: The query texts, embedded with the embedding function
+        :param query_embeddings: The query embeddings
+        :param n_results: The number of results per query
+        :param include: Ignored, for chromadb compatibility
+        :return: Dictionary of ids, distances, documents and metadatas, one list per query
+        """
+        _queries = self._embed(query_texts) if query_embeddings is None else self._normalize(query_embeddings)
+        with self._lock:
+            _matrix, _ids, _documents, _metadatas = self._embeddings, self._ids, self._documents, self._metadatas
+        _result = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        _k = min(n_results, len(_ids))
+        if _k == 0:
+            for key in _result:
+                _result[key] = [[] for _ in _queries]
+            return _result
+        _scores = _queries @ _matrix.T
+        _top = np.argpartition(-_scores, _k - 1, axis=1)[:, :_k]
+        for _row, _candidates in zip(_scores, _top):
+            _ranked = _candidates[np.argsort(-_row[_candidates])]
+            _result["ids"].append([_ids[i] for i in _ranked])
+            _result["distances"].append([float(1.0 - _row[i]) for i in _ranked])
+            _result["documents"].append([_documents[i] for i in _ranked])
+            _result["metadatas"].append([_metadatas[i] for i in _ranked])
+        return _result
+
+
+class NumpyClient(object):
+    """
+    A minimal chromadb compatible client which manages `NumpyCollection`s persisted in a directory
+    """
+
+    def __init__(self, path: str = VECTOR_INDEX_PATH, read_only: bool = False) -> None:
+        """
+        Initializes the client
+
+        :param path: The directory where collections are persisted. If None collections are kept in memory only.
+        :param read_only: Whether collections are only loaded and queried (see `NumpyCollection`)
+        """
+        self._path = path
+        self.read_only = read_only
+        self._collections = {}
+
+    def get_or_create_collection(self, name: str, metadata: dict[str, any] = None,
+                                 embedding_function: callable = None) -> NumpyCollection:
+        """
+        Returns a collection, creating (or loading) it if necessary
+
+        :param name: The collection name
+        :param metadata: The collection metadata
+        :param embedding_function: The function used to embed documents and query texts
+        :return: The collection
+        """
+        if name not in self._collections:
+            self._collections[name] = NumpyCollection(name, path=self._path, embedding_function=embedding_function,
+                                                      metadata=metadata, read_only=self.read_only)
+        return self._collections[name]
+
+    def reset(self) -> None:
+        """
+        Deletes all collections
+
+        :return:
+        """
+        if self.read_only:
+            raise ValueError("The vector index is read-only")
+        self._collections = {}
+        if self._path is not None and os.path.exists(self._path):
+            shutil.rmtree(self._path)
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from infinite_fn.executor import aexecute
+from infinite_fn.local_apis.attraction_cache import AttractionCache, LLMAttractionLoader, parse_attractions
+from tests.test_executor import FakeWrapper
+
+
+class FakeLLM(object):
+    prompts = []
+
+    def __init__(self, max_tokens=None):
+        self.max_tokens = max_tokens
+
+    def send(self, prompt):
+        FakeLLM.prompts.append(prompt)
+        _locations = json.loads(prompt[prompt.index("["):prompt.index("]") + 1])
+        _response = {location: [{"name": f"{location} Museum", "description": "Old things"}] for location in _locations}
+        return {"content": f"```json\n{json.dumps(_response)}\n```"}
+
+
+def test_parse_attractions_matches_requested_locations():
+    _text = 'Sure! {"london": [{"name": "Big Ben", "description": "A clock"}, {"description": "no name"}]}'
+    assert parse_attractions(_text, ["London", "Paris"]) == {"London": [{"name": "Big Ben", "description": "A clock"}]}
+    assert parse_attractions("I don't know", ["London"]) == {}
+
+
+def test_cache_batches_misses_and_persists(tmp_path):
+    FakeLLM.prompts.clear()
+    _now = [0.0]
+    _path = str(tmp_path / "attractions.json")
+    cache = AttractionCache(LLMAttractionLoader(FakeLLM, batch_size=2), path=_path, ttl=10, clock=lambda: _now[0])
+    cache.prewarm(["London", "Paris", "Rome"])
+    assert len(FakeLLM.prompts) == 2
+    assert cache.get("london") == [{"name": "London Museum", "description": "Old things"}]
+    assert cache.get_many(["Paris", "Rome"])["Rome"][0]["name"] == "Rome Museum"
+    assert len(FakeLLM.prompts) == 2
+
+    restored = AttractionCache(LLMAttractionLoader(FakeLLM), path=_path, ttl=10, clock=lambda: _now[0])
+    assert "Paris" in restored
+    _now[0] = 11.0
+    assert "Paris" not in restored
+    restored.get("Paris")
+    assert len(FakeLLM.prompts) == 3
+
+
+def test_concurrent_misses_are_coalesced_per_location(tmp_path):
+    _calls = []
+    _london_started, _release_london = threading.Event(), threading.Event()
+
+    def _loader(locations):
+        _calls.append(locations)
+        if "London" in locations:
+            _london_started.set()
+            assert _release_london.wait(timeout=5.0)
+        return {location: [{"name": f"{location} Museum", "description": ""}] for location in locations}
+
+    cache = AttractionCache(_loader, path=str(tmp_path / "attractions.json"))
+    _results = []
+    _threads = [threading.Thread(target=lambda: _results.append(cache.get("London"))) for _ in range(3)]
+    _threads[0].start()
+    assert _london_started.wait(timeout=5.0)
+    for thread in _threads[1:]:
+        thread.start()
+    # another location is not blocked by the load of London
+    assert cache.get("Paris")[0]["name"] == "Paris Museum"
+    time.sleep(0.05)
+    _release_london.set()
+    for thread in _threads:
+        thread.join(timeout=5.0)
+    assert _calls == [["London"], ["Paris"]]
+    assert len(_results) == 3 and all(r[0]["name"] == "London Museum" for r in _results)
+
+
+def test_expired_entries_are_not_persisted(tmp_path):
+    _now = [0.0]
+    _path = tmp_path / "attractions.json"
+    cache = AttractionCache(lambda locations: {l: [] for l in locations}, path=str(_path), ttl=10,
+                            clock=lambda: _now[0])
+    cache.get("London")
+    _now[0] = 11.0
+    cache.get("Paris")
+    assert list(json.loads(_path.read_text())) == ["paris"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["attractions.json", "attractions.json.lock"]
+
+
+def test_processes_sharing_the_file_keep_each_others_entries(tmp_path):
+    _calls = []
+
+    def _loader(locations):
+        _calls.append(locations)
+        return {location: [{"name": f"{location} Museum", "description": ""}] for location in locations}
+
+    _path = tmp_path / "attractions.json"
+    first, second = AttractionCache(_loader, path=str(_path)), AttractionCache(_loader, path=str(_path))
+    first.get("London")
+    second.get("Paris")
+    assert sorted(json.loads(_path.read_text())) == ["london", "paris"]
+    # the entry written by the other cache is read from the file instead of being loaded again
+    assert second.get("London")[0]["name"] == "London Museum"
+    assert _calls == [["London"], ["Paris"]]
+
+
+def test_failed_load_is_retried_by_the_tool(monkeypatch, tmp_path):
+    attractions = pytest.importorskip("infinite_fn.python_fns.attractions")
+    _responses = ["I don't know", '{"Atlantis": [{"name": "Sunken Temple", "description": "Wet"}]}']
+
+    class _FlakyLLM(object):
+        def __init__(self, max_tokens=None):
+            pass
+
+        def send(self, prompt):
+            return {"content": _responses.pop(0)}
+
+    _cache = AttractionCache(LLMAttractionLoader(_FlakyLLM), path=str(tmp_path / "attractions.json"))
+    monkeypatch.setattr(attractions, "attraction_cache", _cache)
+    _wrapper = FakeWrapper(attractions.get_attractions_for_location)
+    assert asyncio.run(aexecute(_wrapper, '{"location": "Atlantis"}')) == "[]"
+    # the empty result of the failed load is not memoized, so the next call loads again
+    assert "Sunken Temple" in asyncio.run(aexecute(_wrapper, '{"location": "Atlantis"}'))
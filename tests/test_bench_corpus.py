@@ -0,0 +1,20 @@
+from benchmarks.corpus import generate_corpus, load_corpus_module
+from benchmarks.embeddings import HashingEmbeddingFunction
+from infinite_fn.vector_index import NumpyCollection
+
+
+def test_corpus_module_is_importable(tmp_path):
+    corpus = generate_corpus(50)
+    assert len({fn.name for fn in corpus}) == 50
+    assert generate_corpus(50) == corpus
+    module = load_corpus_module(corpus, str(tmp_path), "bench_corpus_test")
+    assert getattr(module, corpus[0].name)("Paris")["function"] == corpus[0].name
+
+
+def test_hashing_embeddings_retrieve_corpus_functions():
+    corpus = generate_corpus(200)
+    collection = NumpyCollection("bench", embedding_function=HashingEmbeddingFunction())
+    collection.upsert(ids=[fn.name for fn in corpus], documents=[fn.source for fn in corpus],
+                      metadatas=[{"name": fn.name} for fn in corpus])
+    _hits = sum(fn.name in collection.query(query_texts=[fn.query], n_results=10)["ids"][0] for fn in corpus)
+    assert _hits / len(corpus) > 0.3
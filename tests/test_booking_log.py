@@ -0,0 +1,55 @@
+import os
+
+from infinite_fn.local_apis.booking_log import BookingLog
+from infinite_fn.local_apis.booking_store import BookingStore
+
+
+def reopen(path, snapshot_every=1000):
+    store = BookingStore(indexes=("user_id",))
+    log = BookingLog(str(path), "lodging", fsync_interval=0.001, snapshot_every=snapshot_every)
+    store.attach_log(log)
+    return store, log
+
+
+def test_bookings_survive_restart(tmp_path):
+    store, log = reopen(tmp_path)
+    _first = store.add({"user_id": "USER1"})
+    _second = store.add({"user_id": "USER2"})
+    store.remove(_first)
+    log.close()
+
+    store, log = reopen(tmp_path)
+    assert _first not in store
+    assert store.find("user_id", "USER2") == [{"user_id": "USER2"}]
+    assert store.new_id() not in (_first, _second)
+    log.close()
+
+
+def test_snapshot_bounds_replay(tmp_path):
+    store, log = reopen(tmp_path, snapshot_every=10)
+    for i in range(25):
+        store.add({"user_id": f"USER{i}"})
+    store.remove("BOOKING3")
+    log.close()
+
+    store, log = reopen(tmp_path, snapshot_every=10)
+    _state, _events = log.recover()
+    assert len(_state["bookings"]) == 20
+    assert len(_events) == 6
+    assert len(store) == 24
+    assert "BOOKING3" not in store
+    assert store.new_id() == "BOOKING25"
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".log")]) <= 3
+    log.close()
+
+
+def test_torn_write_is_skipped(tmp_path):
+    store, log = reopen(tmp_path)
+    store.add({"user_id": "USER1"})
+    log.close()
+    with open(log._segment_file(log._segment), "a") as f:
+        f.write('{"op":"add","id":"BOOKING1","boo')
+
+    store, log = reopen(tmp_path)
+    assert len(store) == 1
+    log.close()
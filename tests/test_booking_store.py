@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from infinite_fn.local_apis.booking_store import BookingStore
+from infinite_fn.python_fns import lodging
+
+
+def test_secondary_index():
+    store = BookingStore(indexes=("user_id",))
+    _a = store.add({"user_id": "USER1"})
+    _b = store.add({"user_id": "USER2"})
+    _c = store.add({"user_id": "USER1"})
+    assert [b["user_id"] for b in store.find("user_id", "USER1")] == ["USER1", "USER1"]
+    assert store.first("user_id", "USER2") is store[_b]
+    assert store.remove(_a) is not None
+    assert store.find("user_id", "USER1") == [store[_c]]
+    assert store.remove(_a) is None
+    assert store.find("user_id", "USER3") == []
+    assert store.first("user_id", "USER3") is None
+
+
+def test_ids_are_not_reused():
+    store = BookingStore(id_prefix="BOOKING")
+    _ids = [store.add({}) for _ in range(3)]
+    store.remove(_ids[-1])
+    assert store.new_id() not in _ids
+    store.add({}, "BOOKING10")
+    assert store.new_id() == "BOOKING11"
+
+
+def test_concurrent_bookings_get_unique_ids():
+    store = BookingStore(indexes=("user_id",))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        _ids = list(executor.map(lambda i: store.add({"user_id": f"USER{i % 4}"}), range(1000)))
+    assert len(set(_ids)) == 1000
+    assert len(store) == 1000
+    assert len(store.find("user_id", "USER0")) == 250
+
+
+def test_lodging_booking_lifecycle():
+    lodging.bookings.clear()
+    _first = lodging.book_lodging("LODGE0", "USER123", "2023-07-01", "2023-07-07")
+    _second = lodging.book_lodging("LODGE1", "USER123", "2023-08-01", "2023-08-07")
+    assert lodging.cancel_booking(_first["id"])
+    assert not lodging.cancel_booking(_first["id"])
+    _third = lodging.book_lodging("LODGE2", "USER123", "2023-09-01", "2023-09-07")
+    assert _third["id"] != _second["id"]
+    assert lodging.get_user_bookings("USER123") == [_second, _third]
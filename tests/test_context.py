@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from infinite_fn.context import SUMMARY_PREFIX, ContextManager, compact_result, count_message_tokens, \
+    split_conversation
+from infinite_fn.schema_compiler import count_tokens
+from infinite_fn.sessions import Session
+from tests.test_sessions import FakeLLM
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.prompts = []
+
+    def add_conversation_message(self, message):
+        pass
+
+    def get_usage(self):
+        return {}
+
+    async def asend(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0)
+        return {"role": "assistant", "content": "The user planned a trip."}
+
+
+def _turn(idx, size=50):
+    return [{"role": "user", "content": f"question {idx}"},
+            {"role": "function", "name": "lookup", "content": " ".join(["word"] * size)},
+            {"role": "assistant", "content": f"answer {idx}"}]
+
+
+def test_compact_result():
+    _records = [{"location": "London", "day": i, "temperature": float(i)} for i in range(100)]
+    _compact = compact_result(_records, max_tokens=80)
+    assert count_tokens(_compact) <= 80
+    assert _compact.splitlines()[:2] == ["location: London", "day|temperature"]
+    assert "over all 100 rows: day min 0 mean 49.5 max 99, temperature min 0 mean 49.5 max 99" in _compact
+    assert compact_result(_records[:2]) == "location: London\nday|temperature\n0|0\n1|1"
+    assert compact_result({"a": 1, "b": [1, 2]}) == '{"a":1,"b":[1,2]}'
+    assert compact_result(" ".join(["word"] * 100), max_tokens=10).endswith("... (truncated)")
+
+
+def test_compact_result_as_json_keeps_whole_records():
+    _records = [{"id": i, "name": f"Hotel {i}", "price": 100 + i, "amenities": ["wifi", "pool"]} for i in range(50)]
+    assert json.loads(compact_result(_records[:3], as_json=True)) == _records[:3]
+    _compact = compact_result(_records, max_tokens=200, as_json=True)
+    assert count_tokens(_compact) <= 200
+    _json, _note = _compact.split("\n")
+    _kept = json.loads(_json)
+    assert 0 < len(_kept) < 50 and _kept == _records[:len(_kept)]
+    assert _note == f"(50 items, only the first {len(_kept)} are shown)"
+
+
+def test_fit_bounds_the_conversation():
+    session = Session("s", FakeLLM(), max_messages=1000)
+    _store = session.llm_interface.conversation_store
+    _context = ContextManager(budget=200)
+    for idx in range(20):
+        _store.conversation.extend(_turn(idx))
+        _context.fit(session)
+        assert count_message_tokens(_store.conversation) <= 200
+    _system, _summary, _turns = split_conversation(_store.conversation)
+    assert _system[0]["content"] == "system prompt" and _summary is None
+    assert _turns[-1][0]["content"] == "question 19" and 1 < len(_turns) < 20
+
+
+def test_old_turns_are_summarized_in_the_background():
+    session = Session("s", FakeLLM(), max_messages=1000)
+    _store = session.llm_interface.conversation_store
+    _summarizer = FakeSummarizer()
+    _updates = []
+    _context = ContextManager(summarizer_factory=lambda: _summarizer, budget=200, keep_turns=1,
+                              on_update=_updates.append)
+
+    async def _run():
+        for idx in range(3):
+            _store.conversation.extend(_turn(idx))
+        _task = _context.schedule(session)
+        assert _context.schedule(session) is _task
+        await asyncio.sleep(0)
+        # a turn that is added while the summary is written is kept
+        _store.conversation.extend(_turn(3))
+        await _task
+
+    asyncio.run(_run())
+    assert "question 0" in _summarizer.prompts[0] and "question 2" not in _summarizer.prompts[0]
+    assert _store.conversation[1] == {"role": "system", "content": f"{SUMMARY_PREFIX}The user planned a trip."}
+    assert [t[0]["content"] for t in split_conversation(_store.conversation)[2]] == ["question 2", "question 3"]
+    assert _updates == [session]
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+import time
+
+from infinite_fn.executor import aexecute_tool_calls
+from infinite_fn.tool_registry import tool
+
+
+class FakeWrapper:
+    def __init__(self, func):
+        self.name = func.__name__
+        self.func = func
+
+
+@tool
+def slow_echo(text: str, delay: float = 0.0) -> str:
+    time.sleep(delay)
+    return text
+
+
+@tool
+def failing_lookup(location: str) -> str:
+    raise ValueError(f"unknown location {location}")
+
+
+_booked = threading.Event()
+
+
+@tool(side_effect=True, timeout=0.05)
+def slow_booking(location: str) -> str:
+    time.sleep(0.2)
+    _booked.set()
+    return f"Booked {location}"
+
+
+@tool(pure=True, json_result=True)
+def list_hotels(count: int) -> list:
+    return [{"id": i, "name": f"Hotel {i}", "price": 100 + i, "amenities": ["wifi", "pool"]} for i in range(count)]
+
+
+def _call(idx, name, **arguments):
+    return {"id": f"call_{idx}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def _execute(tool_calls, timeout=5.0):
+    _wrappers = {f.__name__: FakeWrapper(f) for f in (slow_echo, failing_lookup, slow_booking, list_hotels)}
+    return asyncio.run(aexecute_tool_calls(_wrappers, tool_calls, timeout=timeout))
+
+
+def test_results_are_in_call_order():
+    _responses = _execute([_call(0, "slow_echo", text="first", delay=0.1), _call(1, "slow_echo", text="second")])
+    assert [(r["tool_call_id"], r["content"]) for r in _responses] == [("call_0", "first"), ("call_1", "second")]
+    assert all(r["role"] == "tool" and r["name"] == "slow_echo" for r in _responses)
+
+
+def test_unknown_tool_and_exception_are_reported():
+    _unknown, _failed, _ok = _execute([_call(0, "book_moon_trip"), _call(1, "failing_lookup", location="Atlantis"),
+                                       _call(2, "slow_echo", text="ok")])
+    assert _unknown["content"] == "Error: ValueError('Unknown function: book_moon_trip')"
+    assert _failed["content"] == "Error: ValueError('unknown location Atlantis')"
+    assert _ok["content"] == "ok"
+
+
+def test_timeouts():
+    _timed_out, = _execute([_call(0, "slow_echo", text="late", delay=0.3)], timeout=0.05)
+    assert _timed_out["content"] == "Error: slow_echo did not complete within 0.05 seconds"
+    # a side-effecting tool keeps running, so the LLM must not retry it
+    _still_running, = _execute([_call(0, "slow_booking", location="Paris")])
+    assert not _still_running["content"].startswith("Error")
+    assert "still running" in _still_running["content"]
+    assert "Do not call slow_booking again" in _still_running["content"]
+    assert _booked.wait(timeout=5.0)
+
+
+def test_json_results_stay_json():
+    _hotels, = _execute([_call(0, "list_hotels", count=10)])
+    assert json.loads(_hotels["content"]) == list_hotels(10)
@@ -0,0 +1,41 @@
+import importlib.util
+
+from infinite_fn.index_manifest import IndexManifest, function_content_hash, function_identifier
+from infinite_fn.python_fns.trip import book_trip, cancel_trip
+
+
+def load_module(path, source):
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location("manifest_test_module", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_content_hash_is_stable():
+    assert function_content_hash(book_trip) == function_content_hash(book_trip)
+    assert function_content_hash(book_trip) != function_content_hash(cancel_trip)
+
+
+def test_content_hash_changes_with_source(tmp_path):
+    _v1 = load_module(tmp_path / "v1.py", 'def fn(a: int):\n    """Doc"""\n    return a\n')
+    _v2 = load_module(tmp_path / "v2.py", 'def fn(a: int):\n    """Doc"""\n    return a + 1\n')
+    _v3 = load_module(tmp_path / "v3.py", 'def fn(a: int):\n    """Other doc"""\n    return a\n')
+    assert function_content_hash(_v1.fn) != function_content_hash(_v2.fn)
+    assert function_content_hash(_v1.fn) != function_content_hash(_v3.fn)
+
+
+def test_manifest_roundtrip(tmp_path):
+    _path = str(tmp_path / "manifest.json")
+    manifest = IndexManifest(_path)
+    assert not manifest.is_current(book_trip)
+    manifest.update(book_trip, index_id="abc")
+    manifest.save()
+
+    manifest = IndexManifest(_path)
+    assert manifest.is_current(book_trip)
+    assert manifest.get(function_identifier(book_trip))["index_id"] == "abc"
+    assert manifest.identifiers("infinite_fn.python_fns.trip") == [function_identifier(book_trip)]
+    assert manifest.identifiers("infinite_fn.python_fns.weather") == []
+    assert manifest.remove(function_identifier(book_trip))["index_id"] == "abc"
+    assert manifest.get(function_identifier(book_trip)) is None
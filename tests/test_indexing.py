@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("func_ai")
+pytest.importorskip("openai")
+
+from func_ai.function_indexer import FunctionIndexer  # noqa: E402
+
+from benchmarks.corpus import generate_corpus, load_corpus_module  # noqa: E402
+from benchmarks.embeddings import HashingEmbeddingFunction  # noqa: E402
+from benchmarks.fake_llm import FakeLLMInterface  # noqa: E402
+from infinite_fn.index_manifest import IndexManifest  # noqa: E402
+from infinite_fn.indexing import index_modules  # noqa: E402
+from infinite_fn.vector_index import NumpyClient  # noqa: E402
+
+
+def _summary(func):
+    return f"Summary of {func.__name__}"
+
+
+def _index(tmp_path, name, module, **kwargs):
+    _fi = FunctionIndexer(llm_interface=FakeLLMInterface(), chroma_client=NumpyClient(str(tmp_path / name)),
+                          embedding_function=HashingEmbeddingFunction())
+    _manifest = IndexManifest(str(tmp_path / f"{name}.json"))
+    index_modules([module.__name__], _fi, manifest=_manifest, **kwargs)
+    _contents = _fi._collection.get(include=["documents", "metadatas", "embeddings"])
+    # the entries as saved to disk
+    _saved = IndexManifest(_manifest.path)
+    return _fi, dict(zip(_contents["ids"], _contents["documents"])), {i: _saved.get(i) for i in _saved.identifiers()}
+
+
+def test_parallel_indexing_matches_sequential_indexing(tmp_path):
+    module = load_corpus_module(generate_corpus(30), str(tmp_path / "modules"), "bench_corpus_indexing")
+    _, _parallel, _parallel_manifest = _index(tmp_path, "parallel", module, summarizer=_summary, max_workers=8,
+                                              batch_size=4)
+    _, _sequential, _sequential_manifest = _index(tmp_path, "sequential", module, summarizer=_summary,
+                                                  max_workers=1, batch_size=1000)
+    assert len(_parallel) == 30 and _parallel == _sequential
+    assert _parallel_manifest == _sequential_manifest
+    assert sorted(e["index_id"] for e in _parallel_manifest.values()) == sorted(_parallel)
+
+
+def test_failed_summary_does_not_lose_other_functions(tmp_path):
+    corpus = generate_corpus(10)
+    module = load_corpus_module(corpus, str(tmp_path / "modules"), "bench_corpus_failed_summary")
+
+    def _summarize(func):
+        if func.__name__ == corpus[3].name:
+            raise RuntimeError("rate limited")
+        return _summary(func)
+
+    _fi, _documents, _manifest = _index(tmp_path, "index", module, summarizer=_summarize)
+    assert len(_documents) == len(_manifest) == 10
+    _wrappers = {w.name: w for w in _fi._functions.values()}
+    assert _documents[_wrappers[corpus[0].name].hash] == f"Summary of {corpus[0].name}"
+    assert _documents[_wrappers[corpus[3].name].hash] == _wrappers[corpus[3].name].description
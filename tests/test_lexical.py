@@ -0,0 +1,23 @@
+from infinite_fn.lexical import BM25Index, function_document, tokenize
+from infinite_fn.python_fns import lodging, trip, weather
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("get booking_uuid for the UV index") == ["get", "booking_uuid", "booking", "uuid", "uv", "index"]
+
+
+def test_function_document_contains_name_parameters_and_docstring():
+    _doc = function_document(trip.cancel_trip)
+    assert _doc.startswith("cancel_trip booking_id")
+    assert "Cancel a trip by booking ID." in _doc
+
+
+def test_bm25_ranks_specific_terms_first():
+    _functions = [weather.uv_index, weather.humidity, weather.feels_like_temperature, lodging.cancel_booking,
+                  lodging.get_lodging_by_id, trip.cancel_trip]
+    index = BM25Index({f.__name__: function_document(f) for f in _functions})
+    assert index.search("what is the UV index in Sofia", max_results=1)[0][0] == "uv_index"
+    assert index.search("what does it feel like in Sofia", max_results=1)[0][0] == "feels_like_temperature"
+    assert index.search("lodging LODGE3", max_results=1)[0][0] == "get_lodging_by_id"
+    assert index.search("cancel my trip", max_results=1)[0][0] == "cancel_trip"
+    assert index.scores("zebra") == {}
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+openai = pytest.importorskip("openai")
+pytest.importorskip("func_ai")
+pytest.importorskip("aiohttp")
+
+from infinite_fn import llm  # noqa: E402
+from infinite_fn.llm import INTERRUPTED_NOTE, AsyncOpenAIInterface  # noqa: E402
+
+
+class FakeCompletions:
+    def __init__(self, deltas=(), error=None):
+        self.deltas = deltas
+        self.error = error
+        self.requests = []
+
+    async def _stream(self):
+        for delta in self.deltas:
+            yield {"choices": [{"delta": {"content": delta}}]}
+        if self.error is not None:
+            raise self.error
+
+    async def acreate(self, stream=False, **params):
+        self.requests.append(params)
+        if stream:
+            return self._stream()
+        return {"choices": [{"message": {"role": "assistant", "content": "Sunny"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}}
+
+
+@pytest.fixture()
+def completions(monkeypatch):
+    _completions = FakeCompletions()
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", _completions.acreate)
+    monkeypatch.setattr(llm, "get_http_session", lambda: None)
+    return _completions
+
+
+def _stream(interface):
+    async def _collect():
+        return [delta async for delta in interface.astream()]
+
+    return asyncio.run(_collect())
+
+
+def test_asend_adds_the_response_and_usage(completions):
+    interface = AsyncOpenAIInterface()
+    _message = asyncio.run(interface.asend("Weather in Paris?", functions=[{"name": "current_weather"}]))
+    assert _message == {"role": "assistant", "content": "Sunny"}
+    assert [m["role"] for m in interface.conversation_store.get_conversation()] == ["user", "assistant"]
+    assert completions.requests[0]["function_call"] == "auto"
+    assert sum(u["prompt_tokens"] for u in interface.get_usage().values()) == 10
+
+
+def test_astream_adds_the_complete_answer(completions):
+    completions.deltas = ["It is", " sunny"]
+    interface = AsyncOpenAIInterface()
+    assert _stream(interface) == ["It is", " sunny"]
+    assert interface.conversation_store.get_last_message() == {"role": "assistant", "content": "It is sunny"}
+
+
+def test_astream_keeps_the_partial_answer_on_error(completions):
+    completions.deltas, completions.error = ["It is"], ConnectionResetError("reset")
+    interface = AsyncOpenAIInterface()
+    with pytest.raises(ConnectionResetError):
+        _stream(interface)
+    assert interface.conversation_store.get_last_message() == {"role": "assistant",
+                                                               "content": f"It is {INTERRUPTED_NOTE}"}
@@ -0,0 +1,30 @@
+from infinite_fn.local_apis.lodging_catalog import LodgingCatalog, generate_lodgings
+from infinite_fn.python_fns import lodging
+
+
+def test_lookup_returns_listed_record():
+    _listing = lodging.get_all_lodgings("Paris")
+    assert lodging.get_all_lodgings("Paris") == _listing
+    assert lodging.get_lodging_by_id("LODGE3", "Paris") == _listing[3]
+    assert lodging.get_lodging_by_id("LODGE3") == lodging.get_all_lodgings("London")[3]
+    assert lodging.get_lodging_by_id("LODGE42") is None
+
+
+def test_catalog_is_loaded_once_and_evicted_lru():
+    _loads = []
+
+    def loader(location):
+        _loads.append(location)
+        return generate_lodgings(location)
+
+    catalog = LodgingCatalog(loader=loader, max_locations=2)
+    catalog.lodgings("London")
+    catalog.get("London", "LODGE0")
+    catalog.lodgings("Paris")
+    catalog.lodgings("London")
+    catalog.lodgings("Rome")
+    assert _loads == ["London", "Paris", "Rome"]
+    assert "Paris" not in catalog
+    assert len(catalog) == 2
+    assert catalog.lodgings("Paris")[0].to_dict() == generate_lodgings("Paris")[0].to_dict()
+    assert catalog.table("Rome").records[0] == catalog.get("Rome", "LODGE0").to_dict()
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from infinite_fn.local_apis.lodging_table import LodgingTable, LodgingView
+from infinite_fn.python_fns import lodging
+
+
+def reference_filter(lodgings, min_price, max_price, min_rating, amenities):
+    return [l for l in lodgings if min_price <= l['price'] <= max_price and l['rating'] >= min_rating
+            and all(a in l['amenities'] for a in amenities)]
+
+
+def test_wrappers_match_list_semantics():
+    random.seed(7)
+    _lodgings = [l for location in ("London", "Paris", "Rome") for l in lodging.get_all_lodgings(location)]
+    _filtered = lodging.filter_lodgings_by_price(_lodgings, 80.0, 180.0)
+    _filtered = lodging.filter_lodgings_by_rating(_filtered, 2.5)
+    _filtered = lodging.filter_lodgings_by_amenities(_filtered, ['Free WiFi'])
+    assert isinstance(_filtered, LodgingView)
+    assert _filtered == reference_filter(_lodgings, 80.0, 180.0, 2.5, ['Free WiFi'])
+    assert lodging.sort_lodgings_by_price(_filtered) == sorted(_filtered, key=lambda l: l['price'])
+    assert lodging.sort_lodgings_by_rating(_lodgings) == sorted(_lodgings, key=lambda l: l['rating'], reverse=True)
+    assert lodging.filter_lodgings_by_amenities(_lodgings, ['Sauna']) == []
+
+
+def test_query_composes_filters_sort_and_limit():
+    table = LodgingTable([
+        {'id': 'A', 'price': 100.0, 'rating': 4.0, 'amenities': ['Pool', 'Gym']},
+        {'id': 'B', 'price': 60.0, 'rating': 3.0, 'amenities': ['Gym']},
+        {'id': 'C', 'price': 150.0, 'rating': 4.5, 'amenities': ['Gym', 'Parking']},
+        {'id': 'D', 'price': 90.0, 'rating': 4.5, 'amenities': []},
+    ])
+    _rows = table.query(max_price=140.0, min_rating=3.0, amenities=['Gym'], sort_by='price', ascending=False)
+    assert [table.records[i]['id'] for i in _rows] == ['A', 'B']
+    _rows = table.query(sort_by='rating', ascending=False, limit=2)
+    assert [table.records[i]['id'] for i in _rows] == ['C', 'D']
+    assert len(table.query(amenities=['Gym', 'Spa'])) == 0
+    assert len(table.query(limit=0)) == 0
+    with pytest.raises(ValueError):
+        table.query(sort_by='price', limit=-1)
+
+
+def test_search_lodgings():
+    _results = lodging.search_lodgings("London", min_rating=2.0, sort_by='price', limit=3)
+    assert len(_results) <= 3
+    assert all(l['rating'] >= 2.0 and l['location'] == "London" for l in _results)
+    assert [l['price'] for l in _results] == sorted(l['price'] for l in _results)
+
+
+def test_missing_columns_are_nan():
+    _lodgings = [{'id': 'A', 'amenities': ['Gym']}, {'id': 'B', 'price': 80.0, 'rating': None, 'amenities': []},
+                 {'id': 'C', 'price': 60.0, 'rating': 4.0}]
+    assert lodging.filter_lodgings_by_amenities(_lodgings, ['Gym']) == [_lodgings[0]]
+    assert lodging.filter_lodgings_by_price(_lodgings, 0.0, 100.0) == _lodgings[1:]
+    assert lodging.filter_lodgings_by_rating(_lodgings, 3.0) == [_lodgings[2]]
+    assert [l['id'] for l in lodging.sort_lodgings_by_price(_lodgings)] == ['C', 'B', 'A']
+    assert [l['id'] for l in lodging.sort_lodgings_by_price(_lodgings, ascending=False)] == ['B', 'C', 'A']
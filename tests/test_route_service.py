@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+
+from infinite_fn.local_apis.route_service import RouteService, cheapest_route, generate_route
+from infinite_fn.python_fns import trip
+
+
+def test_routes_are_symmetric_and_memoized():
+    _loads = []
+
+    def loader(location1, location2):
+        _loads.append((location1, location2))
+        return generate_route(location1, location2)
+
+    service = RouteService(loader=loader)
+    assert service.route("Paris", "London") is service.route("London", "Paris")
+    _matrix = service.matrix(["London", "Paris", "Rome"])
+    assert (_matrix.distances == _matrix.distances.T).all()
+    assert _matrix.distances[0, 1] == generate_route("Paris", "London").distance
+    assert len(_loads) == len(service) == 3
+
+
+def test_cheapest_route_is_optimal():
+    _costs = np.random.default_rng(0).integers(1, 100, size=(7, 7)).astype(float)
+    for return_to_start in (False, True):
+        _best = min(sum(_costs[i, j] for i, j in zip(p, p[1:]))
+                    for p in ((0,) + q + ((0,) if return_to_start else ()) for q in itertools.permutations(range(1, 7))))
+        _order, _total = cheapest_route(_costs, return_to_start)
+        assert _total == _best
+        assert sum(_costs[i, j] for i, j in zip(_order, _order[1:])) == _best
+        assert sorted(set(_order)) == list(range(7)) and _order[0] == 0
+
+
+def test_itinerary_tool():
+    _itinerary = trip.cheapest_itinerary(["London", "Paris", "Rome", "Berlin"])
+    assert [leg["from"] for leg in _itinerary["legs"]][0] == "London"
+    assert _itinerary["total_cost"] == sum(leg["cost"] for leg in _itinerary["legs"])
+    assert trip.distance_between_two_locations("Rome", "Berlin") == trip.distance_between_two_locations("Berlin", "Rome")
+
+
+def test_cost_of_unavailable_transportation_type():
+    _route = trip.routes.route("London", "Paris")
+    _unavailable = next(m for m in ("car", "bus", "train", "plane") if m not in _route.modes)
+    _answer = trip.cost_of_transportation_between_two_locations("London", "Paris", _unavailable)
+    assert _answer.startswith(f"{_unavailable} is not available between London and Paris")
+    _mode = _route.modes[0]
+    assert trip.cost_of_transportation_between_two_locations("London", "Paris", _mode) == f"{_route.costs[_mode]} $"
+    assert trip.cost_of_transportation_between_two_locations("London", "Paris", "boat").startswith("Unknown")
@@ -0,0 +1,90 @@
+import asyncio
+from collections import namedtuple
+
+import pytest
+
+from infinite_fn.routing import merge_results, route
+
+Result = namedtuple("Result", ["name", "wrapper", "function", "distance"])
+
+
+class FakeLLM:
+    def __init__(self):
+        self.conversation = []
+
+    def get_usage(self):
+        return {}
+
+    def add_conversation_message(self, message):
+        self.conversation.append(message)
+
+    async def asend(self, prompt):
+        self.add_conversation_message({"role": "user", "content": prompt})
+        await asyncio.sleep(0)
+        self.add_conversation_message({"role": "assistant", "content": f"The user wants {prompt}"})
+        return self.conversation[-1]
+
+
+class FakeIndex:
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def find_functions(self, query, max_results=2, query_embedding=None):
+        self.queries.append((query, query_embedding))
+        return self.results.get(query, [])[:max_results]
+
+
+def test_merge_results_keeps_the_best_distance():
+    _merged = merge_results([Result("a", None, None, 0.4), Result("b", None, None, 0.2)],
+                            [Result("a", None, None, 0.1), Result("c", None, None, 0.3)], max_results=2)
+    assert [(r.name, r.distance) for r in _merged] == [("a", 0.1), ("b", 0.2)]
+
+
+def test_route_modes():
+    _index = FakeIndex({"weather": [Result("current_weather", None, None, 0.4)],
+                        "The user wants weather": [Result("forecast_weather", None, None, 0.1)]})
+
+    def _route(mode, **kwargs):
+        _llm = FakeLLM()
+        return _llm, asyncio.run(route(_llm, _index, "weather", mode=mode, **kwargs))
+
+    _llm, _result = _route("reflect")
+    assert _result.reflection == "The user wants weather" and _result.candidates[0].name == "forecast_weather"
+    assert [m["role"] for m in _llm.conversation] == ["user", "assistant"]
+
+    _llm, _result = _route("direct", query_embedding=[1.0])
+    assert _result.reflection is None and _result.candidates[0].name == "current_weather"
+    assert _llm.conversation == [{"role": "user", "content": "weather"}]
+    assert _index.queries[-1] == ("weather", [1.0])
+
+    _, _result = _route("fallback", fallback_distance=0.5)
+    assert _result.reflection is None
+    _, _result = _route("fallback", fallback_distance=0.25)
+    assert [r.name for r in _result.candidates] == ["forecast_weather", "current_weather"]
+
+    _, _result = _route("parallel")
+    assert _result.reflection is not None and len(_result.candidates) == 2
+    with pytest.raises(ValueError):
+        _route("unknown")
+
+
+def test_route_with_cached_candidates_reflects_without_searching():
+    _index = FakeIndex({})
+    _llm = FakeLLM()
+    _cached = [Result("current_weather", None, None, 0.1)]
+    _result = asyncio.run(route(_llm, _index, "weather", mode="reflect", candidates=_cached))
+    assert _result.candidates == _cached and _result.reflection == "The user wants weather"
+    assert _index.queries == []
+
+
+def test_route_replays_a_cached_reflection():
+    _index = FakeIndex({})
+    _llm = FakeLLM()
+    _cached = [Result("current_weather", None, None, 0.1)]
+    _result = asyncio.run(route(_llm, _index, "weather", mode="reflect", candidates=_cached,
+                                reflection="The user wants the weather"))
+    assert _result.candidates == _cached and _result.reflection == "The user wants the weather"
+    assert _llm.conversation == [{"role": "user", "content": "weather"},
+                                 {"role": "assistant", "content": "The user wants the weather"}]
+    assert _index.queries == []
@@ -0,0 +1,53 @@
+import functools
+import inspect
+
+from infinite_fn.python_fns import lodging, trip
+from infinite_fn.schema_compiler import SchemaCompiler, compile_schema, infer_enum, parse_docstring, schema_report, \
+    trim
+
+
+def _functions(module):
+    return [f for _, f in inspect.getmembers(module, inspect.isfunction) if f.__module__ == module.__name__]
+
+
+def test_parse_docstring_and_enums():
+    _description, _params, _returns = parse_docstring("""
+    Does something.
+
+    :param mode: The mode,
+        either "fast" or "slow".
+    :return: A long explanation
+        of the result
+    """)
+    assert _description == "Does something."
+    assert _params == {"mode": "The mode, either \"fast\" or \"slow\"."}
+    assert _returns == "A long explanation of the result"
+    assert infer_enum(_params["mode"]) == (["fast", "slow"], "The mode.")
+    assert trim("One two three. Four five six. E.g. \"x\".", 12) == "One two three. E.g. \"x\"."
+
+
+def test_compact_schema():
+    _compiler = SchemaCompiler()
+    _compiler.compile_functions(_functions(trip))
+    _schema = _compiler.schema(trip.cost_of_transportation_between_two_locations)
+    _properties = _schema["parameters"]["properties"]
+    assert _properties["transportation_type"]["enum"] == ["car", "bus", "train", "plane"]
+    assert _schema["parameters"]["required"] == ["location1", "location2", "transportation_type"]
+    assert "description" not in _properties["location2"] or "second" in _properties["location2"]["description"]
+
+    _schema = compile_schema(functools.partial(lodging.search_lodgings, "London"))
+    _properties = _schema["parameters"]["properties"]
+    assert "location" not in _properties and "required" not in _schema["parameters"]
+    assert _properties["min_price"]["type"] == "number" and _properties["limit"]["type"] == "integer"
+    assert _properties["sort_by"]["enum"] == ["price", "rating"]
+
+
+def test_schema_report():
+    def original(func):
+        return {"name": func.__name__, "description": inspect.getdoc(func), "parameters": {}}
+
+    _report = schema_report(_functions(lodging), original, SchemaCompiler())
+    assert {r["name"] for r in _report} == {f.__name__ for f in _functions(lodging)}
+    assert all(r["compact_tokens"] > 0 for r in _report)
+    assert all(r["saved_percent"] == 100.0 * (r["original_tokens"] - r["compact_tokens"]) / r["original_tokens"]
+               for r in _report)
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("func_ai")
+pytest.importorskip("openai")
+
+from func_ai.function_indexer import FunctionIndexer  # noqa: E402
+
+from benchmarks.embeddings import HashingEmbeddingFunction  # noqa: E402
+from benchmarks.fake_llm import FakeLLMInterface  # noqa: E402
+from infinite_fn.index_manifest import IndexManifest  # noqa: E402
+from infinite_fn.indexing import index_modules  # noqa: E402
+from infinite_fn.search import HybridFunctionSearch  # noqa: E402
+from infinite_fn.vector_index import NumpyClient  # noqa: E402
+
+
+@pytest.fixture()
+def search(tmp_path):
+    _fi = FunctionIndexer(llm_interface=FakeLLMInterface(), chroma_client=NumpyClient(str(tmp_path / "index")),
+                          embedding_function=HashingEmbeddingFunction())
+    index_modules(["infinite_fn.python_fns.weather", "infinite_fn.python_fns.trip"], _fi,
+                  manifest=IndexManifest(str(tmp_path / "manifest.json")), enhanced_summary=False)
+    return HybridFunctionSearch(_fi)
+
+
+def test_results_keep_the_cosine_distance(search):
+    _query = "How strong is the UV index in Madrid today?"
+    _res = search.function_indexer._collection.query(query_texts=[_query], n_results=search.candidates)
+    _cosine = {m["name"]: d for m, d in zip(_res["metadatas"][0], _res["distances"][0])}
+    _results = search.find_functions(_query, max_results=5)
+    assert _results[0].name == "uv_index"
+    for result in _results:
+        assert result.distance == pytest.approx(_cosine.get(result.name, 1.0))
+
+
+def test_weak_lexical_matches_get_a_low_score(search):
+    assert search.lexical_score(0.0) == 0.0
+    assert search.lexical_score(0.3) < 0.1 < 0.5 == search.lexical_score(search.bm25_half_score)
@@ -0,0 +1,54 @@
+from infinite_fn.semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_similar_queries_hit():
+    cache = SemanticCache(threshold=0.95)
+    cache.put([1.0, 0.0, 0.0], "weather")
+    assert cache.get([0.99, 0.05, 0.0]) == "weather"
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = SemanticCache(ttl=10, clock=clock)
+    cache.put([1.0, 0.0], "value")
+    clock.now = 9
+    assert cache.get([1.0, 0.0]) == "value"
+    clock.now = 10
+    assert cache.get([1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    clock = FakeClock()
+    cache = SemanticCache(max_entries=2, clock=clock)
+    cache.put([1.0, 0.0, 0.0], "a")
+    clock.now = 1
+    cache.put([0.0, 1.0, 0.0], "b")
+    clock.now = 2
+    assert cache.get([1.0, 0.0, 0.0]) == "a"
+    clock.now = 3
+    cache.put([0.0, 0.0, 1.0], "c")
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get([1.0, 0.0, 0.0]) == "a"
+    assert cache.get([0.0, 0.0, 1.0]) == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_scoped_by_context():
+    cache = SemanticCache(threshold=0.95)
+    cache.put([1.0, 0.0], "a", context="conversation a")
+    assert cache.get([1.0, 0.0], context="conversation b") is None
+    assert cache.get([1.0, 0.0]) is None
+    assert cache.get([1.0, 0.0], context="conversation a") == "a"
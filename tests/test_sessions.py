@@ -0,0 +1,77 @@
+from infinite_fn.sessions import SessionStore
+
+
+class FakeConversationStore:
+    def __init__(self):
+        self.conversation = [{"role": "system", "content": "system prompt"}]
+
+
+class FakeLLM:
+    def __init__(self):
+        self.conversation_store = FakeConversationStore()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sessions_are_isolated():
+    store = SessionStore(llm_factory=FakeLLM)
+    _a = store.get("a")
+    _b = store.get("b")
+    assert _a is not _b
+    assert _a.llm_interface is not _b.llm_interface
+    assert store.get("a") is _a
+
+
+def test_lru_eviction():
+    store = SessionStore(llm_factory=FakeLLM, max_sessions=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+    assert len(store) == 2
+    assert "a" in store and "c" in store
+    assert "b" not in store
+
+
+def test_ttl_eviction():
+    clock = FakeClock()
+    store = SessionStore(llm_factory=FakeLLM, ttl=10, clock=clock)
+    _a = store.get("a")
+    clock.now = 5
+    store.get("b")
+    clock.now = 12
+    store.get("b")
+    assert "a" not in store
+    assert "b" in store
+    assert store.get("a") is not _a
+
+
+def test_trim_keeps_system_prompt_and_turn_boundaries():
+    store = SessionStore(llm_factory=FakeLLM, max_messages=4)
+    session = store.get("a")
+    _conversation = session.llm_interface.conversation_store.conversation
+    for turn in range(3):
+        _conversation.extend([{"role": "user", "content": f"q{turn}"},
+                              {"role": "assistant", "content": None, "function_call": {}},
+                              {"role": "function", "content": f"r{turn}"}])
+    session.trim()
+    _conversation = session.llm_interface.conversation_store.conversation
+    assert _conversation[0]["role"] == "system"
+    assert [m["content"] for m in _conversation[1:]] == ["q2", None, "r2"]
+
+
+def test_trim_keeps_a_turn_longer_than_the_limit():
+    session = SessionStore(llm_factory=FakeLLM, max_messages=2).get("a")
+    _conversation = session.llm_interface.conversation_store.conversation
+    _conversation.extend([{"role": "user", "content": "q0"}, {"role": "assistant", "content": "a0"},
+                          {"role": "user", "content": "q1"}, {"role": "assistant", "content": None},
+                          {"role": "function", "content": "r1"}, {"role": "assistant", "content": "a1"}])
+    session.trim()
+    assert [m["content"] for m in session.llm_interface.conversation_store.conversation] == \
+           ["system prompt", "q1", None, "r1", "a1"]
@@ -0,0 +1,90 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from infinite_fn.local_apis.booking_store import SqliteBookingStore
+from infinite_fn.local_apis.state_db import StateDB
+from infinite_fn.sessions import SessionConflictError, SqliteSessionStore
+from infinite_fn.vector_index import NumpyClient
+from tests.test_sessions import FakeClock, FakeLLM
+
+
+def _book(path: str, count: int) -> list[str]:
+    _store = SqliteBookingStore("lodgings", indexes=("user_id",), db=StateDB(path))
+    return [_store.add({"user_id": "USER1"}) for _ in range(count)]
+
+
+def test_bookings_are_shared_between_processes(tmp_path):
+    _path = str(tmp_path / "state.db")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        _ids = [i for ids in pool.starmap(_book, [(_path, 25)] * 4) for i in ids]
+    assert len(set(_ids)) == 100
+    store = SqliteBookingStore("lodgings", indexes=("user_id",), db=StateDB(_path))
+    assert len(store) == 100 and len(store.find("user_id", "USER1")) == 100
+
+
+def test_sqlite_booking_store(tmp_path):
+    _db = StateDB(str(tmp_path / "state.db"))
+    store = SqliteBookingStore("lodgings", indexes=("user_id",), db=_db)
+    store.add({"user_id": "a", "n": 1}, "BOOKING5")
+    assert store.new_id() == "BOOKING6"
+    store.add({"user_id": "b", "n": 2})
+    store.add({"user_id": "a", "n": 3})
+    assert [b["n"] for b in store.find("user_id", "a")] == [1, 3]
+    assert store.first("user_id", "b") == {"user_id": "b", "n": 2}
+    assert store.remove("BOOKING5") == {"user_id": "a", "n": 1} and store.remove("BOOKING5") is None
+    assert "BOOKING5" not in store and [i for i, _ in store.items()] == ["BOOKING7", "BOOKING8"]
+    with pytest.raises(KeyError):
+        _ = store["BOOKING5"]
+    # stores are namespaced
+    assert len(SqliteBookingStore("trips", db=_db)) == 0
+    store.clear()
+    assert len(store) == 0 and store.new_id() == "BOOKING9"
+
+
+def test_sessions_are_shared_between_stores(tmp_path):
+    _path = str(tmp_path / "state.db")
+    _clock = FakeClock()
+    first = SqliteSessionStore(FakeLLM, db=StateDB(_path), wall_clock=_clock)
+    second = SqliteSessionStore(FakeLLM, db=StateDB(_path), wall_clock=_clock)
+    _session = first.get("s")
+    _session.llm_interface.conversation_store.conversation.append({"role": "user", "content": "hi"})
+    first.save(_session)
+    assert second.get("s").llm_interface.conversation_store.conversation[-1]["content"] == "hi"
+    _other = second.get("s")
+    _other.llm_interface.conversation_store.conversation.append({"role": "assistant", "content": "hello"})
+    second.save(_other)
+    assert len(first.get("s").llm_interface.conversation_store.conversation) == 3
+    _clock.now = 10000.0
+    assert len(SqliteSessionStore(FakeLLM, db=StateDB(_path), wall_clock=_clock).get("s")
+               .llm_interface.conversation_store.conversation) == 1
+
+
+def test_concurrent_session_saves_do_not_overwrite_each_other(tmp_path):
+    _path = str(tmp_path / "state.db")
+    first = SqliteSessionStore(FakeLLM, db=StateDB(_path))
+    second = SqliteSessionStore(FakeLLM, db=StateDB(_path))
+    _first, _second = first.get("s"), second.get("s")
+    _first.llm_interface.conversation_store.conversation.append({"role": "user", "content": "first tab"})
+    _second.llm_interface.conversation_store.conversation.append({"role": "user", "content": "second tab"})
+    first.save(_first)
+    with pytest.raises(SessionConflictError):
+        second.save(_second)
+    # the losing session is reloaded with the saved conversation and can continue from it
+    assert _second.llm_interface.conversation_store.conversation[-1]["content"] == "first tab"
+    _second.llm_interface.conversation_store.conversation.append({"role": "assistant", "content": "hello"})
+    second.save(_second)
+    assert len(first.get("s").llm_interface.conversation_store.conversation) == 3
+
+
+def test_read_only_index_is_memory_mapped(tmp_path):
+    _path = str(tmp_path / "index")
+    NumpyClient(_path).get_or_create_collection("fns").upsert(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    collection = NumpyClient(_path, read_only=True).get_or_create_collection("fns")
+    assert isinstance(collection._embeddings, np.memmap)
+    assert collection.query(query_embeddings=[[0.1, 1.0]], n_results=1)["ids"] == [["b"]]
+    with pytest.raises(ValueError):
+        collection.upsert(ids=["c"], embeddings=[[1.0, 1.0]])
+    with pytest.raises(FileNotFoundError):
+        NumpyClient(str(tmp_path / "missing"), read_only=True).get_or_create_collection("fns")
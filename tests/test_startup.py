@@ -0,0 +1,28 @@
+import time
+
+from infinite_fn.startup import Readiness, start_in_background
+
+
+def test_readiness_flips_when_background_task_completes():
+    readiness = Readiness()
+    assert readiness.to_dict()["ready"] is False
+
+    def task():
+        readiness.set_stage("indexing")
+        time.sleep(0.05)
+        readiness.set_ready()
+
+    start_in_background(task, readiness)
+    assert readiness.wait(timeout=5)
+    assert readiness.to_dict()["stage"] == "ready" and readiness.error is None
+
+
+def test_failed_startup_is_reported():
+    readiness = Readiness()
+
+    def task():
+        raise RuntimeError("no index")
+
+    start_in_background(task, readiness).join()
+    assert not readiness.is_ready
+    assert readiness.to_dict()["stage"] == "failed" and "no index" in readiness.error
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+
+from infinite_fn.telemetry import Histogram, JsonlSink, Telemetry
+
+
+class FakeLLM(object):
+    def __init__(self):
+        self.usage = {}
+
+    def get_usage(self):
+        return self.usage
+
+
+def test_span_records_duration_tokens_and_errors(tmp_path):
+    _now = [0.0]
+    telemetry = Telemetry(clock=lambda: _now[0])
+    sink = JsonlSink(str(tmp_path / "spans.jsonl"))
+    telemetry.add_sink(sink)
+    llm = FakeLLM()
+    with telemetry.span("reflection", llm_interface=llm):
+        _now[0] += 0.3
+        llm.usage["gpt-3.5-turbo"] = {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150}
+    with pytest.raises(ValueError):
+        with telemetry.span("function_execution", function="current_weather"):
+            _now[0] += 0.02
+            raise ValueError("boom")
+    sink.close()
+
+    _spans = [json.loads(line) for line in open(tmp_path / "spans.jsonl")]
+    assert _spans[0]["duration"] == pytest.approx(0.3) and _spans[0]["prompt_tokens"] == 120
+    assert _spans[1]["function"] == "current_weather" and "boom" in _spans[1]["error"]
+    assert telemetry.summary()["reflection"]["count"] == 1
+    _metrics = telemetry.prometheus_text()
+    assert 'infinite_fn_stage_seconds_count{stage="function_execution",function="current_weather"} 1' in _metrics
+    assert 'infinite_fn_stage_tokens_total{stage="reflection",kind="completion"} 30' in _metrics
+    assert 'infinite_fn_stage_errors_total{stage="function_execution"} 1' in _metrics
+
+
+def test_cancelled_spans_are_not_errors():
+    _now = [0.0]
+    telemetry = Telemetry(clock=lambda: _now[0])
+    _spans = []
+    telemetry.add_sink(_spans.append)
+    for error in (GeneratorExit(), asyncio.CancelledError()):
+        with pytest.raises(type(error)):
+            with telemetry.span("turn"):
+                raise error
+    with telemetry.span("turn") as span:
+        _now[0] += 1.0
+        span.exclude(0.75)
+    assert [s.get("cancelled") for s in _spans] == [True, True, None]
+    assert all("error" not in s for s in _spans)
+    assert _spans[-1]["duration"] == pytest.approx(0.25)
+    assert "infinite_fn_stage_errors_total{" not in telemetry.prometheus_text()
+
+
+def test_counters_are_exported():
+    telemetry = Telemetry()
+    telemetry.increment("semantic_cache_lookups", "hit")
+    telemetry.increment("semantic_cache_lookups", "miss", amount=2)
+    assert telemetry.counters() == {"semantic_cache_lookups": {"hit": 1, "miss": 2}}
+    _metrics = telemetry.prometheus_text()
+    assert "# TYPE infinite_fn_semantic_cache_lookups_total counter" in _metrics
+    assert 'infinite_fn_semantic_cache_lookups_total{result="miss"} 2' in _metrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 0.2, 0.5, 1.0))
+    for value in [0.15] * 98 + [0.8] * 2:
+        histogram.observe(value)
+    assert 0.1 <= histogram.quantile(0.5) <= 0.2
+    assert 0.5 <= histogram.quantile(0.99) <= 1.0
+    assert histogram.count == 100 and histogram.sum == pytest.approx(16.3)
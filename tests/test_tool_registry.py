@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from infinite_fn import executor
+from infinite_fn.python_fns import lodging, trip
+from infinite_fn.tool_registry import ToolResultCache, module_tools, normalize_arguments, tool, tool_spec
+from tests.test_executor import FakeWrapper
+
+
+def test_registry_metadata():
+    _names = [f.__name__ for f in module_tools("infinite_fn.python_fns.trip")]
+    assert _names[0] == "distance_between_two_locations" and "book_trip" in _names
+    assert "routes" not in _names
+    assert tool_spec(trip.book_trip).side_effect and not tool_spec(trip.book_trip).cacheable
+    assert tool_spec(lodging.search_lodgings).pure
+    assert tool_spec(lodging.filter_lodgings_by_price).json_result and not tool_spec(lodging.book_lodging).json_result
+    assert not tool_spec(lodging.get_user_bookings).cacheable
+    with pytest.raises(ValueError):
+        tool(side_effect=True, ttl=10)(lambda: None)
+
+
+def test_result_cache():
+    _now = [0.0]
+    cache = ToolResultCache(max_entries=2, clock=lambda: _now[0])
+
+    @tool(ttl=10)
+    def lookup(location: str, days: int = 1) -> str:
+        return location
+
+    _key = cache.key(lookup, {"location": "London"})
+    assert _key == cache.key(lookup, {"days": 1, "location": "London"})
+    assert normalize_arguments(lookup, {"location": "London"}) == '{"days": 1, "location": "London"}'
+    assert cache.key(lookup, {"city": "London"}) is None
+    assert cache.key(trip.book_trip, {"location1": "a", "location2": "b", "transportation_type": "car", "cost": 1,
+                                      "date": "2023-07-01"}) is None
+    assert cache.get(_key) == (False, None)
+    cache.put(_key, lookup, "London")
+    assert cache.get(_key) == (True, "London")
+    _now[0] = 11.0
+    assert cache.get(_key) == (False, None)
+
+    for location in ("London", "Paris", "Rome"):
+        cache.put(cache.key(lookup, {"location": location}), lookup, location)
+    assert len(cache) == 2 and cache.get(cache.key(lookup, {"location": "London"}))[0] is False
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_executor_memoizes_cacheable_tools():
+    executor.tool_results.clear()
+    _calls = []
+
+    @tool(pure=True)
+    def lookup(location: str, days: int = 1) -> str:
+        _calls.append(location)
+        if location == "Atlantis":
+            raise ValueError("unknown location")
+        return f"{location} for {days} days"
+
+    @tool(side_effect=True)
+    def book(location: str) -> str:
+        _calls.append(location)
+        return f"Booked {location}"
+
+    def _execute(func, arguments):
+        return asyncio.run(executor.aexecute(FakeWrapper(func), arguments))
+
+    assert _execute(lookup, '{"location": "London"}') == "London for 1 days"
+    # a hit skips the execution, also when the arguments differ only in order or defaults
+    assert _execute(lookup, '{"days": 1, "location": "London"}') == "London for 1 days"
+    assert _calls == ["London"]
+    # side-effecting tools always run
+    assert _execute(book, '{"location": "Paris"}') == _execute(book, '{"location": "Paris"}') == "Booked Paris"
+    assert _calls == ["London", "Paris", "Paris"]
+    # failed calls are not cached
+    assert _execute(lookup, '{"location": "Atlantis"}').startswith("Error: ValueError")
+    assert _execute(lookup, '{"location": "Atlantis"}').startswith("Error: ValueError")
+    assert _calls.count("Atlantis") == 2
+    assert len(executor.tool_results) == 1
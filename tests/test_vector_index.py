@@ -0,0 +1,68 @@
+import numpy as np
+
+from infinite_fn.vector_index import NumpyClient, NumpyCollection
+
+
+def embed(texts):
+    _vocabulary = ["weather", "lodging", "trip", "booking"]
+    return [[float(word in text) for word in _vocabulary] for text in texts]
+
+
+def test_query_returns_nearest_documents():
+    collection = NumpyCollection("fns", embedding_function=embed)
+    collection.upsert(ids=["a", "b", "c"], documents=["weather", "lodging booking", "trip booking"],
+                      metadatas=[{"name": "a"}, {"name": "b"}, {"name": "c"}])
+    _res = collection.query(query_texts=["lodging"], n_results=2)
+    assert _res["ids"][0][0] == "b"
+    assert _res["metadatas"][0][0] == {"name": "b"}
+    assert abs(_res["distances"][0][0] - (1 - 1 / np.sqrt(2))) < 1e-6
+    assert collection.query(query_texts=["weather"], n_results=10)["ids"][0][0] == "a"
+
+
+def test_upsert_and_delete():
+    collection = NumpyCollection("fns", embedding_function=embed)
+    collection.upsert(ids=["a", "b"], documents=["weather", "trip"])
+    collection.upsert(ids=["a"], documents=["lodging"])
+    assert collection.count() == 2
+    assert collection.query(query_texts=["lodging"], n_results=1)["ids"][0] == ["a"]
+    collection.delete(ids=["a", "missing"])
+    assert collection.get()["ids"] == ["b"]
+    assert collection.get(ids=["a"])["ids"] == []
+    collection.delete(ids=["b"])
+    assert collection.query(query_texts=["trip"], n_results=1)["ids"] == [[]]
+
+
+def test_persisted_collection_is_memory_mapped(tmp_path):
+    client = NumpyClient(str(tmp_path))
+    collection = client.get_or_create_collection("fns", embedding_function=embed)
+    collection.upsert(ids=["a", "b"], embeddings=[[1, 0, 0, 0], [0, 3, 0, 0]], documents=["x", "y"],
+                      metadatas=[{"n": 1}, {"n": 2}])
+
+    collection = NumpyClient(str(tmp_path)).get_or_create_collection("fns")
+    assert isinstance(collection._embeddings, np.memmap)
+    assert collection.get()["metadatas"] == [{"n": 1}, {"n": 2}]
+    assert collection.query(query_embeddings=[[0, 1, 0, 0]], n_results=1)["ids"] == [["b"]]
+
+    client.reset()
+    assert NumpyClient(str(tmp_path)).get_or_create_collection("fns").count() == 0
+
+
+def test_persisted_versions_are_published_atomically(tmp_path):
+    collection = NumpyClient(str(tmp_path)).get_or_create_collection("fns")
+    for idx in range(4):
+        collection.upsert(ids=[str(idx)], embeddings=[[1.0, float(idx)]])
+    assert (tmp_path / "fns.current").read_text() == "4"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fns.current", "fns.v000003", "fns.v000004"]
+    # a write that was interrupted before the pointer was replaced is not visible
+    (tmp_path / "fns.v000005").mkdir()
+    assert NumpyClient(str(tmp_path)).get_or_create_collection("fns").get()["ids"] == ["0", "1", "2", "3"]
+
+
+def test_unversioned_collection_is_loaded(tmp_path):
+    np.save(tmp_path / "fns.npy", np.array([[1.0, 0.0]], dtype=np.float32))
+    (tmp_path / "fns.json").write_text('{"ids": ["a"], "documents": ["x"], "metadatas": [{}]}')
+    collection = NumpyClient(str(tmp_path)).get_or_create_collection("fns")
+    assert collection.get()["ids"] == ["a"]
+    collection.upsert(ids=["b"], embeddings=[[0.0, 1.0]])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["fns.current", "fns.v000001"]
+    assert NumpyClient(str(tmp_path)).get_or_create_collection("fns").get()["ids"] == ["a", "b"]
@@ -0,0 +1,36 @@
+import datetime
+
+from infinite_fn.local_apis.weather_cache import WeatherCache, date_range
+from infinite_fn.python_fns import weather
+
+
+def test_get_many_fetches_only_missing_records():
+    _fetched = []
+    _now = [0.0]
+
+    def fetch(location, date):
+        _fetched.append((location, date))
+        return weather.fetch_weather_data(location, date)
+
+    cache = WeatherCache(fetch, ttl=10, clock=lambda: _now[0])
+    _dates = date_range(3, start=datetime.date(2023, 7, 1))
+    assert _dates == ["2023-07-01", "2023-07-02", "2023-07-03"]
+    _first = cache.get("London", "2023-07-02")
+    _frame = cache.get_many(["London", "Paris"], _dates)
+    assert _frame["temperature"].shape == (2, 3)
+    assert _frame.record(0, 1) == _first
+    assert _frame["humidity"][1, 2] == _frame.record(1, 2)["humidity"]
+    assert len(_fetched) == 6
+    _now[0] = 11.0
+    cache.get("London", "2023-07-02")
+    assert len(_fetched) == 7
+
+
+def test_derived_metrics_use_cached_records():
+    weather.weather_cache.clear()
+    _frame = weather.weather_cache.get_many(["Rome"], date_range(5, step=-1))
+    _temperatures = [r["temperature"] for r in _frame.records(0)]
+    assert weather.average_temperature("Rome", 5) == sum(_temperatures) / 5
+    assert weather.max_min_temperature("Rome", 5) == (max(_temperatures), min(_temperatures))
+    assert weather.rain_chance("Rome", 12) == 0
+    assert weather.current_weather("Rome") == weather.current_weather("Rome")
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from infinite_fn.local_apis.weather_provider import HttpWeatherProvider, RandomWeatherProvider, RateLimiter
+from infinite_fn.local_apis.weather_stub_server import WeatherStubServer
+
+
+def test_concurrent_identical_requests_are_coalesced():
+    server = WeatherStubServer(latency=0.2).start()
+    provider = HttpWeatherProvider(server.url, rate=0)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            _results = list(pool.map(lambda _: provider.fetch("London", "2023-07-01"), range(8)))
+        assert server.requests == 1
+        assert all(r == RandomWeatherProvider().fetch("London", "2023-07-01") for r in _results)
+        _batch = provider.fetch_many([("Paris", None), ("Rome", None), ("Paris", None)])
+        assert _batch[0] == _batch[2] and _batch[1]["location"] == "Rome"
+        assert provider.upstream_requests == server.requests == 3
+    finally:
+        provider.close()
+        server.stop()
+
+
+def test_rate_limiter_waits_for_permits():
+    _now = [0.0]
+    _waits = []
+
+    def sleep(seconds):
+        _waits.append(seconds)
+        _now[0] += seconds
+
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: _now[0], sleep=sleep)
+    for _ in range(4):
+        limiter.acquire()
+    assert _waits == [0.5, 0.5]